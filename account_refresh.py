@@ -0,0 +1,190 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Tuple
+from flask import current_app
+from models import db, SocialAccount
+from analytics import analytics_store
+from encryption import encryption_service
+from rate_limits import RateLimitExceeded
+
+# Verification requests run concurrently in each worker
+REFRESH_WORKERS = int(os.environ.get('ACCOUNT_REFRESH_WORKERS', '8'))
+
+# A unit of work for the pool: the check to run and the accounts it reports on
+Task = Tuple[Callable[[], List[Dict]], List[int]]
+
+
+class AccountRefresher:
+    """Verifies connected accounts in bulk and records their profile data.
+
+    Twitter accounts whose user id is known are looked up 100 at a time
+    through GET /users, one batch per app token; the others are verified
+    individually through /users/me, which also records their user id for the
+    next sweep. Checks run on a bounded pool and results are yielded as each
+    check completes. Platforms without an API integration only have their
+    stored credentials checked, as publishing to them is simulated.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def refresh(self, accounts: List[SocialAccount]) -> Iterator[Dict]:
+        """Verify accounts, yielding one result per account as checks complete.
+
+        Each result is applied to its account (status, last_tested, follower
+        count) and committed before it is yielded, so a sweep cut short keeps
+        what it found. Results with status 'rate_limited' leave the account
+        untouched and carry retry_after.
+        """
+        by_id = {account.id: account for account in accounts}
+        # Checks share the app's rate-limit buckets, which need an app context
+        app = current_app._get_current_object()
+        executor = self._get_executor()
+        futures = {
+            executor.submit(_in_app_context, app, task): account_ids
+            for task, account_ids in self._plan(accounts)
+        }
+        try:
+            for future in as_completed(futures):
+                try:
+                    results = future.result()
+                except Exception as e:
+                    logging.error(f"Error verifying accounts {futures[future]}: {e}")
+                    results = [_result(account_id, 'error', f'Error de verificación: {e}') for account_id in futures[future]]
+                self._apply([(by_id[result['account_id']], result) for result in results])
+                yield from results
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Get this process's verification pool, creating it on first use"""
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix='account-refresh')
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _plan(self, accounts: List[SocialAccount]) -> List[Task]:
+        """Split accounts into pool tasks; tasks get plain values, never ORM objects"""
+        from twitter_api import create_twitter_client, USERS_LOOKUP_MAX_IDS
+
+        tasks = []
+        # Known twitter users grouped by app token: {bearer_token: (client, {user_id: account_id})}
+        lookups: Dict[str, Tuple[object, Dict[str, int]]] = {}
+        for account in accounts:
+            credentials = None
+            if account.encrypted_credentials:
+                credentials = encryption_service.decrypt_credentials(account.encrypted_credentials)
+            if not credentials or not any(credentials.values()):
+                tasks.append((_constant(_result(account.id, 'error', 'No hay credenciales de API configuradas')), [account.id]))
+                continue
+
+            if account.platform != 'twitter':
+                tasks.append((_constant(_result(account.id, 'connected', f'Credenciales de {account.platform} configuradas')), [account.id]))
+                continue
+
+            bearer_token = credentials.get('bearer_token')
+            client = create_twitter_client(credentials) if bearer_token else None
+            if client is None:
+                tasks.append((_constant(_result(account.id, 'error', 'Falta el Bearer Token de Twitter')), [account.id]))
+            elif account.external_user_id:
+                lookups.setdefault(bearer_token, (client, {}))[1][account.external_user_id] = account.id
+            else:
+                tasks.append((_verify_profile(client, account.id), [account.id]))
+
+        for client, users in lookups.values():
+            user_ids = list(users)
+            for start in range(0, len(user_ids), USERS_LOOKUP_MAX_IDS):
+                batch = {user_id: users[user_id] for user_id in user_ids[start:start + USERS_LOOKUP_MAX_IDS]}
+                tasks.append((_lookup_users(client, batch), list(batch.values())))
+        return tasks
+
+    @staticmethod
+    def _apply(updates: List[Tuple[SocialAccount, Dict]]):
+        """Store verification results and follower counts, then commit"""
+        now = datetime.now()
+        samples = []
+        for account, result in updates:
+            if result['status'] == 'rate_limited':
+                continue
+            account.status = result['status']
+            account.last_tested = now
+            profile = result.get('profile')
+            if profile:
+                account.external_user_id = profile.get('user_id') or account.external_user_id
+                if profile.get('follower_count') is not None:
+                    account.follower_count = profile['follower_count']
+                    samples.append((account.id, account.platform, 'followers', account.follower_count, int(time.time())))
+        analytics_store.record_many(samples)
+        db.session.commit()
+
+
+def _in_app_context(app, task: Callable[[], List[Dict]]) -> List[Dict]:
+    with app.app_context():
+        return task()
+
+
+def _result(account_id: int, status: str, message: str, **extra) -> Dict:
+    result = {'account_id': account_id, 'status': status, 'message': message}
+    result.update(extra)
+    return result
+
+
+def _constant(result: Dict) -> Callable[[], List[Dict]]:
+    return lambda: [result]
+
+
+def _verify_profile(client, account_id: int) -> Callable[[], List[Dict]]:
+    """Verify one twitter account through its own profile"""
+    def run():
+        try:
+            profile = client.get_user_profile()
+        except RateLimitExceeded as e:
+            return [_rate_limited(account_id, e)]
+        if not profile:
+            return [_result(account_id, 'error', 'No se pudo conectar con Twitter API. Verifica tus credenciales.')]
+        return [_result(account_id, 'connected', 'Conexión exitosa con Twitter API', profile=profile)]
+    return run
+
+
+def _lookup_users(client, users: Dict[str, int]) -> Callable[[], List[Dict]]:
+    """Verify a batch of twitter accounts with one users lookup"""
+    def run():
+        try:
+            lookup = client.get_users(list(users))
+        except RateLimitExceeded as e:
+            return [_rate_limited(account_id, e) for account_id in users.values()]
+        if lookup is None:
+            return [
+                _result(account_id, 'error', 'No se pudo conectar con Twitter API. Verifica tus credenciales.')
+                for account_id in users.values()
+            ]
+        results = []
+        for user_id, account_id in users.items():
+            profile = lookup['profiles'].get(user_id)
+            if profile:
+                results.append(_result(account_id, 'connected', 'Conexión exitosa con Twitter API', profile=profile))
+            else:
+                results.append(_result(account_id, 'error', 'La cuenta de Twitter no existe o está suspendida'))
+        return results
+    return run
+
+
+def _rate_limited(account_id: int, error: RateLimitExceeded) -> Dict:
+    return _result(
+        account_id, 'rate_limited',
+        f'Límite de peticiones de Twitter alcanzado. Reintenta en {error.retry_after:.0f} segundos.',
+        retry_after=error.retry_after
+    )
+
+
+# Global account refresher instance
+account_refresher = AccountRefresher()
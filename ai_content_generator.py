@@ -1,9 +1,78 @@
 import os
 import json
 import logging
-import requests
-from typing import Dict, List, Optional
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from contextlib import nullcontext
+from typing import Dict, Iterator, List, Optional, Tuple
 from encryption import encryption_service
+from http_client import http_client
+from metrics import metrics, outcome, response_size, AI_DURATION, AI_IN_FLIGHT, AI_REQUESTS, AI_RESPONSE_SIZE, AI_TOKENS
+from profiler import request_profiler
+from provider_stats import ProviderStats
+from response_cache import create_response_cache
+
+# Upper bound on platform generations running at the same time across all providers
+MAX_GENERATION_WORKERS = int(os.environ.get('AI_GENERATION_MAX_WORKERS', '8'))
+# Retry a failed generation on the next connected provider
+FAILOVER_ENABLED = os.environ.get('AI_FAILOVER_ENABLED', '1') != '0'
+# Providers failing at least this share of recent requests are tried last
+UNHEALTHY_ERROR_RATE = float(os.environ.get('AI_UNHEALTHY_ERROR_RATE', '0.5'))
+# Send a second request to the next provider when the first outlasts its p95 latency
+HEDGE_ENABLED = os.environ.get('AI_HEDGE_ENABLED', '0') == '1'
+# Hedging budget bounds, in seconds; the default applies until enough latencies are known
+HEDGE_MIN_DELAY = float(os.environ.get('AI_HEDGE_MIN_DELAY', '1'))
+HEDGE_DEFAULT_DELAY = float(os.environ.get('AI_HEDGE_DEFAULT_DELAY', '8'))
+# Output token budget for one batched multi-platform request
+BATCH_MAX_TOKENS = int(os.environ.get('AI_BATCH_MAX_TOKENS', '8000'))
+
+# Length, tone and hashtag requirements for each platform
+PLATFORM_SPECS = {
+    'linkedin': {
+        'max_chars': 3000,
+        'tone': 'profesional',
+        'hashtags': 3,
+        'features': 'enlaces, menciones profesionales'
+    },
+    'twitter': {
+        'max_chars': 280,
+        'tone': 'conciso y engaging',
+        'hashtags': 2,
+        'features': 'hilos si es necesario'
+    },
+    'instagram': {
+        'max_chars': 2200,
+        'tone': 'visual y atractivo',
+        'hashtags': 10,
+        'features': 'llamadas a la acción'
+    },
+    'facebook': {
+        'max_chars': 63206,
+        'tone': 'conversacional',
+        'hashtags': 2,
+        'features': 'engagement, preguntas'
+    },
+    'youtube': {
+        'max_chars': 5000,
+        'tone': 'descriptivo',
+        'hashtags': 5,
+        'features': 'timestamps, descripciones detalladas'
+    },
+    'tiktok': {
+        'max_chars': 150,
+        'tone': 'trending y divertido',
+        'hashtags': 5,
+        'features': 'trends, challenges'
+    },
+    'web': {
+        'max_chars': 5000,
+        'tone': 'informativo y detallado',
+        'hashtags': 3,
+        'features': 'artículos, blogs, contenido extenso'
+    }
+}
 
 class AIContentGenerator:
     """Unified AI content generation using multiple providers"""
@@ -14,6 +83,10 @@ class AIContentGenerator:
             'openai': {
                 'api_url': 'https://api.openai.com/v1/chat/completions',
                 'model': 'gpt-4o',
+                'max_concurrency': int(os.environ.get('OPENAI_MAX_CONCURRENCY', '4')),
+                'system_prompt': 'Eres un experto en marketing de redes sociales. Crea contenido atractivo y profesional.',
+                'temperature': 0.7,
+                'max_tokens': 1500,
                 'headers_template': {
                     'Authorization': 'Bearer {api_key}',
                     'Content-Type': 'application/json'
@@ -21,7 +94,12 @@ class AIContentGenerator:
             },
             'gemini': {
                 'api_url': 'https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent',
+                'stream_url': 'https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:streamGenerateContent',
                 'model': 'gemini-2.5-flash',
+                'max_concurrency': int(os.environ.get('GEMINI_MAX_CONCURRENCY', '4')),
+                'system_prompt': 'Eres un experto en marketing de redes sociales.',
+                'temperature': 0.7,
+                'max_tokens': 1500,
                 'headers_template': {
                     'Content-Type': 'application/json'
                 }
@@ -29,12 +107,32 @@ class AIContentGenerator:
             'perplexity': {
                 'api_url': 'https://api.perplexity.ai/chat/completions',
                 'model': 'llama-3.1-sonar-small-128k-online',
+                'max_concurrency': int(os.environ.get('PERPLEXITY_MAX_CONCURRENCY', '2')),
+                'system_prompt': 'Eres un experto en marketing de redes sociales. Crea contenido atractivo basado en información actualizada.',
+                'temperature': 0.7,
+                'max_tokens': 1500,
                 'headers_template': {
                     'Authorization': 'Bearer {api_key}',
                     'Content-Type': 'application/json'
                 }
             }
         }
+        # Per-provider caps so a wide fan-out does not trip provider rate limits
+        self._provider_slots = {
+            name: threading.BoundedSemaphore(max(1, config['max_concurrency']))
+            for name, config in self.provider_configs.items()
+        }
+        # Keep enough pooled connections per provider host for its concurrency cap
+        for config in self.provider_configs.values():
+            http_client.configure_host(config['api_url'], config['max_concurrency'])
+        # Created on first use so importing the module starts no threads
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._hedge_executor = None
+        # Opt-in cache of successful generations (AI_CACHE_ENABLED=1)
+        self.cache = create_response_cache()
+        # Latency and error windows used for failover order and hedging
+        self.stats = ProviderStats(UNHEALTHY_ERROR_RATE)
     
     def get_ai_credentials(self):
         """Get AI provider credentials from environment"""
@@ -44,8 +142,11 @@ class AIContentGenerator:
             'perplexity': os.environ.get('PERPLEXITY_API_KEY')
         }
     
-    def generate_content(self, prompt: str, platform: str, provider: str = 'openai') -> Dict:
-        """Generate content using specified AI provider"""
+    def generate_content(self, prompt: str, platform: str, provider: str = 'openai', use_cache: bool = True) -> Dict:
+        """Generate content using specified AI provider.
+
+        Pass use_cache=False to skip the response cache for this call.
+        """
         try:
             credentials = self.get_ai_credentials()
             api_key = credentials.get(provider)
@@ -57,20 +158,37 @@ class AIContentGenerator:
                     'requires_setup': True
                 }
             
+            if provider not in self.provider_configs:
+                return {
+                    'success': False,
+                    'error': f'Proveedor {provider} no soportado'
+                }
+            
             # Platform-specific prompt enhancement
             enhanced_prompt = self._enhance_prompt_for_platform(prompt, platform)
             
+            cache_key = None
+            if self.cache.enabled and use_cache:
+                config = self.provider_configs[provider]
+                cache_key = self.cache.make_key(
+                    provider, config['model'], enhanced_prompt,
+                    config['temperature'], config['system_prompt']
+                )
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    cached['cached'] = True
+                    return cached
+            
             if provider == 'openai':
-                return self._generate_with_openai(enhanced_prompt, api_key)
+                result = self._generate_with_openai(enhanced_prompt, api_key)
             elif provider == 'gemini':
-                return self._generate_with_gemini(enhanced_prompt, api_key)
-            elif provider == 'perplexity':
-                return self._generate_with_perplexity(enhanced_prompt, api_key)
+                result = self._generate_with_gemini(enhanced_prompt, api_key)
             else:
-                return {
-                    'success': False,
-                    'error': f'Proveedor {provider} no soportado'
-                }
+                result = self._generate_with_perplexity(enhanced_prompt, api_key)
+            
+            if cache_key and result.get('success'):
+                self.cache.set(cache_key, result)
+            return result
                 
         except Exception as e:
             logging.error(f"Error generating content: {e}")
@@ -79,54 +197,357 @@ class AIContentGenerator:
                 'error': f'Error generando contenido: {str(e)}'
             }
     
-    def _enhance_prompt_for_platform(self, prompt: str, platform: str) -> str:
-        """Enhance prompt based on platform requirements"""
-        platform_specs = {
-            'linkedin': {
-                'max_chars': 3000,
-                'tone': 'profesional',
-                'hashtags': 3,
-                'features': 'enlaces, menciones profesionales'
-            },
-            'twitter': {
-                'max_chars': 280,
-                'tone': 'conciso y engaging',
-                'hashtags': 2,
-                'features': 'hilos si es necesario'
-            },
-            'instagram': {
-                'max_chars': 2200,
-                'tone': 'visual y atractivo',
-                'hashtags': 10,
-                'features': 'llamadas a la acción'
-            },
-            'facebook': {
-                'max_chars': 63206,
-                'tone': 'conversacional',
-                'hashtags': 2,
-                'features': 'engagement, preguntas'
-            },
-            'youtube': {
-                'max_chars': 5000,
-                'tone': 'descriptivo',
-                'hashtags': 5,
-                'features': 'timestamps, descripciones detalladas'
-            },
-            'tiktok': {
-                'max_chars': 150,
-                'tone': 'trending y divertido',
-                'hashtags': 5,
-                'features': 'trends, challenges'
-            },
-            'web': {
-                'max_chars': 5000,
-                'tone': 'informativo y detallado',
-                'hashtags': 3,
-                'features': 'artículos, blogs, contenido extenso'
+    def generate_with_failover(self, prompt: str, platform: str, provider: str = 'openai',
+                               use_cache: bool = True) -> Dict:
+        """Generate content on the requested provider, falling back to the other connected ones.
+
+        With AI_HEDGE_ENABLED=1 a request slower than the provider's p95 latency
+        is raced against the next candidate. The result's 'provider' is the one
+        that answered and 'requested_provider' the one asked for.
+        """
+        candidates = self.provider_candidates(provider)
+        if not candidates:
+            return self.generate_content(prompt, platform, provider, use_cache)
+        
+        result = None
+        attempted = []
+        while candidates:
+            primary = candidates.pop(0)
+            backup = candidates[0] if HEDGE_ENABLED and candidates else None
+            result, tried = self._generate_hedged(prompt, platform, primary, backup, use_cache)
+            attempted.extend(tried)
+            candidates = [name for name in candidates if name not in tried]
+            if result.get('success'):
+                break
+            if candidates:
+                logging.warning(f"{primary} failed for {platform} ({result.get('error')}), trying {candidates[0]}")
+        
+        result = dict(result)
+        result['requested_provider'] = provider
+        if result.get('success') and result.get('provider') != provider:
+            result['failover'] = True
+        if not result.get('success'):
+            result['attempted_providers'] = attempted
+        return result
+    
+    def provider_candidates(self, provider: str) -> List[str]:
+        """Get the providers to try, in order, for a request to `provider`.
+
+        The requested provider comes first, followed by the other providers that
+        have credentials in supported_providers order; unhealthy providers are
+        moved to the end.
+        """
+        credentials = self.get_ai_credentials()
+        if not credentials.get(provider) or provider not in self.provider_configs:
+            return []
+        if not FAILOVER_ENABLED:
+            return [provider]
+        candidates = [provider] + [
+            name for name in self.supported_providers
+            if name != provider and credentials.get(name)
+        ]
+        return sorted(candidates, key=lambda name: not self.stats.is_healthy(name))
+    
+    def hedge_delay(self, provider: str) -> float:
+        """Get how long to wait on a provider before sending a hedged request"""
+        p95 = self.stats.p95(provider)
+        return max(HEDGE_MIN_DELAY, p95 if p95 is not None else HEDGE_DEFAULT_DELAY)
+    
+    def _generate_hedged(self, prompt: str, platform: str, primary: str, backup: Optional[str],
+                         use_cache: bool) -> Tuple[Dict, List[str]]:
+        """Run a generation on `primary`, racing it against `backup` once it gets slow.
+
+        Returns the result and the providers that were actually called.
+        """
+        if backup is None:
+            return self._call_provider(prompt, platform, primary, use_cache), [primary]
+        
+        executor = self._get_hedge_executor()
+        first = executor.submit(request_profiler.follow(self._call_provider), prompt, platform, primary, use_cache)
+        try:
+            return first.result(timeout=self.hedge_delay(primary)), [primary]
+        except FutureTimeout:
+            pass
+        
+        logging.info(f"{primary} is slow for {platform}, hedging with {backup}")
+        pending = {
+            first: primary,
+            executor.submit(request_profiler.follow(self._call_provider), prompt, platform, backup, use_cache): backup
+        }
+        result = None
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                result = future.result()
+                if result.get('success'):
+                    if name == backup:
+                        result = dict(result)
+                        result['hedged'] = True
+                    # The slower request finishes in the background and only updates the stats
+                    return result, [primary, backup]
+        return result, [primary, backup]
+    
+    def _call_provider(self, prompt: str, platform: str, provider: str, use_cache: bool = True) -> Dict:
+        """Run a single generation on one provider while holding one of its slots"""
+        with self._provider_slot(provider):
+            started = time.monotonic()
+            result = self.generate_content(prompt, platform, provider, use_cache)
+            self._record_outcome(provider, result, time.monotonic() - started)
+        result.setdefault('provider', provider)
+        return result
+    
+    def _record_outcome(self, provider: str, result: Dict, latency: float):
+        """Feed a provider call into the stats, ignoring cache hits and missing setup"""
+        if result.get('cached') or result.get('requires_setup'):
+            return
+        self.stats.record(provider, latency, bool(result.get('success')))
+    
+    def _provider_slot(self, provider: str):
+        slot = self._provider_slots.get(provider)
+        return slot if slot is not None else nullcontext()
+    
+    def generate_content_for_platforms(self, prompts: Dict[str, str], provider: str = 'openai',
+                                       use_cache: bool = True) -> Dict[str, Dict]:
+        """Generate content for several platforms concurrently.
+
+        `prompts` maps each platform to its prompt. Every platform is generated
+        independently, so a failure for one platform is returned as that
+        platform's error result without affecting the others.
+        """
+        if len(prompts) <= 1:
+            return {
+                platform: self.generate_with_failover(prompt, platform, provider, use_cache)
+                for platform, prompt in prompts.items()
             }
+        
+        executor = self._get_executor()
+        futures = {
+            platform: executor.submit(request_profiler.follow(self.generate_with_failover), prompt, platform, provider, use_cache)
+            for platform, prompt in prompts.items()
         }
         
-        spec = platform_specs.get(platform, platform_specs['linkedin'])
+        results = {}
+        for platform, future in futures.items():
+            try:
+                results[platform] = future.result()
+            except Exception as e:
+                logging.error(f"Error generating content for {platform}: {e}")
+                results[platform] = {
+                    'success': False,
+                    'error': f'Error generando contenido: {str(e)}'
+                }
+        return results
+    
+    def generate_content_batch(self, task: str, requirements: Dict[str, str], fallback_prompts: Dict[str, str],
+                               provider: str = 'openai', use_cache: bool = True) -> Dict[str, Dict]:
+        """Generate content for several platforms with a single structured request.
+
+        `task` is the shared instruction (topic or content to adapt), sent once,
+        and `requirements` maps each platform to its own requirements. Platforms
+        the provider does not answer for, or every platform when the answer
+        cannot be parsed, are generated from `fallback_prompts` one by one.
+        Results have the same shape as generate_content_for_platforms.
+        """
+        platforms = list(requirements)
+        if len(platforms) <= 1:
+            return self.generate_content_for_platforms(fallback_prompts, provider, use_cache)
+        
+        results = {}
+        candidates = self.provider_candidates(provider)
+        if candidates:
+            started = time.monotonic()
+            with self._provider_slot(candidates[0]):
+                batch = self._generate_batch(task, requirements, candidates[0], use_cache)
+            if not batch.get('cached'):
+                self.stats.record(candidates[0], time.monotonic() - started, bool(batch.get('success')))
+            
+            if batch.get('success'):
+                for platform, post in batch['posts'].items():
+                    result = {
+                        'success': True,
+                        'content': self._join_hashtags(post['content'], post['hashtags']),
+                        'provider': candidates[0],
+                        'model': self.provider_configs[candidates[0]]['model'],
+                        'requested_provider': provider,
+                        'batched': True
+                    }
+                    if candidates[0] != provider:
+                        result['failover'] = True
+                    if 'citations' in batch:
+                        result['citations'] = batch['citations']
+                    results[platform] = result
+            else:
+                logging.warning(f"Batch generation with {candidates[0]} failed: {batch.get('error')}")
+        
+        missing = {platform: fallback_prompts[platform] for platform in platforms if platform not in results}
+        if missing:
+            logging.info(f"Generating {list(missing)} one by one after batch generation")
+            results.update(self.generate_content_for_platforms(missing, provider, use_cache))
+        return results
+    
+    def platform_requirements(self, platform: str) -> str:
+        """Describe a platform's requirements in one line for batched prompts"""
+        spec = PLATFORM_SPECS.get(platform, PLATFORM_SPECS['linkedin'])
+        return (
+            f"máximo {spec['max_chars']} caracteres incluyendo hashtags, tono {spec['tone']}, "
+            f"{spec['hashtags']} hashtags relevantes, características: {spec['features']}"
+        )
+    
+    def _generate_batch(self, task: str, requirements: Dict[str, str], provider: str, use_cache: bool) -> Dict:
+        """Ask one provider for every platform's post as JSON and parse the answer"""
+        import requests
+        config = self.provider_configs[provider]
+        api_key = self.get_ai_credentials().get(provider)
+        platform_lines = '\n'.join(f"- {platform}: {text}" for platform, text in requirements.items())
+        prompt = f"""
+{task}
+
+Crea una publicación para cada una de estas plataformas, respetando sus requisitos:
+{platform_lines}
+
+Responde ÚNICAMENTE con un objeto JSON de la forma
+{{"posts": [{{"platform": "<plataforma>", "content": "<texto sin hashtags>", "hashtags": ["#ejemplo"]}}]}}
+con exactamente una entrada por plataforma. Sin meta-texto ni explicaciones.
+"""
+        
+        cache_key = None
+        if self.cache.enabled and use_cache:
+            cache_key = self.cache.make_key(
+                provider, config['model'], prompt, config['temperature'], f"batch:{config['system_prompt']}"
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                cached['cached'] = True
+                return cached
+        
+        url, headers, payload = self._build_request(provider, prompt, api_key)
+        max_tokens = min(BATCH_MAX_TOKENS, config['max_tokens'] * len(requirements))
+        schema = self._batch_schema(list(requirements))
+        if provider == 'gemini':
+            payload['generationConfig'].update({
+                'maxOutputTokens': max_tokens,
+                'responseMimeType': 'application/json'
+            })
+        else:
+            payload['max_tokens'] = max_tokens
+            payload['response_format'] = {
+                'type': 'json_schema',
+                'json_schema': {'name': 'platform_posts', 'strict': True, 'schema': schema}
+                if provider == 'openai' else {'schema': schema}
+            }
+        
+        try:
+            response = self._post(provider, url, headers=headers, json=payload)
+            if response.status_code != 200:
+                return {
+                    'success': False,
+                    'error': f'Error de {provider.capitalize()} API: {response.status_code}',
+                    'details': response.text
+                }
+            data = response.json()
+            self._record_usage(provider, data)
+            if provider == 'gemini':
+                text = data['candidates'][0]['content']['parts'][0]['text']
+            else:
+                text = data['choices'][0]['message']['content']
+            posts = self._parse_batch_posts(text, list(requirements))
+        except (requests.exceptions.RequestException, KeyError, IndexError, ValueError) as e:
+            return {'success': False, 'error': f'Respuesta por lotes no válida: {str(e)}'}
+        
+        if not posts:
+            return {'success': False, 'error': 'La respuesta por lotes no contiene publicaciones'}
+        result = {'success': True, 'posts': posts}
+        if provider == 'perplexity':
+            result['citations'] = data.get('citations', [])
+        if cache_key:
+            self.cache.set(cache_key, result)
+        return result
+    
+    @staticmethod
+    def _batch_schema(platforms: List[str]) -> Dict:
+        """JSON schema of the batched answer"""
+        return {
+            'type': 'object',
+            'properties': {
+                'posts': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'platform': {'type': 'string', 'enum': platforms},
+                            'content': {'type': 'string'},
+                            'hashtags': {'type': 'array', 'items': {'type': 'string'}}
+                        },
+                        'required': ['platform', 'content', 'hashtags'],
+                        'additionalProperties': False
+                    }
+                }
+            },
+            'required': ['posts'],
+            'additionalProperties': False
+        }
+    
+    @staticmethod
+    def _parse_batch_posts(text: str, platforms: List[str]) -> Dict[str, Dict]:
+        """Extract each requested platform's content and hashtags from a batched answer.
+
+        Entries that are missing, empty or for other platforms are dropped so
+        those platforms fall back to individual requests.
+        """
+        start, end = text.find('{'), text.rfind('}')
+        if start == -1 or end < start:
+            raise ValueError('no se encontró un objeto JSON')
+        data = json.loads(text[start:end + 1])
+        
+        entries = data.get('posts', []) if isinstance(data, dict) else []
+        posts = {}
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            platform = str(entry.get('platform', '')).strip().lower()
+            content = entry.get('content')
+            if platform not in platforms or platform in posts or not isinstance(content, str) or not content.strip():
+                continue
+            hashtags = entry.get('hashtags') or []
+            if not isinstance(hashtags, list):
+                hashtags = str(hashtags).split()
+            posts[platform] = {
+                'content': content.strip(),
+                'hashtags': ['#' + str(tag).strip().lstrip('#') for tag in hashtags if str(tag).strip().lstrip('#')]
+            }
+        return posts
+    
+    @staticmethod
+    def _join_hashtags(content: str, hashtags: List[str]) -> str:
+        """Put hashtags after the content, as single-platform generations do"""
+        return f"{content}\n\n{' '.join(hashtags)}" if hashtags else content
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Get the shared generation pool, creating it on first use"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=MAX_GENERATION_WORKERS,
+                        thread_name_prefix='ai-generation'
+                    )
+        return self._executor
+    
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        """Get the pool running hedged provider calls, separate so hedges never wait behind platforms"""
+        if self._hedge_executor is None:
+            with self._executor_lock:
+                if self._hedge_executor is None:
+                    self._hedge_executor = ThreadPoolExecutor(
+                        max_workers=MAX_GENERATION_WORKERS * 2,
+                        thread_name_prefix='ai-hedge'
+                    )
+        return self._hedge_executor
+    
+    def _enhance_prompt_for_platform(self, prompt: str, platform: str) -> str:
+        """Enhance prompt based on platform requirements"""
+        spec = PLATFORM_SPECS.get(platform, PLATFORM_SPECS['linkedin'])
         
         if platform == 'twitter':
             enhanced = f"""
@@ -168,21 +589,22 @@ Genera el contenido optimizado para {platform} con hashtags apropiados al final.
             'messages': [
                 {
                     'role': 'system',
-                    'content': 'Eres un experto en marketing de redes sociales. Crea contenido atractivo y profesional.'
+                    'content': config['system_prompt']
                 },
                 {
                     'role': 'user',
                     'content': prompt
                 }
             ],
-            'max_tokens': 1500,
-            'temperature': 0.7
+            'max_tokens': config['max_tokens'],
+            'temperature': config['temperature']
         }
         
-        response = requests.post(config['api_url'], headers=headers, json=payload)
+        response = self._post('openai', config['api_url'], headers=headers, json=payload)
         
         if response.status_code == 200:
             data = response.json()
+            self._record_usage('openai', data)
             content = data['choices'][0]['message']['content']
             
             return {
@@ -210,21 +632,22 @@ Genera el contenido optimizado para {platform} con hashtags apropiados al final.
                 {
                     'parts': [
                         {
-                            'text': f"Eres un experto en marketing de redes sociales. {prompt}"
+                            'text': f"{config['system_prompt']} {prompt}"
                         }
                     ]
                 }
             ],
             'generationConfig': {
-                'temperature': 0.7,
-                'maxOutputTokens': 1500
+                'temperature': config['temperature'],
+                'maxOutputTokens': config['max_tokens']
             }
         }
         
-        response = requests.post(url, headers=headers, json=payload)
+        response = self._post('gemini', url, headers=headers, json=payload)
         
         if response.status_code == 200:
             data = response.json()
+            self._record_usage('gemini', data)
             content = data['candidates'][0]['content']['parts'][0]['text']
             
             return {
@@ -242,6 +665,7 @@ Genera el contenido optimizado para {platform} con hashtags apropiados al final.
     
     def _generate_with_perplexity(self, prompt: str, api_key: str) -> Dict:
         """Generate content using Perplexity API"""
+        import requests
         try:
             config = self.provider_configs['perplexity']
             headers = {
@@ -254,25 +678,26 @@ Genera el contenido optimizado para {platform} con hashtags apropiados al final.
                 'messages': [
                     {
                         'role': 'system',
-                        'content': 'Eres un experto en marketing de redes sociales. Crea contenido atractivo basado en información actualizada.'
+                        'content': config['system_prompt']
                     },
                     {
                         'role': 'user',
                         'content': prompt
                     }
                 ],
-                'max_tokens': 1500,
-                'temperature': 0.7,
+                'max_tokens': config['max_tokens'],
+                'temperature': config['temperature'],
                 'search_recency_filter': 'month'
             }
             
             logging.debug(f"Perplexity request payload: {payload}")
-            response = requests.post(config['api_url'], headers=headers, json=payload, timeout=30)
+            response = self._post('perplexity', config['api_url'], headers=headers, json=payload)
             logging.debug(f"Perplexity response status: {response.status_code}")
             logging.debug(f"Perplexity response text: {response.text[:500]}...")
             
             if response.status_code == 200:
                 data = response.json()
+                self._record_usage('perplexity', data)
                 if 'choices' in data and len(data['choices']) > 0:
                     content = data['choices'][0]['message']['content']
                     
@@ -299,7 +724,7 @@ Genera el contenido optimizado para {platform} con hashtags apropiados al final.
             return {
                 'success': False,
                 'error': 'Timeout al conectar con Perplexity API',
-                'details': 'La solicitud tardó más de 30 segundos'
+                'details': f'La solicitud tardó más de {http_client.read_timeout:g} segundos'
             }
         except requests.exceptions.RequestException as e:
             return {
@@ -315,10 +740,274 @@ Genera el contenido optimizado para {platform} con hashtags apropiados al final.
                 'details': str(e)
             }
     
+    def stream_content(self, prompt: str, platform: str, provider: str = 'openai',
+                       use_cache: bool = True) -> Iterator[Dict]:
+        """Stream generated content as the provider produces it.
+
+        Yields {'type': 'delta', 'text': ...} events, then a single
+        {'type': 'result', 'result': ...} event holding the same dict
+        generate_content would have returned.
+        """
+        import requests
+        api_key = self.get_ai_credentials().get(provider)
+        if not api_key:
+            yield {'type': 'result', 'result': {
+                'success': False,
+                'error': f'API key para {provider} no configurada',
+                'requires_setup': True
+            }}
+            return
+        if provider not in self.provider_configs:
+            yield {'type': 'result', 'result': {
+                'success': False,
+                'error': f'Proveedor {provider} no soportado'
+            }}
+            return
+        
+        config = self.provider_configs[provider]
+        enhanced_prompt = self._enhance_prompt_for_platform(prompt, platform)
+        
+        cache_key = None
+        if self.cache.enabled and use_cache:
+            cache_key = self.cache.make_key(
+                provider, config['model'], enhanced_prompt,
+                config['temperature'], config['system_prompt']
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                cached['cached'] = True
+                yield {'type': 'delta', 'text': cached['content']}
+                yield {'type': 'result', 'result': cached}
+                return
+        
+        url, headers, payload = self._build_request(provider, enhanced_prompt, api_key, stream=True)
+        chunks = []
+        citations = []
+        usage = None
+        try:
+            with self._post(provider, url, headers=headers, json=payload, stream=True) as response:
+                if response.status_code != 200:
+                    yield {'type': 'result', 'result': {
+                        'success': False,
+                        'error': f'Error de {provider.capitalize()} API: {response.status_code}',
+                        'details': response.text
+                    }}
+                    return
+                
+                for event in self._iter_sse_data(response):
+                    text = self._extract_stream_text(provider, event)
+                    if event.get('citations'):
+                        citations = event['citations']
+                    if event.get('usage') or event.get('usageMetadata'):
+                        # Totals so far; the last chunk carrying them has the final counts
+                        usage = event
+                    if text:
+                        chunks.append(text)
+                        yield {'type': 'delta', 'text': text}
+        except requests.exceptions.RequestException as e:
+            yield {'type': 'result', 'result': {
+                'success': False,
+                'error': f'Error de conexión con {provider}: {str(e)}',
+                'details': str(e)
+            }}
+            return
+        
+        if usage:
+            self._record_usage(provider, usage)
+        result = {
+            'success': True,
+            'content': ''.join(chunks),
+            'provider': provider,
+            'model': config['model']
+        }
+        if provider == 'perplexity':
+            result['citations'] = citations
+        if cache_key and result['content']:
+            self.cache.set(cache_key, result)
+        yield {'type': 'result', 'result': result}
+    
+    def stream_content_for_platforms(self, prompts: Dict[str, str], provider: str = 'openai',
+                                     use_cache: bool = True) -> Iterator[Tuple[str, Dict]]:
+        """Stream several platforms concurrently as (platform, event) pairs.
+
+        Events from different platforms are interleaved in arrival order; each
+        platform ends with its own 'result' event.
+        """
+        events = queue.Queue()
+        
+        def run(platform, prompt):
+            try:
+                for event in self._stream_with_failover(prompt, platform, provider, use_cache):
+                    events.put((platform, event))
+            except Exception as e:
+                logging.error(f"Error streaming content for {platform}: {e}")
+                events.put((platform, {'type': 'result', 'result': {
+                    'success': False,
+                    'error': f'Error generando contenido: {str(e)}'
+                }}))
+        
+        executor = self._get_executor()
+        for platform, prompt in prompts.items():
+            executor.submit(request_profiler.follow(run), platform, prompt)
+        
+        pending = len(prompts)
+        while pending:
+            platform, event = events.get()
+            if event['type'] == 'result':
+                pending -= 1
+            yield platform, event
+    
+    def _stream_with_failover(self, prompt: str, platform: str, provider: str,
+                              use_cache: bool) -> Iterator[Dict]:
+        """Stream from the requested provider, failing over while no text has been sent yet"""
+        candidates = self.provider_candidates(provider) or [provider]
+        result = None
+        for index, candidate in enumerate(candidates):
+            streamed = False
+            with self._provider_slot(candidate):
+                started = time.monotonic()
+                for event in self.stream_content(prompt, platform, candidate, use_cache):
+                    if event['type'] == 'result':
+                        result = event['result']
+                        break
+                    streamed = True
+                    yield event
+                self._record_outcome(candidate, result, time.monotonic() - started)
+            
+            if result.get('success') or streamed or index == len(candidates) - 1:
+                break
+            logging.warning(f"{candidate} failed for {platform} ({result.get('error')}), trying {candidates[index + 1]}")
+        
+        result = dict(result)
+        result['requested_provider'] = provider
+        if result.get('success') and result.get('provider') != provider:
+            result['failover'] = True
+        yield {'type': 'result', 'result': result}
+    
+    def _build_request(self, provider: str, prompt: str, api_key: str,
+                       stream: bool = False) -> Tuple[str, Dict, Dict]:
+        """Build the URL, headers and payload of a provider request"""
+        config = self.provider_configs[provider]
+        if provider == 'gemini':
+            if stream:
+                url = f"{config['stream_url']}?alt=sse&key={api_key}"
+            else:
+                url = f"{config['api_url']}?key={api_key}"
+            headers = {'Content-Type': 'application/json'}
+            payload = {
+                'contents': [{'parts': [{'text': f"{config['system_prompt']} {prompt}"}]}],
+                'generationConfig': {
+                    'temperature': config['temperature'],
+                    'maxOutputTokens': config['max_tokens']
+                }
+            }
+            return url, headers, payload
+        
+        headers = {
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        }
+        payload = {
+            'model': config['model'],
+            'messages': [
+                {'role': 'system', 'content': config['system_prompt']},
+                {'role': 'user', 'content': prompt}
+            ],
+            'max_tokens': config['max_tokens'],
+            'temperature': config['temperature']
+        }
+        if stream:
+            payload['stream'] = True
+            if provider == 'openai':
+                # Ask for token usage in a final chunk
+                payload['stream_options'] = {'include_usage': True}
+        if provider == 'perplexity':
+            payload['search_recency_filter'] = 'month'
+        return config['api_url'], headers, payload
+    
+    @staticmethod
+    def _post(provider: str, url: str, **kwargs):
+        """POST to a provider, recording the call's latency, status and response size"""
+        started = time.perf_counter()
+        with AI_IN_FLIGHT.track(provider=provider):
+            try:
+                response = http_client.post(url, **kwargs)
+            except Exception as e:
+                status = outcome(e)
+                AI_REQUESTS.inc(provider=provider, status=status)
+                AI_DURATION.observe(time.perf_counter() - started, provider=provider, status=status)
+                raise
+        AI_REQUESTS.inc(provider=provider, status=response.status_code)
+        AI_DURATION.observe(time.perf_counter() - started, provider=provider, status=response.status_code)
+        size = response_size(response)
+        if size is not None:
+            AI_RESPONSE_SIZE.observe(size, provider=provider)
+        return response
+    
+    @staticmethod
+    def _record_usage(provider: str, data: Dict):
+        """Count the prompt and completion tokens a provider reports in a response"""
+        if provider == 'gemini':
+            usage = data.get('usageMetadata') or {}
+            prompt, completion = usage.get('promptTokenCount'), usage.get('candidatesTokenCount')
+        else:
+            usage = data.get('usage') or {}
+            prompt, completion = usage.get('prompt_tokens'), usage.get('completion_tokens')
+        if prompt:
+            AI_TOKENS.inc(prompt, provider=provider, kind='prompt')
+        if completion:
+            AI_TOKENS.inc(completion, provider=provider, kind='completion')
+    
+    @staticmethod
+    def _iter_sse_data(response) -> Iterator[Dict]:
+        """Decode the JSON 'data:' lines of a server-sent event stream"""
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[5:].strip()
+            if data == '[DONE]':
+                break
+            try:
+                yield json.loads(data)
+            except ValueError:
+                logging.warning(f"Skipping malformed stream chunk: {data[:100]}")
+    
+    @staticmethod
+    def _extract_stream_text(provider: str, event: Dict) -> str:
+        """Get the text delta carried by one streamed chunk"""
+        if provider == 'gemini':
+            candidates = event.get('candidates') or [{}]
+            parts = candidates[0].get('content', {}).get('parts', [])
+            return ''.join(part.get('text', '') for part in parts)
+        choices = event.get('choices') or [{}]
+        return (choices[0].get('delta') or {}).get('content') or ''
+    
     def get_available_providers(self) -> List[str]:
         """Get list of providers with configured API keys"""
         credentials = self.get_ai_credentials()
         return [provider for provider, key in credentials.items() if key]
 
 # Global content generator instance
-content_generator = AIContentGenerator()
\ No newline at end of file
+content_generator = AIContentGenerator()
+
+
+def _cache_metrics() -> List[Dict]:
+    """Report the AI response cache counters at collection time"""
+    stats = content_generator.cache.stats()
+    return [
+        {'name': 'ai_response_cache_lookups_total', 'kind': 'counter', 'help': 'AI response cache lookups',
+         'labelnames': ('result',), 'values': {
+             ('hit',): stats['hits'] - stats['shared_hits'],
+             ('shared_hit',): stats['shared_hits'],
+             ('miss',): stats['misses']}},
+        {'name': 'ai_response_cache_evictions_total', 'kind': 'counter',
+         'help': 'Entries evicted from the in-process AI response cache', 'labelnames': (),
+         'values': {(): stats['evictions']}},
+        {'name': 'ai_response_cache_entries', 'kind': 'gauge', 'help': 'Entries in the in-process AI response cache',
+         'labelnames': (), 'values': {(): stats['entries']}},
+        {'name': 'ai_response_cache_hit_ratio', 'kind': 'gauge', 'help': 'Share of AI response cache lookups that hit',
+         'labelnames': (), 'values': {(): stats['hit_ratio']}, 'per_process': True},
+    ]
+
+
+metrics.add_collector(_cache_metrics)
@@ -0,0 +1,415 @@
+import os
+import math
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import and_, case, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from models import db, MetricBlock, MetricRollup
+
+# Rollup bucket sizes, in seconds
+RESOLUTIONS = {
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+    'week': 7 * 86400
+}
+# 1970-01-05 was a Monday: week buckets start on Mondays (UTC)
+WEEK_ORIGIN = 4 * 86400
+# Days of fine-grained rollups to keep; day and week rollups are kept forever
+RETENTION_DAYS = {
+    'minute': int(os.environ.get('ANALYTICS_MINUTE_RETENTION_DAYS', '2')),
+    'hour': int(os.environ.get('ANALYTICS_HOUR_RETENTION_DAYS', '90'))
+}
+# How often each worker prunes expired rollups, in seconds
+PRUNE_INTERVAL = float(os.environ.get('ANALYTICS_PRUNE_INTERVAL', '3600'))
+
+# Metrics read as "latest value" (summed across accounts) rather than summed over time
+GAUGE_METRICS = {'followers'}
+# Metrics that count as interactions for engagement figures
+INTERACTION_METRICS = ('likes', 'shares', 'comments')
+# Platforms shown on the analytics dashboard
+DASHBOARD_PLATFORMS = ('linkedin', 'twitter', 'instagram')
+
+
+def bucket_start(ts: int, resolution: str) -> int:
+    """Get the start of the bucket containing a UTC epoch timestamp"""
+    size = RESOLUTIONS[resolution]
+    origin = WEEK_ORIGIN if resolution == 'week' else 0
+    return (ts - origin) // size * size + origin
+
+
+class AnalyticsStore:
+    """Engagement and follower time series with incrementally maintained rollups.
+
+    Raw samples are appended to one packed array block per account, metric and
+    day. Every write also merges into minute, hour, day and week rollup rows,
+    so range and aggregate queries only read rollups: a year of daily data is
+    365 rows per account and metric whatever the sample rate was.
+    """
+
+    def __init__(self):
+        self._last_prune = 0.0
+
+    def record(self, account_id: int, platform: str, metric: str, value: float, ts: Optional[int] = None):
+        """Record one sample; the caller commits"""
+        self.record_many([(account_id, platform, metric, value, ts)])
+
+    def record_many(self, samples: Iterable[Tuple[int, str, str, float, Optional[int]]]):
+        """Record (account_id, platform, metric, value, ts) samples; the caller commits.
+
+        Samples are grouped first, so each block and rollup row is written once
+        per call however many samples fall into it.
+        """
+        now = int(time.time())
+        expired = {resolution: now - days * 86400 for resolution, days in RETENTION_DAYS.items()}
+        blocks = {}
+        rollups = {}
+        for account_id, platform, metric, value, ts in samples:
+            ts = int(ts if ts is not None else now)
+            value = float(value)
+
+            block = blocks.setdefault(
+                (account_id, metric, bucket_start(ts, 'day')),
+                (platform, array('q'), array('d'))
+            )
+            block[1].append(ts)
+            block[2].append(value)
+
+            for resolution in RESOLUTIONS:
+                bucket_ts = bucket_start(ts, resolution)
+                # Backfilled samples skip rollups that would be pruned right away
+                if resolution in expired and bucket_ts < expired[resolution]:
+                    continue
+                key = (account_id, metric, resolution, bucket_ts)
+                delta = rollups.get(key)
+                if delta is None:
+                    rollups[key] = [platform, 1, value, value, value, value, ts]
+                    continue
+                delta[1] += 1
+                delta[2] += value
+                delta[3] = min(delta[3], value)
+                delta[4] = max(delta[4], value)
+                if ts >= delta[6]:
+                    delta[5], delta[6] = value, ts
+
+        self._write_blocks(blocks)
+        self._write_rollups(rollups)
+
+        if time.time() - self._last_prune >= PRUNE_INTERVAL:
+            self._last_prune = time.time()
+            self.prune(now)
+
+    def prune(self, now: Optional[int] = None):
+        """Drop fine-grained rollups older than their retention"""
+        now = int(now if now is not None else time.time())
+        for resolution, days in RETENTION_DAYS.items():
+            MetricRollup.query.filter(
+                MetricRollup.resolution == resolution,
+                MetricRollup.bucket_ts < now - days * 86400
+            ).delete(synchronize_session=False)
+
+    def series(self, metric: str, resolution: str, start_ts: int, end_ts: int,
+               platforms: Optional[Iterable[str]] = None) -> Tuple[List[int], Dict[str, array]]:
+        """Get bucket starts in [start_ts, end_ts) and each platform's value per bucket.
+
+        Counters are summed over accounts. Gauges take every account's latest
+        value in the bucket, carried forward over buckets without samples, and
+        are then summed over accounts.
+        """
+        size = RESOLUTIONS[resolution]
+        first = bucket_start(start_ts, resolution)
+        buckets = list(range(first, end_ts, size))
+        filters = [MetricRollup.metric == metric]
+        if platforms is not None:
+            filters.append(MetricRollup.platform.in_(list(platforms)))
+
+        in_range = (
+            *filters,
+            MetricRollup.resolution == resolution,
+            MetricRollup.bucket_ts >= first,
+            MetricRollup.bucket_ts < end_ts
+        )
+
+        result = {}
+        if metric not in GAUGE_METRICS:
+            rows = db.session.query(
+                MetricRollup.platform, MetricRollup.bucket_ts, func.sum(MetricRollup.total)
+            ).filter(*in_range).group_by(MetricRollup.platform, MetricRollup.bucket_ts)
+            for platform, bucket_ts, total in rows:
+                values = result.get(platform)
+                if values is None:
+                    values = result[platform] = array('d', bytes(8 * len(buckets)))
+                values[(bucket_ts - first) // size] = total
+            return buckets, result
+
+        rows = db.session.query(
+            MetricRollup.account_id, MetricRollup.platform, MetricRollup.bucket_ts, MetricRollup.last_value
+        ).filter(*in_range)
+        accounts = {}
+        for account_id, platform, bucket_ts, last_value in rows:
+            if account_id not in accounts:
+                accounts[account_id] = (platform, array('d', [math.nan]) * len(buckets))
+            accounts[account_id][1][(bucket_ts - first) // size] = last_value
+        previous = self._values_before(first, resolution, filters)
+
+        for account_id in set(accounts) | set(previous):
+            platform, values = accounts.get(account_id) or (
+                previous[account_id][0], array('d', [math.nan]) * len(buckets)
+            )
+            carried = previous.get(account_id, (platform, math.nan))[1]
+            totals = result.get(platform)
+            if totals is None:
+                totals = result[platform] = array('d', bytes(8 * len(buckets)))
+            for index, value in enumerate(values):
+                if not math.isnan(value):
+                    carried = value
+                if not math.isnan(carried):
+                    totals[index] += carried
+        return buckets, result
+
+    def totals(self, metrics: Iterable[str], start_ts: int, end_ts: int,
+               platforms: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, float]]:
+        """Sum counter metrics per platform over [start_ts, end_ts) using day rollups"""
+        query = db.session.query(
+            MetricRollup.platform, MetricRollup.metric, func.sum(MetricRollup.total)
+        ).filter(
+            MetricRollup.metric.in_(list(metrics)),
+            MetricRollup.resolution == 'day',
+            MetricRollup.bucket_ts >= bucket_start(start_ts, 'day'),
+            MetricRollup.bucket_ts < end_ts
+        )
+        if platforms is not None:
+            query = query.filter(MetricRollup.platform.in_(list(platforms)))
+
+        totals = {}
+        for platform, metric, total in query.group_by(MetricRollup.platform, MetricRollup.metric):
+            totals.setdefault(platform, {})[metric] = total or 0.0
+        return totals
+
+    def dashboard(self, days: int = 30, now: Optional[int] = None) -> Dict:
+        """Build the /api/analytics payload: follower growth, engagement rates and this week's interactions"""
+        now = int(now if now is not None else time.time())
+        end_ts = bucket_start(now, 'day') + RESOLUTIONS['day']
+        start_ts = end_ts - days * RESOLUTIONS['day']
+
+        buckets, followers = self.series('followers', 'day', start_ts, end_ts, DASHBOARD_PLATFORMS)
+        followers_growth = []
+        if followers:
+            for index, bucket_ts in enumerate(buckets):
+                point = {'date': datetime.fromtimestamp(bucket_ts, timezone.utc).date().isoformat()}
+                for platform in DASHBOARD_PLATFORMS:
+                    point[platform] = int(followers[platform][index]) if platform in followers else 0
+                followers_growth.append(point)
+
+        totals = self.totals(INTERACTION_METRICS + ('impressions',), start_ts, end_ts, DASHBOARD_PLATFORMS)
+        engagement_rates = {}
+        for platform in DASHBOARD_PLATFORMS:
+            metrics = totals.get(platform, {})
+            impressions = metrics.get('impressions', 0.0)
+            interactions = sum(metrics.get(metric, 0.0) for metric in INTERACTION_METRICS)
+            engagement_rates[platform] = round(interactions / impressions * 100, 2) if impressions else 0
+
+        week_start = bucket_start(now, 'week')
+        weekly_interactions = None
+        for metric in INTERACTION_METRICS:
+            _, values = self.series(metric, 'day', week_start, week_start + RESOLUTIONS['week'])
+            for platform_values in values.values():
+                if weekly_interactions is None:
+                    weekly_interactions = array('d', bytes(8 * 7))
+                for index, value in enumerate(platform_values):
+                    weekly_interactions[index] += value
+
+        return {
+            'followers_growth': followers_growth,
+            'engagement_rates': engagement_rates,
+            'weekly_interactions': [int(value) for value in weekly_interactions or ()]
+        }
+
+    def _values_before(self, first: int, resolution: str, filters) -> Dict[int, Tuple[str, float]]:
+        """Get every account's latest gauge value before a bucket, to carry into a range.
+
+        Whole weeks are read from week rollups and only the partial week,
+        day and hour before the bucket from finer ones, so the lookup stays
+        small however much history there is.
+        """
+        values = {}
+        since = None
+        for level in ('week', 'day', 'hour', 'minute'):
+            until = bucket_start(first, level)
+            level_filters = [*filters, MetricRollup.resolution == level, MetricRollup.bucket_ts < until]
+            if since is not None:
+                level_filters.append(MetricRollup.bucket_ts >= since)
+
+            latest = db.session.query(
+                MetricRollup.account_id.label('account_id'),
+                func.max(MetricRollup.bucket_ts).label('bucket_ts')
+            ).filter(*level_filters).group_by(MetricRollup.account_id).subquery()
+            rows = db.session.query(
+                MetricRollup.account_id, MetricRollup.platform, MetricRollup.last_value
+            ).join(latest, and_(
+                MetricRollup.account_id == latest.c.account_id,
+                MetricRollup.bucket_ts == latest.c.bucket_ts
+            )).filter(*level_filters)
+            # Finer levels cover later time, so their values win
+            values.update((account_id, (platform, last_value)) for account_id, platform, last_value in rows)
+
+            if level == resolution:
+                return values
+            since = until
+        return values
+
+    def _write_blocks(self, blocks: Dict[Tuple[int, str, int], Tuple[str, array, array]]):
+        """Append grouped samples to their day blocks, inserting new blocks in bulk"""
+        existing = {}
+        for (metric,), (accounts, first, last) in _key_ranges(blocks).items():
+            for chunk in _chunks(accounts):
+                for block in MetricBlock.query.filter(
+                    MetricBlock.metric == metric,
+                    MetricBlock.account_id.in_(chunk),
+                    MetricBlock.block_ts.between(first, last)
+                ).with_for_update():
+                    existing[(block.account_id, block.metric, block.block_ts)] = block
+
+        new = []
+        for key, (platform, timestamps, values) in blocks.items():
+            block = existing.get(key)
+            if block is not None:
+                self._extend_block(block, timestamps, values)
+                continue
+            new.append({
+                'account_id': key[0], 'metric': key[1], 'block_ts': key[2], 'platform': platform,
+                'timestamps': timestamps.tobytes(), 'samples': values.tobytes()
+            })
+        if new and not self._insert_all(MetricBlock, new):
+            for row in new:
+                key = (row['account_id'], row['metric'], row['block_ts'])
+                self._append_block(key, *blocks[key])
+
+    def _write_rollups(self, rollups: Dict[Tuple[int, str, str, int], list]):
+        """Fold grouped samples into their rollup rows, inserting new rows in bulk"""
+        existing = set()
+        for (metric, resolution), (accounts, first, last) in _key_ranges(rollups).items():
+            for chunk in _chunks(accounts):
+                existing.update(db.session.query(
+                    MetricRollup.account_id, MetricRollup.metric,
+                    MetricRollup.resolution, MetricRollup.bucket_ts
+                ).filter(
+                    MetricRollup.metric == metric,
+                    MetricRollup.resolution == resolution,
+                    MetricRollup.account_id.in_(chunk),
+                    MetricRollup.bucket_ts.between(first, last)
+                ).all())
+
+        new = []
+        for key, delta in rollups.items():
+            if key in existing:
+                self._merge_rollup(key, delta)
+                continue
+            platform, count, total, minimum, maximum, last_value, last_ts = delta
+            new.append({
+                'account_id': key[0], 'metric': key[1], 'resolution': key[2], 'bucket_ts': key[3],
+                'platform': platform, 'count': count, 'total': total, 'minimum': minimum,
+                'maximum': maximum, 'last_value': last_value, 'last_ts': last_ts
+            })
+        if new and not self._insert_all(MetricRollup, new):
+            for row in new:
+                key = (row['account_id'], row['metric'], row['resolution'], row['bucket_ts'])
+                self._merge_rollup(key, rollups[key])
+
+    @staticmethod
+    def _insert_all(model, rows: List[Dict]) -> bool:
+        """Insert rows in one statement; returns False, inserting nothing, if any already exists"""
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(model), rows)
+            return True
+        except IntegrityError:
+            # Another worker created some of the rows first
+            return False
+
+    @staticmethod
+    def _extend_block(block: MetricBlock, timestamps: array, values: array):
+        """Append samples to a loaded block"""
+        stored_timestamps, stored_values = array('q'), array('d')
+        stored_timestamps.frombytes(block.timestamps)
+        stored_values.frombytes(block.samples)
+        stored_timestamps.extend(timestamps)
+        stored_values.extend(values)
+        block.timestamps = stored_timestamps.tobytes()
+        block.samples = stored_values.tobytes()
+
+    def _append_block(self, key: Tuple[int, str, int], platform: str, timestamps: array, values: array):
+        """Append samples to an account's raw block for one day"""
+        account_id, metric, block_ts = key
+        block = MetricBlock.query.filter_by(
+            account_id=account_id, metric=metric, block_ts=block_ts
+        ).with_for_update().first()
+        if block is None:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(MetricBlock(
+                        account_id=account_id, metric=metric, block_ts=block_ts, platform=platform,
+                        timestamps=timestamps.tobytes(), samples=values.tobytes()
+                    ))
+                return
+            except IntegrityError:
+                # Another worker created the block first
+                block = MetricBlock.query.filter_by(
+                    account_id=account_id, metric=metric, block_ts=block_ts
+                ).with_for_update().first()
+        self._extend_block(block, timestamps, values)
+
+    def _merge_rollup(self, key: Tuple[int, str, str, int], delta: list):
+        """Fold a group of samples into a rollup row"""
+        account_id, metric, resolution, bucket_ts = key
+        platform, count, total, minimum, maximum, last_value, last_ts = delta
+        merge = update(MetricRollup).where(
+            MetricRollup.account_id == account_id,
+            MetricRollup.metric == metric,
+            MetricRollup.resolution == resolution,
+            MetricRollup.bucket_ts == bucket_ts
+        ).values(
+            count=MetricRollup.count + count,
+            total=MetricRollup.total + total,
+            minimum=case((MetricRollup.minimum <= minimum, MetricRollup.minimum), else_=minimum),
+            maximum=case((MetricRollup.maximum >= maximum, MetricRollup.maximum), else_=maximum),
+            # SET expressions all see the old row, so last_ts is compared before it changes
+            last_value=case((MetricRollup.last_ts > last_ts, MetricRollup.last_value), else_=last_value),
+            last_ts=case((MetricRollup.last_ts > last_ts, MetricRollup.last_ts), else_=last_ts)
+        ).execution_options(synchronize_session=False)
+
+        if db.session.execute(merge).rowcount:
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(MetricRollup(
+                    account_id=account_id, metric=metric, resolution=resolution, bucket_ts=bucket_ts,
+                    platform=platform, count=count, total=total, minimum=minimum, maximum=maximum,
+                    last_value=last_value, last_ts=last_ts
+                ))
+        except IntegrityError:
+            # Another worker created the row first
+            db.session.execute(merge)
+
+
+def _key_ranges(keys) -> Dict[tuple, Tuple[List[int], int, int]]:
+    """Group (account_id, ..., timestamp) keys by their middle part, with the accounts and time range of each group"""
+    ranges = {}
+    for key in keys:
+        group = key[1:-1]
+        accounts, first, last = ranges.get(group, (set(), key[-1], key[-1]))
+        accounts.add(key[0])
+        ranges[group] = (accounts, min(first, key[-1]), max(last, key[-1]))
+    return {group: (sorted(accounts), first, last) for group, (accounts, first, last) in ranges.items()}
+
+
+def _chunks(items: List, size: int = 500):
+    """Split a list to keep IN clauses within database parameter limits"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# Global analytics store instance
+analytics_store = AnalyticsStore()
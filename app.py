@@ -1,55 +1,73 @@
 import os
 import logging
-import re
-from flask import Flask, render_template, jsonify, request, session, redirect, url_for, flash
+from flask import Flask, Response, render_template, jsonify, request, session, redirect, url_for, flash, stream_with_context, send_file
 from flask_cors import CORS
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from datetime import datetime, timedelta
-import json
+import copy
 import uuid
+import time
+import hmac
+import threading
 from encryption import encryption_service
 from ai_content_generator import content_generator
+from http_client import http_client
+from models import db, ScheduledPost, SocialAccount, AIProvider, PromptSetting, PublishedPost, MediaAsset
+import migrations
+import schedule_index
+from scheduler import publish_scheduler
+from jobs import job_queue
+from publisher import publish_content
+from content_processing import normalize_output
+from drafts import draft_store, MAX_PAGE_SIZE as MAX_DRAFT_PAGE_SIZE
+from ledger import publication_ledger, SHARED_OWNER
+from analytics import analytics_store, RESOLUTIONS as ANALYTICS_RESOLUTIONS
+from metrics_ingestion import metrics_ingestor
+from account_refresh import account_refresher
+from media import media_store, MediaTooLarge, UnsupportedMedia, MEDIA_MAX_BYTES
+from listing import collection_versions, list_response
+from json_provider import init_json
+from compression import response_compressor
+from profiler import request_profiler
+from metrics import metrics, request_metrics, METRICS_ENABLED, METRICS_TOKEN, CONTENT_TYPE as METRICS_CONTENT_TYPE
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging; DEBUG logs every provider payload, so production should use INFO or above
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 
 def process_twitter_content(content):
     """Process Twitter content to extract clean text and hashtags"""
-    # Remove meta-text like "¡Claro Aquí tienes" or "Here's a tweet"
-    meta_phrases = [
-        r'¡claro[^"]*"',
-        r'aquí tienes[^"]*"',
-        r'here\'s[^"]*:',
-        r'here is[^"]*:',
-        r'"[^"]*puedes hacerme[^"]*"',
-        r'tweet sobre[^"]*:',
-        r'contenido[^"]*para twitter[^"]*:'
-    ]
-    
-    cleaned_content = content
-    for phrase in meta_phrases:
-        cleaned_content = re.sub(phrase, '', cleaned_content, flags=re.IGNORECASE)
-    
-    # Extract hashtags
-    hashtag_pattern = r'#\w+'
-    hashtags = re.findall(hashtag_pattern, cleaned_content)
-    
-    # Remove hashtags from main content for cleaner display
-    main_content = re.sub(hashtag_pattern, '', cleaned_content).strip()
-    
-    # Clean up extra quotes and formatting
-    main_content = re.sub(r'^["\'"]*|["\'"]*$', '', main_content).strip()
-    main_content = re.sub(r'\n+', ' ', main_content).strip()
-    
-    # If content is still too meta or empty, create a simple fallback
-    if not main_content or len(main_content) < 10 or 'puedes hacerme' in main_content.lower():
-        main_content = "Contenido generado automáticamente"
-    
-    return main_content, hashtags
+    normalized = normalize_output(content, 'twitter')
+    return normalized.body, normalized.hashtags
 
 # Create Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
+init_json(app)
+# Registered before compression so response sizes are measured as sent
+if METRICS_ENABLED:
+    request_metrics.init_app(app)
+request_profiler.init_app(app)
+response_compressor.init_app(app)
+
+def get_database_url():
+    """Get the database URL (PostgreSQL in production, SQLite for local runs)"""
+    database_url = os.environ.get("DATABASE_URL", "sqlite:///nova.db")
+    # Some hosts still hand out the legacy postgres:// scheme
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+    return database_url
+
+# Configure the database
+app.config["SQLALCHEMY_DATABASE_URI"] = get_database_url()
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+    "pool_recycle": 300,
+    "pool_pre_ping": True,
+}
+db.init_app(app)
+publish_scheduler.init_app(app)
+metrics_ingestor.init_app(app)
+collection_versions.init_app(app)
+job_queue.init_app(app)
 
 # Configure Flask-Login
 login_manager = LoginManager()
@@ -76,73 +94,221 @@ def load_user(user_id):
             return user
     return None
 
-# In-memory storage for social media accounts, AI providers, and scheduled posts
-AI_PROVIDERS = [
+# Providers created on first boot; keys and status are then kept in the database
+DEFAULT_AI_PROVIDERS = [
     {
         "id": 1,
         "name": "openai",
         "display_name": "OpenAI GPT-4o",
-        "encrypted_api_key": None,
-        "status": "disconnected",
         "is_default": False,
-        "model": "gpt-4o",
-        "last_tested": None
+        "model": "gpt-4o"
     },
     {
         "id": 2,
         "name": "gemini",
         "display_name": "Google Gemini 2.5 Flash",
-        "encrypted_api_key": None,
-        "status": "disconnected",
         "is_default": False,
-        "model": "gemini-2.5-flash",
-        "last_tested": None
+        "model": "gemini-2.5-flash"
     },
     {
         "id": 3,
         "name": "perplexity",
         "display_name": "Perplexity Sonar",
-        "encrypted_api_key": None,
-        "status": "disconnected",
         "is_default": True,
-        "model": "llama-3.1-sonar-small-128k-online",
-        "last_tested": None
+        "model": "llama-3.1-sonar-small-128k-online"
     }
 ]
 
+# Environment keys this worker loaded from the database, by the ciphertext they came from
+_INJECTED_PROVIDER_KEYS = {}
+
+def sync_provider_key(provider):
+    """Make a provider's stored API key available to the content generator in this worker"""
+    env_key = f"{provider.name.upper()}_API_KEY"
+    if provider.encrypted_api_key:
+        if _INJECTED_PROVIDER_KEYS.get(env_key) == provider.encrypted_api_key:
+            return
+        # The key was rotated through another worker
+        encryption_service.forget(_INJECTED_PROVIDER_KEYS.get(env_key))
+        try:
+            # Decrypt the API key and set environment variable
+            decrypted_key = encryption_service.decrypt_api_key(provider.encrypted_api_key)
+            if decrypted_key:  # Check if decryption was successful
+                os.environ[env_key] = decrypted_key
+                _INJECTED_PROVIDER_KEYS[env_key] = provider.encrypted_api_key
+        except Exception as e:
+            logging.error(f"Failed to decrypt API key for {provider.name}: {e}")
+            provider.status = 'error'
+    elif env_key in _INJECTED_PROVIDER_KEYS:
+        # The key was removed through another worker
+        os.environ.pop(env_key, None)
+        encryption_service.forget(_INJECTED_PROVIDER_KEYS.pop(env_key))
+
 def initialize_ai_providers():
-    """Initialize AI providers by decrypting stored API keys"""
-    for provider in AI_PROVIDERS:
-        if provider.get('encrypted_api_key'):
-            try:
-                # Decrypt the API key and set environment variable
-                decrypted_key = encryption_service.decrypt_api_key(provider['encrypted_api_key'])
-                if decrypted_key:  # Check if decryption was successful
-                    env_key = f"{provider['name'].upper()}_API_KEY"
-                    os.environ[env_key] = decrypted_key
-                    provider['status'] = 'connected'
-            except Exception as e:
-                logging.error(f"Failed to decrypt API key for {provider['name']}: {e}")
-                provider['status'] = 'error'
+    """Mark providers with a stored API key as connected.
 
-# Initialize AI providers on startup
-initialize_ai_providers()
+    Keys are decrypted by sync_provider_key when a provider is first used,
+    so booting a worker does not derive the encryption key.
+    """
+    for provider in AIProvider.query.filter(AIProvider.encrypted_api_key.isnot(None)):
+        if provider.status not in ('connected', 'error'):
+            provider.status = 'connected'
+    db.session.commit()
 
-SOCIAL_ACCOUNTS = []
+def get_ai_provider(name):
+    """Find an AI provider by name"""
+    return AIProvider.query.filter_by(name=name).first()
 
-SCHEDULED_POSTS = []
+def get_all_ai_providers():
+    """Get all AI providers ordered by id"""
+    return AIProvider.query.order_by(AIProvider.id).all()
 
-MOCK_PENDING_POSTS = []
+def check_ai_provider(provider):
+    """Get the error response for a provider that cannot be used, or None after syncing its key"""
+    ai_provider = get_ai_provider(provider)
+    logging.debug(f"AI Provider found: {ai_provider.to_dict() if ai_provider else None}")
+    
+    if not ai_provider:
+        return jsonify({
+            "status": "error",
+            "error": f"Proveedor {provider} no encontrado",
+            "requires_setup": True,
+            "available_providers": [p.name for p in get_all_ai_providers()]
+        }), 400
+        
+    if ai_provider.status != 'connected':
+        return jsonify({
+            "status": "error",
+            "error": f"Proveedor {provider} no configurado. Estado actual: {ai_provider.status}",
+            "requires_setup": True,
+            "available_providers": [p.name for p in get_all_ai_providers() if p.status == 'connected']
+        }), 400
+    
+    # Other connected providers may be used as failover targets
+    for other in get_all_ai_providers():
+        if other.status == 'connected':
+            sync_provider_key(other)
+    return None
 
-MOCK_ANALYTICS = {
-    "followers_growth": [],
-    "engagement_rates": {
-        "linkedin": 0,
-        "twitter": 0,
-        "instagram": 0
-    },
-    "weekly_interactions": []
-}
+def generation_prompts(topic, platforms):
+    """Build the generation prompt for each platform"""
+    return {platform: f"Crea contenido sobre '{topic}' para {platform}" for platform in platforms}
+
+def new_generation_response(topic, provider):
+    """Start the /api/generate-content response body"""
+    return {
+        "status": "success",
+        "topic": topic,
+        "provider": provider,
+        "content": {},
+        "hashtags": {},
+        "answered_by": {},
+        "generated_at": datetime.now()
+    }
+
+def record_generation_result(response, platform, provider, result):
+    """Add one platform's generation result to the response body"""
+    logging.debug(f"Generation result for {platform}: {result}")
+    
+    if result and result.get('success'):
+        main_content, hashtags_found = normalize_output(result['content'], platform)[:2]
+        response["content"][platform] = main_content
+        response["hashtags"][platform] = hashtags_found
+        response["answered_by"][platform] = result.get('provider', provider)
+        
+        # Add citations if from Perplexity
+        if result.get('provider', provider) == 'perplexity' and 'citations' in result:
+            response["citations"] = result['citations']
+    else:
+        error_msg = result.get('error', 'Error desconocido') if result else 'No se recibió respuesta'
+        logging.error(f"Content generation failed for {platform}: {error_msg}")
+        response["content"][platform] = f"Error generando contenido: {error_msg}"
+        response["hashtags"][platform] = []
+        response["status"] = "error"
+
+def new_adaptation_response(original_content, style, tone, provider):
+    """Start the /api/adapt-content response body"""
+    return {
+        "status": "success",
+        "original_content": original_content,
+        "style": style,
+        "tone": tone,
+        "provider": provider,
+        "adapted_content": {},
+        "answered_by": {},
+        "generated_at": datetime.now()
+    }
+
+def record_adaptation_result(response, platform, provider, result):
+    """Add one platform's adaptation result to the response body"""
+    logging.debug(f"Adaptation result for {platform}: {result}")
+    
+    if result and result.get('success'):
+        main_content, hashtags_found = normalize_output(result['content'], platform)[:2]
+        logging.debug(f"Processed for {platform}: content length={len(main_content)}, hashtags={len(hashtags_found)}")
+        
+        response["adapted_content"][platform] = {
+            "content": main_content,
+            "hashtags": hashtags_found
+        }
+        response["answered_by"][platform] = result.get('provider', provider)
+        
+        # Add citations if from Perplexity
+        if result.get('provider', provider) == 'perplexity' and 'citations' in result:
+            response["citations"] = result['citations']
+    else:
+        error_msg = result.get('error', 'Error desconocido') if result else 'No se recibió respuesta'
+        logging.error(f"Content adaptation failed for {platform}: {error_msg}")
+        response["adapted_content"][platform] = {
+            "content": f"Error adaptando contenido: {error_msg}",
+            "hashtags": []
+        }
+        response["status"] = "error"
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {app.json.dumps(data)}\n\n"
+
+def batch_result_events(generate_batch):
+    """Run a batched generation lazily and report each platform's result as a stream event"""
+    for platform, result in generate_batch().items():
+        yield platform, {'type': 'result', 'result': result}
+
+def stream_platform_events(platform_events, provider, response, record_result, platform_payload):
+    """Relay per-platform generation as SSE: token deltas, each platform's result, then the full response.
+
+    The final 'done' event carries the same body the non-streaming endpoint returns.
+    """
+    try:
+        for platform, event in platform_events:
+            if event['type'] == 'delta':
+                yield sse_event('token', {"platform": platform, "delta": event['text']})
+                continue
+            result = event['result']
+            record_result(response, platform, provider, result)
+            payload = platform_payload(response, platform)
+            payload.update({
+                "platform": platform,
+                "success": bool(result.get('success')),
+                "provider": result.get('provider', provider)
+            })
+            yield sse_event('platform_done' if result.get('success') else 'platform_error', payload)
+        yield sse_event('done', response)
+    except Exception as e:
+        logging.error(f"Exception while streaming content: {str(e)}")
+        yield sse_event('error', {
+            "status": "error",
+            "error": f"Error interno del servidor: {str(e)}"
+        })
+
+def event_stream_response(events):
+    """Wrap an SSE generator in an unbuffered streaming response"""
+    return Response(stream_with_context(events), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+MOCK_PENDING_POSTS = []
 
 # Authentication routes
 @app.route('/login', methods=['GET', 'POST'])
@@ -169,7 +335,7 @@ def logout():
     """Logout user - supports both GET and POST requests"""
     if current_user.is_authenticated:
         logout_user()
-        session.clear()  # Clear all session data including drafts
+        session.clear()  # Clear all session data
         
         # Handle different request types
         if request.method == 'POST':
@@ -186,26 +352,40 @@ def logout():
         else:
             return redirect(url_for('login'))
 
+@app.before_request
+def start_background_services():
+    """Boot this process and start its background threads once it serves requests"""
+    boot()
+    publish_scheduler.start()
+    metrics_ingestor.start()
+    job_queue.start()
+
 @app.route('/')
 @login_required
 def index():
     """Main dashboard page"""
     return render_template('index.html')
 
+def id_ordered_page(model):
+    """Build the page loader of a collection listed by ascending id"""
+    def load(after_id, limit):
+        query = model.query
+        if after_id is not None:
+            query = query.filter(model.id > after_id)
+        return query.order_by(model.id).limit(limit).all()
+    return load
+
 @app.route('/api/posts')
 def get_posts():
-    """Get all scheduled posts"""
-    return jsonify(SCHEDULED_POSTS)
+    """Get scheduled posts (paginated with ?limit=&cursor=, trimmed with ?fields=)"""
+    return list_response('scheduled_posts', id_ordered_page(ScheduledPost))
 
 @app.route('/api/posts/today')
 @login_required
 def get_today_posts():
     """Get posts scheduled for today"""
-    today = datetime.now().date()
-    today_posts = [
-        post for post in SCHEDULED_POSTS 
-        if datetime.fromisoformat(post['scheduled_date'].replace('Z', '+00:00')).date() == today
-    ]
+    start_ts, end_ts = schedule_index.day_window(schedule_index.today())
+    today_posts = [post.to_dict() for post in schedule_index.posts_in_window(start_ts, end_ts)]
     return jsonify(today_posts)
 
 @app.route('/api/posts/pending')
@@ -217,8 +397,54 @@ def get_pending_posts():
 @app.route('/api/analytics')
 @login_required
 def get_analytics():
-    """Get analytics data"""
-    return jsonify(MOCK_ANALYTICS)
+    """Get follower growth, engagement rates and this week's interactions"""
+    try:
+        days = max(1, min(366, request.args.get('days', 30, type=int)))
+        return jsonify(analytics_store.dashboard(days))
+    except Exception as e:
+        logging.error(f"Error getting analytics: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/analytics/series')
+@login_required
+def get_analytics_series():
+    """Get one metric per platform over a time range, from its rollups"""
+    try:
+        metric = request.args.get('metric', 'followers')
+        resolution = request.args.get('resolution', 'day')
+        if resolution not in ANALYTICS_RESOLUTIONS:
+            return jsonify({
+                'success': False,
+                'error': f'Resolución no válida: {resolution}'
+            }), 400
+        end_ts = request.args.get('end', int(time.time()), type=int)
+        start_ts = request.args.get('start', end_ts - 30 * 86400, type=int)
+        # Keep responses bounded whatever range is asked for
+        if (end_ts - start_ts) // ANALYTICS_RESOLUTIONS[resolution] > 5000:
+            return jsonify({
+                'success': False,
+                'error': 'Rango demasiado amplio para la resolución solicitada'
+            }), 400
+        platform = request.args.get('platform')
+        buckets, values = analytics_store.series(
+            metric, resolution, start_ts, end_ts, [platform] if platform else None
+        )
+        return jsonify({
+            'success': True,
+            'metric': metric,
+            'resolution': resolution,
+            'buckets': buckets,
+            'series': {name: list(platform_values) for name, platform_values in values.items()}
+        })
+    except Exception as e:
+        logging.error(f"Error getting analytics series: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
 @app.route('/api/generate-content', methods=['POST'])
 @login_required
@@ -229,94 +455,29 @@ def generate_content():
         topic = data.get('topic', 'tecnología')
         platforms = data.get('platforms', ['linkedin'])
         provider = data.get('provider', 'openai')
+        use_cache = not data.get('bypass_cache', False)
+        batch = bool(data.get('batch', False))
         
         # Check if provider has API key configured
-        ai_provider = next((p for p in AI_PROVIDERS if p['name'] == provider), None)
-        logging.debug(f"AI Provider found: {ai_provider}")
-        
-        if not ai_provider:
-            return jsonify({
-                "status": "error",
-                "error": f"Proveedor {provider} no encontrado",
-                "requires_setup": True,
-                "available_providers": [p['name'] for p in AI_PROVIDERS]
-            }), 400
-            
-        if ai_provider['status'] != 'connected':
-            return jsonify({
-                "status": "error",
-                "error": f"Proveedor {provider} no configurado. Estado actual: {ai_provider['status']}",
-                "requires_setup": True,
-                "available_providers": [p['name'] for p in AI_PROVIDERS if p['status'] == 'connected']
-            }), 400
-        
-        # Generate content for each platform
-        response = {
-            "status": "success",
-            "topic": topic,
-            "provider": provider,
-            "content": {},
-            "hashtags": {},
-            "generated_at": datetime.now().isoformat()
-        }
+        provider_error = check_ai_provider(provider)
+        if provider_error:
+            return provider_error
+        
+        # Run every platform's generation at the same time
+        response = new_generation_response(topic, provider)
+        prompts = generation_prompts(topic, platforms)
+        logging.debug(f"Generating content for {list(prompts)} with provider {provider}")
+        if batch:
+            # One structured request for every platform, per-platform calls for anything it misses
+            requirements = {platform: content_generator.platform_requirements(platform) for platform in prompts}
+            results = content_generator.generate_content_batch(
+                f"Tema: {topic}", requirements, prompts, provider, use_cache
+            )
+        else:
+            results = content_generator.generate_content_for_platforms(prompts, provider, use_cache)
         
-        for platform in platforms:
-            prompt = f"Crea contenido sobre '{topic}' para {platform}"
-            logging.debug(f"Generating content for {platform} with provider {provider}")
-            
-            result = content_generator.generate_content(prompt, platform, provider)
-            logging.debug(f"Generation result for {platform}: {result}")
-            
-            if result and result.get('success'):
-                content = result['content']
-                
-                # Special processing for Twitter
-                if platform == 'twitter':
-                    main_content, hashtags_found = process_twitter_content(content)
-                elif platform == 'web':
-                    # For web content, extract hashtags from the end
-                    lines = content.split('\n')
-                    hashtag_lines = []
-                    content_lines = []
-                    
-                    for line in lines:
-                        if line.strip().startswith('#') or '**#' in line:
-                            hashtag_lines.append(line.strip())
-                        else:
-                            content_lines.append(line)
-                    
-                    main_content = '\n'.join(content_lines).strip()
-                    
-                    # Extract hashtags from hashtag lines
-                    hashtags_found = []
-                    for line in hashtag_lines:
-                        hashtags = re.findall(r'#\w+', line)
-                        hashtags_found.extend(hashtags)
-                    
-                    # Remove duplicates while preserving order
-                    hashtags_found = list(dict.fromkeys(hashtags_found))
-                else:
-                    # Extract hashtags from content if present
-                    if '#' in content:
-                        parts = content.split('#')
-                        main_content = parts[0].strip()
-                        hashtags_found = ['#' + tag.split()[0] for tag in parts[1:] if tag.strip()]
-                    else:
-                        main_content = content
-                        hashtags_found = []
-                
-                response["content"][platform] = main_content
-                response["hashtags"][platform] = hashtags_found
-                
-                # Add citations if from Perplexity
-                if provider == 'perplexity' and 'citations' in result:
-                    response["citations"] = result['citations']
-            else:
-                error_msg = result.get('error', 'Error desconocido') if result else 'No se recibió respuesta'
-                logging.error(f"Content generation failed for {platform}: {error_msg}")
-                response["content"][platform] = f"Error generando contenido: {error_msg}"
-                response["hashtags"][platform] = []
-                response["status"] = "error"
+        for platform in prompts:
+            record_generation_result(response, platform, provider, results.get(platform))
         
         logging.debug(f"Final response: {response}")
         return jsonify(response)
@@ -328,17 +489,72 @@ def generate_content():
             "error": f"Error interno del servidor: {str(e)}"
         }), 500
 
+@app.route('/api/generate-content/stream', methods=['POST'])
+@login_required
+def generate_content_stream():
+    """Stream generated content per platform as server-sent events"""
+    try:
+        data = request.get_json()
+        topic = data.get('topic', 'tecnología')
+        platforms = data.get('platforms', ['linkedin'])
+        provider = data.get('provider', 'openai')
+        use_cache = not data.get('bypass_cache', False)
+        batch = bool(data.get('batch', False))
+        
+        provider_error = check_ai_provider(provider)
+        if provider_error:
+            return provider_error
+        
+        response = new_generation_response(topic, provider)
+        prompts = generation_prompts(topic, platforms)
+    except Exception as e:
+        logging.error(f"Exception in generate_content_stream: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "error": f"Error interno del servidor: {str(e)}"
+        }), 500
+    
+    if batch:
+        requirements = {platform: content_generator.platform_requirements(platform) for platform in prompts}
+        platform_events = batch_result_events(lambda: content_generator.generate_content_batch(
+            f"Tema: {topic}", requirements, prompts, provider, use_cache
+        ))
+    else:
+        platform_events = content_generator.stream_content_for_platforms(prompts, provider, use_cache)
+    
+    return event_stream_response(stream_platform_events(
+        platform_events, provider, response, record_generation_result,
+        lambda body, platform: {"content": body["content"][platform], "hashtags": body["hashtags"][platform]}
+    ))
+
 @app.route('/api/ai-providers/status', methods=['GET'])
 @login_required
 def get_ai_providers_status():
     """Get current status of all AI providers"""
     return jsonify({
-        "providers": AI_PROVIDERS,
+        "providers": [p.to_dict() for p in get_all_ai_providers()],
         "environment_keys": {
             "openai": bool(os.environ.get('OPENAI_API_KEY')),
             "gemini": bool(os.environ.get('GEMINI_API_KEY')),
             "perplexity": bool(os.environ.get('PERPLEXITY_API_KEY'))
-        }
+        },
+        "health": content_generator.stats.snapshot()
+    })
+
+@app.route('/api/ai-cache/stats', methods=['GET'])
+@login_required
+def get_ai_cache_stats():
+    """Get AI response cache hit/miss counters"""
+    return jsonify(content_generator.cache.stats())
+
+@app.route('/api/ai-cache', methods=['DELETE'])
+@login_required
+def clear_ai_cache():
+    """Drop every cached AI response"""
+    content_generator.cache.clear()
+    return jsonify({
+        "status": "success",
+        "message": "Caché de contenido IA vaciada"
     })
 
 # Default prompt configurations
@@ -358,8 +574,84 @@ DEFAULT_PROMPTS = {
     }
 }
 
-# Store prompt settings in memory (in production, use database)
-PROMPT_SETTINGS = DEFAULT_PROMPTS.copy()
+def load_prompt_settings():
+    """Get the current prompt settings from the database"""
+    settings = copy.deepcopy(DEFAULT_PROMPTS)
+    for setting in PromptSetting.query.all():
+        settings[setting.key] = setting.value
+    return settings
+
+def save_prompt_setting(key, value):
+    """Store a single prompt setting"""
+    setting = db.session.get(PromptSetting, key)
+    if setting is None:
+        db.session.add(PromptSetting(key=key, value=value))
+    else:
+        setting.value = value
+    db.session.commit()
+
+def seed_defaults():
+    """Create the default AI providers, prompt settings and collection versions if missing"""
+    existing_providers = {name for (name,) in db.session.query(AIProvider.name)}
+    for defaults in DEFAULT_AI_PROVIDERS:
+        if defaults['name'] not in existing_providers:
+            db.session.add(AIProvider(status='disconnected', **defaults))
+    
+    existing_settings = {key for (key,) in db.session.query(PromptSetting.key)}
+    for key, value in DEFAULT_PROMPTS.items():
+        if key not in existing_settings:
+            db.session.add(PromptSetting(key=key, value=copy.deepcopy(value)))
+    collection_versions.seed()
+    db.session.commit()
+
+# Process that has run boot(); a forked worker boots again
+_booted_pid = None
+_boot_lock = threading.Lock()
+
+def boot():
+    """Bring the schema up to date, seed defaults and settle provider status, once per process.
+
+    Runs on the first request rather than at import, so importing the app
+    (e.g. with gunicorn --preload) opens no database connection before fork.
+    """
+    global _booted_pid
+    if _booted_pid == os.getpid():
+        return
+    with _boot_lock:
+        if _booted_pid == os.getpid():
+            return
+        with app.app_context():
+            migrations.upgrade()
+            seed_defaults()
+            initialize_ai_providers()
+        _booted_pid = os.getpid()
+
+def prewarm_connections():
+    """Boot this worker and open its database and AI provider connections before the first request"""
+    boot()
+    with app.app_context():
+        db.session.execute(db.select(1))
+        urls = [
+            content_generator.provider_configs[provider.name]['api_url']
+            for provider in get_all_ai_providers()
+            if provider.status == 'connected' and provider.name in content_generator.provider_configs
+        ]
+        db.session.remove()
+    http_client.warm(urls)
+
+@app.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Apply pending database migrations"""
+    migrations.upgrade()
+    seed_defaults()
+    print(f"Database at schema version {migrations.current_version()}")
+
+@app.cli.command('ingest-metrics')
+def ingest_metrics_command():
+    """Refresh the engagement metrics of every due published post once"""
+    boot()
+    stats = metrics_ingestor.run_once()
+    print(f"Metrics ingestion: {stats}")
 
 @app.route('/api/prompt-settings', methods=['GET'])
 @login_required
@@ -367,7 +659,7 @@ def get_prompt_settings():
     """Get current prompt settings"""
     return jsonify({
         "success": True,
-        "settings": PROMPT_SETTINGS
+        "settings": load_prompt_settings()
     })
 
 @app.route('/api/prompt-settings/system', methods=['POST'])
@@ -384,7 +676,7 @@ def update_system_prompt():
                 "error": "El prompt del sistema no puede estar vacío"
             }), 400
         
-        PROMPT_SETTINGS['system_prompt'] = system_prompt
+        save_prompt_setting('system_prompt', system_prompt)
         logging.info(f"System prompt updated: {system_prompt[:100]}...")
         
         return jsonify({
@@ -422,7 +714,9 @@ def update_platform_prompts():
                     "error": f"El prompt para {platform} no puede estar vacío"
                 }), 400
         
-        PROMPT_SETTINGS['platform_prompts'].update(platform_prompts)
+        merged_prompts = dict(load_prompt_settings()['platform_prompts'])
+        merged_prompts.update(platform_prompts)
+        save_prompt_setting('platform_prompts', merged_prompts)
         logging.info(f"Platform prompts updated for: {list(platform_prompts.keys())}")
         
         return jsonify({
@@ -460,7 +754,9 @@ def update_tone_prompts():
                     "error": f"El prompt para el tono {tone} no puede estar vacío"
                 }), 400
         
-        PROMPT_SETTINGS['tone_prompts'].update(tone_prompts)
+        merged_prompts = dict(load_prompt_settings()['tone_prompts'])
+        merged_prompts.update(tone_prompts)
+        save_prompt_setting('tone_prompts', merged_prompts)
         logging.info(f"Tone prompts updated for: {list(tone_prompts.keys())}")
         
         return jsonify({
@@ -480,14 +776,14 @@ def update_tone_prompts():
 def reset_prompts_to_default():
     """Reset all prompts to default values"""
     try:
-        global PROMPT_SETTINGS
-        PROMPT_SETTINGS = DEFAULT_PROMPTS.copy()
+        for key, value in DEFAULT_PROMPTS.items():
+            save_prompt_setting(key, copy.deepcopy(value))
         logging.info("All prompts reset to default values")
         
         return jsonify({
             "success": True,
             "message": "Todos los prompts han sido restaurados a sus valores predeterminados",
-            "settings": PROMPT_SETTINGS
+            "settings": load_prompt_settings()
         })
         
     except Exception as e:
@@ -510,6 +806,8 @@ def adapt_content():
         platforms = data.get('platforms', [])
         provider = data.get('provider', 'perplexity')
         focus = data.get('focus', 'engagement')
+        use_cache = not data.get('bypass_cache', False)
+        batch = bool(data.get('batch', False))
         
         if not original_content:
             return jsonify({
@@ -524,136 +822,127 @@ def adapt_content():
             }), 400
         
         # Check if provider has API key configured
-        ai_provider = next((p for p in AI_PROVIDERS if p['name'] == provider), None)
-        logging.debug(f"AI Provider found: {ai_provider}")
+        provider_error = check_ai_provider(provider)
+        if provider_error:
+            return provider_error
+        
+        # Create adaptation prompts and run them concurrently
+        response = new_adaptation_response(original_content, style, tone, provider)
+        prompts = {
+            platform: create_adaptation_prompt(original_content, platform, style, tone, focus)
+            for platform in platforms
+        }
+        logging.debug(f"Adapting content for {list(prompts)} with provider {provider}")
+        if batch:
+            results = content_generator.generate_content_batch(
+                create_adaptation_batch_task(original_content, style, tone, focus),
+                adaptation_requirements(prompts), prompts, provider, use_cache
+            )
+        else:
+            results = content_generator.generate_content_for_platforms(prompts, provider, use_cache)
+        
+        for platform in prompts:
+            record_adaptation_result(response, platform, provider, results.get(platform))
+        
+        logging.debug(f"Final adaptation response: {response}")
+        return jsonify(response)
         
-        if not ai_provider:
+    except Exception as e:
+        logging.error(f"Exception in adapt_content: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "error": f"Error interno del servidor: {str(e)}"
+        }), 500
+
+@app.route('/api/adapt-content/stream', methods=['POST'])
+@login_required
+def adapt_content_stream():
+    """Stream adapted content per platform as server-sent events"""
+    try:
+        data = request.get_json()
+        
+        original_content = data.get('original_content', '').strip()
+        style = data.get('style', 'summary')
+        tone = data.get('tone', 'professional')
+        platforms = data.get('platforms', [])
+        provider = data.get('provider', 'perplexity')
+        focus = data.get('focus', 'engagement')
+        use_cache = not data.get('bypass_cache', False)
+        batch = bool(data.get('batch', False))
+        
+        if not original_content:
             return jsonify({
                 "status": "error",
-                "error": f"Proveedor {provider} no encontrado",
-                "requires_setup": True,
-                "available_providers": [p['name'] for p in AI_PROVIDERS]
+                "error": "El contenido original es requerido"
             }), 400
             
-        if ai_provider['status'] != 'connected':
+        if not platforms:
             return jsonify({
-                "status": "error",
-                "error": f"Proveedor {provider} no configurado. Estado actual: {ai_provider['status']}",
-                "requires_setup": True,
-                "available_providers": [p['name'] for p in AI_PROVIDERS if p['status'] == 'connected']
+                "status": "error", 
+                "error": "Selecciona al menos una plataforma"
             }), 400
         
-        # Generate adapted content for each platform
-        response = {
-            "status": "success",
-            "original_content": original_content,
-            "style": style,
-            "tone": tone,
-            "provider": provider,
-            "adapted_content": {},
-            "generated_at": datetime.now().isoformat()
-        }
-        
-        for platform in platforms:
-            logging.debug(f"Adapting content for {platform} with provider {provider}")
-            
-            # Create adaptation prompt
-            adaptation_prompt = create_adaptation_prompt(original_content, platform, style, tone, focus)
-            
-            result = content_generator.generate_content(adaptation_prompt, platform, provider)
-            logging.debug(f"Adaptation result for {platform}: {result}")
-            
-            if result and result.get('success'):
-                content = result['content']
-                logging.debug(f"Raw content for {platform}: {content}")
-                
-                # Special processing for Twitter
-                if platform == 'twitter':
-                    main_content, hashtags_found = process_twitter_content(content)
-                else:
-                    # Simplified hashtag extraction - preserve content integrity
-                    main_content = content
-                    hashtags_found = []
-                    
-                    # Extract hashtags from the end of content or separate lines
-                    if '#' in content:
-                        lines = content.split('\n')
-                        # Check last few lines for hashtags
-                        for i in range(len(lines)-1, -1, -1):
-                            line = lines[i].strip()
-                            if line and all(word.startswith('#') or not word for word in line.split()):
-                                # This line contains only hashtags
-                                hashtags_found.extend([tag for tag in line.split() if tag.startswith('#')])
-                                lines.pop(i)
-                            elif line:
-                                break
-                        
-                        # Rebuild main content without hashtag-only lines
-                        main_content = '\n'.join(lines).strip()
-                
-                logging.debug(f"Processed for {platform}: content length={len(main_content)}, hashtags={len(hashtags_found)}")
-                
-                response["adapted_content"][platform] = {
-                    "content": main_content,
-                    "hashtags": hashtags_found
-                }
-                
-                # Add citations if from Perplexity
-                if provider == 'perplexity' and 'citations' in result:
-                    response["citations"] = result['citations']
-            else:
-                error_msg = result.get('error', 'Error desconocido') if result else 'No se recibió respuesta'
-                logging.error(f"Content adaptation failed for {platform}: {error_msg}")
-                response["adapted_content"][platform] = {
-                    "content": f"Error adaptando contenido: {error_msg}",
-                    "hashtags": []
-                }
-                response["status"] = "error"
-        
-        logging.debug(f"Final adaptation response: {response}")
-        return jsonify(response)
+        provider_error = check_ai_provider(provider)
+        if provider_error:
+            return provider_error
         
+        response = new_adaptation_response(original_content, style, tone, provider)
+        prompts = {
+            platform: create_adaptation_prompt(original_content, platform, style, tone, focus)
+            for platform in platforms
+        }
     except Exception as e:
-        logging.error(f"Exception in adapt_content: {str(e)}")
+        logging.error(f"Exception in adapt_content_stream: {str(e)}")
         return jsonify({
             "status": "error",
             "error": f"Error interno del servidor: {str(e)}"
         }), 500
+    
+    if batch:
+        platform_events = batch_result_events(lambda: content_generator.generate_content_batch(
+            create_adaptation_batch_task(original_content, style, tone, focus),
+            adaptation_requirements(prompts), prompts, provider, use_cache
+        ))
+    else:
+        platform_events = content_generator.stream_content_for_platforms(prompts, provider, use_cache)
+    
+    return event_stream_response(stream_platform_events(
+        platform_events, provider, response, record_adaptation_result,
+        lambda body, platform: dict(body["adapted_content"][platform])
+    ))
+
+# Style descriptions
+ADAPTATION_STYLES = {
+    'summary': 'un resumen conciso y atractivo',
+    'highlights': 'los puntos clave más importantes',
+    'questions': 'preguntas engaging que generen interacción',
+    'story': 'formato de historia narrativa',
+    'tips': 'tips o consejos prácticos'
+}
+
+# Focus descriptions
+ADAPTATION_FOCUS = {
+    'engagement': 'máximo engagement e interacción',
+    'information': 'valor informativo y educativo',
+    'viral': 'potencial viral y compartible',
+    'educational': 'contenido educativo y formativo'
+}
+
+# Platform-specific adaptations
+ADAPTATION_PLATFORM_SPECS = {
+    'twitter': 'Tweet de máximo 280 caracteres con 2 hashtags relevantes',
+    'linkedin': 'Post profesional de LinkedIn (hasta 3000 caracteres) con 3 hashtags',
+    'instagram': 'Post de Instagram visual y atractivo (hasta 2200 caracteres) con 10 hashtags',
+    'facebook': 'Post de Facebook conversacional (hasta 63000 caracteres) con 2 hashtags',
+    'youtube': 'Descripción de YouTube detallada (hasta 5000 caracteres) con 5 hashtags',
+    'web': 'Artículo web estructurado con títulos y subtítulos (hasta 5000 caracteres)'
+}
 
 def create_adaptation_prompt(original_content, platform, style, tone, focus):
     """Create a specific prompt for content adaptation"""
-    
-    # Style descriptions
-    style_descriptions = {
-        'summary': 'un resumen conciso y atractivo',
-        'highlights': 'los puntos clave más importantes',
-        'questions': 'preguntas engaging que generen interacción',
-        'story': 'formato de historia narrativa',
-        'tips': 'tips o consejos prácticos'
-    }
-    
-    # Focus descriptions
-    focus_descriptions = {
-        'engagement': 'máximo engagement e interacción',
-        'information': 'valor informativo y educativo',
-        'viral': 'potencial viral y compartible',
-        'educational': 'contenido educativo y formativo'
-    }
-    
-    style_desc = style_descriptions.get(style, 'contenido adaptado')
-    focus_desc = focus_descriptions.get(focus, 'engagement')
-    
-    # Platform-specific adaptations
-    platform_specs = {
-        'twitter': 'Tweet de máximo 280 caracteres con 2 hashtags relevantes',
-        'linkedin': 'Post profesional de LinkedIn (hasta 3000 caracteres) con 3 hashtags',
-        'instagram': 'Post de Instagram visual y atractivo (hasta 2200 caracteres) con 10 hashtags',
-        'facebook': 'Post de Facebook conversacional (hasta 63000 caracteres) con 2 hashtags',
-        'youtube': 'Descripción de YouTube detallada (hasta 5000 caracteres) con 5 hashtags',
-        'web': 'Artículo web estructurado con títulos y subtítulos (hasta 5000 caracteres)'
-    }
-    
-    platform_spec = platform_specs.get(platform, 'contenido para redes sociales')
+    style_desc = ADAPTATION_STYLES.get(style, 'contenido adaptado')
+    focus_desc = ADAPTATION_FOCUS.get(focus, 'engagement')
+    platform_spec = ADAPTATION_PLATFORM_SPECS.get(platform, 'contenido para redes sociales')
     
     prompt = f"""
 Adapta el siguiente contenido original para crear {style_desc} optimizado para {platform_spec}.
@@ -675,6 +964,32 @@ Genera ÚNICAMENTE el contenido adaptado listo para publicar.
     
     return prompt
 
+def create_adaptation_batch_task(original_content, style, tone, focus):
+    """Create the shared part of a batched adaptation prompt; the original content is sent once"""
+    style_desc = ADAPTATION_STYLES.get(style, 'contenido adaptado')
+    focus_desc = ADAPTATION_FOCUS.get(focus, 'engagement')
+    
+    return f"""
+Adapta el siguiente contenido original para crear {style_desc} en varias plataformas.
+
+CONTENIDO ORIGINAL:
+{original_content}
+
+INSTRUCCIONES:
+- Crea {style_desc} del contenido original
+- Tono: {tone}
+- Enfoque: {focus_desc}
+- Mantén la información clave y el valor del contenido original
+- Haz cada publicación nativa y natural para su plataforma
+"""
+
+def adaptation_requirements(platforms):
+    """Per-platform requirements for a batched adaptation"""
+    return {
+        platform: ADAPTATION_PLATFORM_SPECS.get(platform, 'contenido para redes sociales')
+        for platform in platforms
+    }
+
 @app.route('/api/posts/approve/<int:post_id>', methods=['POST'])
 @login_required
 def approve_post(post_id):
@@ -703,26 +1018,38 @@ def schedule_post():
             if field not in data:
                 return jsonify({"error": f"Missing required field: {field}"}), 400
         
-        # Create new post
-        new_post = {
-            "id": len(SCHEDULED_POSTS) + len(MOCK_PENDING_POSTS) + 1,
-            "title": data['title'],
-            "content": data['content'],
-            "platform": data['platform'],
-            "scheduled_date": data['scheduled_date'],
-            "status": "scheduled",
-            "engagement": 0,
-            "reach": 0,
-            "created_at": datetime.now().isoformat(),
-            "timezone": data.get('timezone', 'UTC')
-        }
+        try:
+            scheduled_ts = schedule_index.to_utc_timestamp(data['scheduled_date'], data.get('timezone', 'UTC'))
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid scheduled_date"}), 400
         
-        SCHEDULED_POSTS.append(new_post)
+        media_ids = data.get('media_ids') or None
+        if media_ids and media_store.get_many(media_ids) is None:
+            return jsonify({"error": "Media not found"}), 400
+        
+        # Create new post
+        new_post = ScheduledPost(
+            title=data['title'],
+            content=data['content'],
+            platform=data['platform'],
+            scheduled_date=data['scheduled_date'],
+            scheduled_ts=scheduled_ts,
+            status="scheduled",
+            engagement=0,
+            reach=0,
+            created_at=datetime.now(),
+            timezone=data.get('timezone', 'UTC'),
+            media_ids=media_ids
+        )
+        
+        db.session.add(new_post)
+        db.session.commit()
+        publish_scheduler.notify(new_post.id, new_post.scheduled_ts)
         
         return jsonify({
             "status": "success", 
             "message": "Post scheduled successfully",
-            "post": new_post
+            "post": new_post.to_dict()
         }), 201
         
     except Exception as e:
@@ -736,27 +1063,42 @@ def update_scheduled_post(post_id):
         data = request.get_json()
         
         # Find the post
-        post_index = None
-        for i, post in enumerate(SCHEDULED_POSTS):
-            if post['id'] == post_id:
-                post_index = i
-                break
+        post = db.session.get(ScheduledPost, post_id)
         
-        if post_index is None:
+        if post is None:
             return jsonify({"error": "Post not found"}), 404
         
+        if data.get('media_ids') and media_store.get_many(data['media_ids']) is None:
+            return jsonify({"error": "Media not found"}), 400
+        
         # Update the post
-        post = SCHEDULED_POSTS[post_index]
         for field in ['title', 'content', 'platform', 'scheduled_date', 'timezone']:
             if field in data:
-                post[field] = data[field]
+                setattr(post, field, data[field])
+        if 'media_ids' in data:
+            post.media_ids = data['media_ids'] or None
         
-        post['updated_at'] = datetime.now().isoformat()
+        if 'scheduled_date' in data or 'timezone' in data:
+            try:
+                post.scheduled_ts = schedule_index.to_utc_timestamp(post.scheduled_date, post.timezone)
+            except (TypeError, ValueError):
+                return jsonify({"error": "Invalid scheduled_date"}), 400
+            
+            # Rescheduling gives a post that could not be published a fresh start
+            if post.status in ('retrying', 'failed'):
+                post.status = 'scheduled'
+                post.attempts = 0
+                post.next_attempt_ts = None
+                post.last_error = None
+        
+        post.updated_at = datetime.now()
+        db.session.commit()
+        publish_scheduler.notify(post.id, post.scheduled_ts if post.status == 'scheduled' else None)
         
         return jsonify({
             "status": "success",
             "message": "Post updated successfully",
-            "post": post
+            "post": post.to_dict()
         })
         
     except Exception as e:
@@ -768,16 +1110,18 @@ def delete_scheduled_post(post_id):
     """Delete a scheduled post"""
     try:
         # Find and remove the post
-        for i, post in enumerate(SCHEDULED_POSTS):
-            if post['id'] == post_id:
-                deleted_post = SCHEDULED_POSTS.pop(i)
-                return jsonify({
-                    "status": "success",
-                    "message": "Post deleted successfully",
-                    "post": deleted_post
-                })
+        post = db.session.get(ScheduledPost, post_id)
+        if post is None:
+            return jsonify({"error": "Post not found"}), 404
         
-        return jsonify({"error": "Post not found"}), 404
+        deleted_post = post.to_dict()
+        db.session.delete(post)
+        db.session.commit()
+        return jsonify({
+            "status": "success",
+            "message": "Post deleted successfully",
+            "post": deleted_post
+        })
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -787,24 +1131,24 @@ def delete_scheduled_post(post_id):
 def get_calendar_posts(year, month):
     """Get posts for a specific month for calendar view"""
     try:
-        # Filter posts for the specified month
-        start_date = datetime(year, month, 1)
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1)
-        else:
-            end_date = datetime(year, month + 1, 1)
-        
-        calendar_posts = []
-        for post in SCHEDULED_POSTS:
-            post_date = datetime.fromisoformat(post['scheduled_date'].replace('Z', '+00:00'))
-            if start_date <= post_date < end_date:
-                calendar_posts.append({
-                    "id": post['id'],
-                    "title": post['title'],
-                    "platform": post['platform'],
-                    "scheduled_date": post['scheduled_date'],
-                    "status": post['status']
-                })
+        # Load only the columns the calendar needs for the specified month
+        start_ts, end_ts = schedule_index.month_window(year, month)
+        rows = schedule_index.posts_in_window(
+            start_ts, end_ts,
+            ScheduledPost.id, ScheduledPost.title, ScheduledPost.platform,
+            ScheduledPost.scheduled_date, ScheduledPost.status
+        )
+        
+        calendar_posts = [
+            {
+                "id": row.id,
+                "title": row.title,
+                "platform": row.platform,
+                "scheduled_date": row.scheduled_date,
+                "status": row.status
+            }
+            for row in rows
+        ]
         
         return jsonify({
             "year": year,
@@ -818,31 +1162,47 @@ def get_calendar_posts(year, month):
 @app.route('/api/posts/upcoming')
 @login_required
 def get_upcoming_posts():
-    """Get posts scheduled for the next 7 days"""
+    """Get posts scheduled for the next 7 days (or ?days=N)"""
     try:
-        now = datetime.now()
-        week_later = now + timedelta(days=7)
+        days = request.args.get('days', 7, type=int)
         
-        upcoming_posts = []
-        for post in SCHEDULED_POSTS:
-            post_date = datetime.fromisoformat(post['scheduled_date'].replace('Z', '+00:00'))
-            if now <= post_date <= week_later:
-                upcoming_posts.append(post)
-        
-        # Sort by scheduled date
-        upcoming_posts.sort(key=lambda x: x['scheduled_date'])
+        # Posts come back already sorted by scheduled time
+        start_ts, end_ts = schedule_index.upcoming_window(days)
+        upcoming_posts = [post.to_dict() for post in schedule_index.posts_in_window(start_ts, end_ts)]
         
         return jsonify(upcoming_posts)
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/posts/range')
+@login_required
+def get_posts_in_range():
+    """Get posts scheduled between the ISO dates in ?start= and ?end="""
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        if not start or not end:
+            return jsonify({"error": "start and end are required"}), 400
+        
+        try:
+            start_ts = schedule_index.to_utc_timestamp(start, schedule_index.CALENDAR_TIMEZONE)
+            end_ts = schedule_index.to_utc_timestamp(end, schedule_index.CALENDAR_TIMEZONE)
+        except ValueError:
+            return jsonify({"error": "Invalid start or end date"}), 400
+        
+        posts = [post.to_dict() for post in schedule_index.posts_in_window(start_ts, end_ts)]
+        return jsonify(posts)
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # Social Media Account Management Endpoints
 @app.route('/api/accounts')
 @login_required
 def get_accounts():
-    """Get all social media accounts"""
-    return jsonify(SOCIAL_ACCOUNTS)
+    """Get social media accounts (paginated with ?limit=&cursor=, trimmed with ?fields=)"""
+    return list_response('social_accounts', id_ordered_page(SocialAccount))
 
 @app.route('/api/accounts', methods=['POST'])
 @login_required
@@ -858,18 +1218,17 @@ def add_account():
                 return jsonify({"error": f"Missing required field: {field}"}), 400
         
         # Create new account
-        new_account = {
-            "id": len(SOCIAL_ACCOUNTS) + 1,
-            "platform": data['platform'],
-            "account_name": data['account_name'],
-            "display_name": data.get('display_name', f"{data['account_name']} - {data['platform'].title()}"),
-            "status": "connected" if data.get('has_api', False) else "pending",
-            "auto_posting": data.get('auto_posting', False),
-            "is_default": data.get('is_default', False),
-            "connected_date": datetime.now().isoformat(),
-            "has_api": data.get('has_api', False),
-            "encrypted_credentials": None
-        }
+        new_account = SocialAccount(
+            platform=data['platform'],
+            account_name=data['account_name'],
+            display_name=data.get('display_name', f"{data['account_name']} - {data['platform'].title()}"),
+            status="connected" if data.get('has_api', False) else "pending",
+            auto_posting=data.get('auto_posting', False),
+            is_default=data.get('is_default', False),
+            connected_date=datetime.now(),
+            has_api=data.get('has_api', False),
+            encrypted_credentials=None
+        )
         
         # Encrypt and store API credentials if provided
         if data.get('has_api') and (data.get('api_key') or data.get('api_secret')):
@@ -885,23 +1244,22 @@ def add_account():
                 credentials['bearer_token'] = data.get('bearer_token', '')
                 credentials['access_token_secret'] = data.get('access_token_secret', '')
             
-            new_account['encrypted_credentials'] = encryption_service.encrypt_credentials(credentials)
-            new_account['status'] = 'connected'
+            new_account.encrypted_credentials = encryption_service.encrypt_credentials(credentials)
+            new_account.status = 'connected'
         elif data.get('has_api'):
-            new_account['status'] = 'error'
+            new_account.status = 'error'
         
         # If this is set as default, remove default from other accounts of same platform
-        if new_account['is_default']:
-            for account in SOCIAL_ACCOUNTS:
-                if account['platform'] == new_account['platform']:
-                    account['is_default'] = False
+        if new_account.is_default:
+            SocialAccount.query.filter_by(platform=new_account.platform, is_default=True).update({'is_default': False})
         
-        SOCIAL_ACCOUNTS.append(new_account)
+        db.session.add(new_account)
+        db.session.commit()
         
         return jsonify({
             "status": "success",
             "message": "Cuenta agregada exitosamente",
-            "account": new_account
+            "account": new_account.to_dict()
         }), 201
         
     except Exception as e:
@@ -915,35 +1273,32 @@ def update_account(account_id):
         data = request.get_json()
         
         # Find the account
-        account_index = None
-        for i, account in enumerate(SOCIAL_ACCOUNTS):
-            if account['id'] == account_id:
-                account_index = i
-                break
+        account = db.session.get(SocialAccount, account_id)
         
-        if account_index is None:
+        if account is None:
             return jsonify({"error": "Account not found"}), 404
         
-        account = SOCIAL_ACCOUNTS[account_index]
-        
         # Update account fields
         updatable_fields = ['account_name', 'display_name', 'auto_posting', 'is_default', 'status']
         for field in updatable_fields:
             if field in data:
-                account[field] = data[field]
+                setattr(account, field, data[field])
         
         # Handle default account logic
-        if account.get('is_default'):
-            for other_account in SOCIAL_ACCOUNTS:
-                if other_account['platform'] == account['platform'] and other_account['id'] != account_id:
-                    other_account['is_default'] = False
+        if account.is_default:
+            SocialAccount.query.filter(
+                SocialAccount.platform == account.platform,
+                SocialAccount.id != account_id,
+                SocialAccount.is_default.is_(True)
+            ).update({'is_default': False})
         
-        account['updated_at'] = datetime.now().isoformat()
+        account.updated_at = datetime.now()
+        db.session.commit()
         
         return jsonify({
             "status": "success",
             "message": "Cuenta actualizada exitosamente",
-            "account": account
+            "account": account.to_dict()
         })
         
     except Exception as e:
@@ -955,16 +1310,19 @@ def delete_account(account_id):
     """Delete a social media account"""
     try:
         # Find and remove the account
-        for i, account in enumerate(SOCIAL_ACCOUNTS):
-            if account['id'] == account_id:
-                deleted_account = SOCIAL_ACCOUNTS.pop(i)
-                return jsonify({
-                    "status": "success",
-                    "message": "Cuenta eliminada exitosamente",
-                    "account": deleted_account
-                })
+        account = db.session.get(SocialAccount, account_id)
+        if account is None:
+            return jsonify({"error": "Account not found"}), 404
         
-        return jsonify({"error": "Account not found"}), 404
+        deleted_account = account.to_dict()
+        encryption_service.forget(account.encrypted_credentials)
+        db.session.delete(account)
+        db.session.commit()
+        return jsonify({
+            "status": "success",
+            "message": "Cuenta eliminada exitosamente",
+            "account": deleted_account
+        })
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1006,6 +1364,11 @@ def verify_credentials():
                         "message": f"Conectado exitosamente a tu cuenta de {platform}",
                         "profile": result['profile']
                     })
+                elif result.get('retry_after') is not None:
+                    return jsonify({
+                        "status": "error",
+                        "message": result['message']
+                    }), 429, {'Retry-After': str(int(result['retry_after']) + 1)}
                 else:
                     return jsonify({
                         "status": "error",
@@ -1127,53 +1490,90 @@ def test_account_connection(account_id):
     """Test connection to a social media account"""
     try:
         # Find the account
-        account = None
-        for acc in SOCIAL_ACCOUNTS:
-            if acc['id'] == account_id:
-                account = acc
-                break
+        account = db.session.get(SocialAccount, account_id)
         
         if not account:
             return jsonify({"error": "Account not found"}), 404
         
-        # Simulate API connection test
-        import random
-        success = random.choice([True, True, True, False])  # 75% success rate for demo
+        result = next(account_refresher.refresh([account]))
         
-        if success:
-            account['status'] = 'connected'
-            account['last_tested'] = datetime.now().isoformat()
+        if result['status'] == 'connected':
             return jsonify({
                 "status": "success",
-                "message": f"Conexión exitosa con {account['platform']}",
-                "account": account
+                "message": f"Conexión exitosa con {account.platform}",
+                "account": account.to_dict()
             })
+        elif result['status'] == 'rate_limited':
+            return jsonify({
+                "status": "error",
+                "message": result['message'],
+                "account": account.to_dict()
+            }), 429, {'Retry-After': str(int(result['retry_after']) + 1)}
         else:
-            account['status'] = 'error'
-            account['last_tested'] = datetime.now().isoformat()
             return jsonify({
                 "status": "error",
-                "message": f"Error al conectar con {account['platform']}. Verifica las credenciales.",
-                "account": account
+                "message": f"Error al conectar con {account.platform}: {result['message']}",
+                "account": account.to_dict()
             }), 400
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/accounts/refresh', methods=['POST'])
+@login_required
+def refresh_accounts():
+    """Verify many accounts at once, streaming one NDJSON line per account as checks complete.
+
+    The body may narrow the sweep with 'account_ids' or 'platform'; by
+    default every account with API access is verified. The last line
+    summarises the sweep.
+    """
+    data = request.get_json(silent=True) or {}
+    
+    def lines():
+        started = time.time()
+        counts = {}
+        try:
+            # Loaded here so the accounts belong to the session the stream commits
+            query = SocialAccount.query.filter(SocialAccount.has_api.is_(True))
+            if data.get('account_ids'):
+                query = query.filter(SocialAccount.id.in_(data['account_ids']))
+            if data.get('platform'):
+                query = query.filter_by(platform=data['platform'])
+            accounts = query.order_by(SocialAccount.id).all()
+            for result in account_refresher.refresh(accounts):
+                counts[result['status']] = counts.get(result['status'], 0) + 1
+                yield app.json.dumps(result) + '\n'
+            yield app.json.dumps({
+                "done": True,
+                "total": sum(counts.values()),
+                "counts": counts,
+                "elapsed_ms": round((time.time() - started) * 1000)
+            }) + '\n'
+        except Exception as e:
+            logging.error(f"Error refreshing accounts: {str(e)}")
+            yield app.json.dumps({"done": True, "error": str(e)}) + '\n'
+    
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/api/accounts/stats')
 @login_required
 def get_accounts_stats():
     """Get account statistics"""
     try:
-        connected = len([acc for acc in SOCIAL_ACCOUNTS if acc['status'] == 'connected'])
-        pending = len([acc for acc in SOCIAL_ACCOUNTS if acc['status'] == 'pending'])
-        error = len([acc for acc in SOCIAL_ACCOUNTS if acc['status'] == 'error'])
+        counts = dict(
+            db.session.query(SocialAccount.status, db.func.count(SocialAccount.id))
+            .group_by(SocialAccount.status)
+        )
         
         return jsonify({
-            "connected": connected,
-            "pending": pending,
-            "error": error,
-            "total": len(SOCIAL_ACCOUNTS)
+            "connected": counts.get('connected', 0),
+            "pending": counts.get('pending', 0),
+            "error": counts.get('error', 0),
+            "total": sum(counts.values())
         })
         
     except Exception as e:
@@ -1183,14 +1583,17 @@ def get_accounts_stats():
 @app.route('/api/ai-providers')
 @login_required
 def get_ai_providers():
-    """Get all AI providers"""
-    # Check environment variables and update status
-    for provider in AI_PROVIDERS:
-        env_key = f"{provider['name'].upper()}_API_KEY"
+    """Get AI providers (paginated with ?limit=&cursor=, trimmed with ?fields=)"""
+    providers = get_all_ai_providers()
+    # Check stored keys and environment variables and update status
+    for provider in providers:
+        sync_provider_key(provider)
+        env_key = f"{provider.name.upper()}_API_KEY"
         has_key = os.environ.get(env_key) is not None
-        provider['status'] = 'connected' if has_key else 'disconnected'
+        provider.status = 'connected' if has_key else 'disconnected'
+    db.session.commit()
     
-    return jsonify(AI_PROVIDERS)
+    return list_response('ai_providers', id_ordered_page(AIProvider))
 
 @app.route('/api/ai-providers/<provider_name>', methods=['PUT'])
 @login_required
@@ -1204,45 +1607,48 @@ def update_ai_provider(provider_name):
             return jsonify({"error": "API key is required"}), 400
         
         # Find the provider
-        provider = next((p for p in AI_PROVIDERS if p['name'] == provider_name), None)
+        provider = get_ai_provider(provider_name)
         if not provider:
             return jsonify({"error": "Provider not found"}), 404
         
         # Encrypt and store the API key securely
-        provider['encrypted_api_key'] = encryption_service.encrypt_api_key(api_key)
+        encryption_service.forget(provider.encrypted_api_key)
+        provider.encrypted_api_key = encryption_service.encrypt_api_key(api_key)
         
         # Set environment variable for immediate use
         env_key = f"{provider_name.upper()}_API_KEY"
         os.environ[env_key] = api_key
+        _INJECTED_PROVIDER_KEYS[env_key] = provider.encrypted_api_key
         
         # Update provider status
-        provider['status'] = 'connected'
-        provider['last_tested'] = datetime.now().isoformat()
+        provider.status = 'connected'
+        provider.last_tested = datetime.now()
         
         # Handle setting as default provider
         if data.get('is_default'):
             # Only allow setting as default if provider is connected
-            if provider['status'] != 'connected':
+            if provider.status != 'connected':
                 return jsonify({
                     "status": "error",
                     "message": "No se puede establecer como predeterminado un proveedor desconectado"
                 }), 400
             
             # Remove default from all providers
-            for p in AI_PROVIDERS:
-                p['is_default'] = False
-            provider['is_default'] = True
+            AIProvider.query.update({'is_default': False})
+            provider.is_default = True
+        
+        db.session.commit()
         
         return jsonify({
             "status": "success",
-            "message": f"API key para {provider['display_name']} configurada y encriptada exitosamente",
+            "message": f"API key para {provider.display_name} configurada y encriptada exitosamente",
             "provider": {
-                "name": provider['name'],
-                "display_name": provider['display_name'],
-                "status": provider['status'],
-                "is_default": provider['is_default'],
-                "model": provider['model'],
-                "last_tested": provider['last_tested']
+                "name": provider.name,
+                "display_name": provider.display_name,
+                "status": provider.status,
+                "is_default": provider.is_default,
+                "model": provider.model,
+                "last_tested": provider.last_tested
             }
         })
         
@@ -1255,7 +1661,7 @@ def test_ai_provider(provider_name):
     """Test AI provider connection"""
     try:
         # Find the provider
-        provider = next((p for p in AI_PROVIDERS if p['name'] == provider_name), None)
+        provider = get_ai_provider(provider_name)
         if not provider:
             return jsonify({
                 "status": "error",
@@ -1263,12 +1669,14 @@ def test_ai_provider(provider_name):
             }), 404
         
         # Check if provider has API key configured
-        if provider['status'] == 'disconnected':
+        if provider.status == 'disconnected':
             return jsonify({
                 "status": "error",
-                "message": f"API key no configurada para {provider['display_name']}"
+                "message": f"API key no configurada para {provider.display_name}"
             }), 400
         
+        sync_provider_key(provider)
+        
         # Test with a simple content generation
         test_prompt = "Genera un saludo breve y profesional"
         logging.debug(f"Testing {provider_name} with prompt: {test_prompt}")
@@ -1277,20 +1685,22 @@ def test_ai_provider(provider_name):
         logging.debug(f"Test result for {provider_name}: {result}")
         
         if result and result.get('success'):
-            provider['status'] = 'connected'
-            provider['last_tested'] = datetime.now().isoformat()
+            provider.status = 'connected'
+            provider.last_tested = datetime.now()
+            db.session.commit()
             return jsonify({
                 "status": "success",
-                "message": f"Conexión exitosa con {provider['display_name']}",
+                "message": f"Conexión exitosa con {provider.display_name}",
                 "test_content": result['content'][:100] + "..." if len(result.get('content', '')) > 100 else result.get('content', '')
             })
         else:
-            provider['status'] = 'error'
-            provider['last_tested'] = datetime.now().isoformat()
+            provider.status = 'error'
+            provider.last_tested = datetime.now()
+            db.session.commit()
             error_msg = result.get('error', 'Error desconocido') if result else 'No se recibió respuesta'
             return jsonify({
                 "status": "error",
-                "message": f"Error al conectar con {provider['display_name']}: {error_msg}"
+                "message": f"Error al conectar con {provider.display_name}: {error_msg}"
             }), 400
         
     except Exception as e:
@@ -1306,48 +1716,108 @@ def disconnect_ai_provider(provider_name):
     """Disconnect AI provider by removing API key"""
     try:
         # Find the provider
-        provider = next((p for p in AI_PROVIDERS if p['name'] == provider_name), None)
+        provider = get_ai_provider(provider_name)
         if not provider:
             return jsonify({"error": "Provider not found"}), 404
         
         # Remove encrypted API key
-        provider['encrypted_api_key'] = None
+        encryption_service.forget(provider.encrypted_api_key)
+        provider.encrypted_api_key = None
         
         # Remove environment variable
         env_key = f"{provider_name.upper()}_API_KEY"
         if env_key in os.environ:
             del os.environ[env_key]
+        _INJECTED_PROVIDER_KEYS.pop(env_key, None)
         
         # Update provider status
-        provider['status'] = 'disconnected'
-        provider['last_tested'] = None
+        provider.status = 'disconnected'
+        provider.last_tested = None
         
         # If this was the default provider, find another connected one
-        if provider.get('is_default', False):
-            provider['is_default'] = False
+        if provider.is_default:
+            provider.is_default = False
             # Set another connected provider as default
-            for other_provider in AI_PROVIDERS:
-                if other_provider['status'] == 'connected' and other_provider['name'] != provider_name:
-                    other_provider['is_default'] = True
-                    break
+            other_provider = AIProvider.query.filter(
+                AIProvider.status == 'connected',
+                AIProvider.name != provider_name
+            ).order_by(AIProvider.id).first()
+            if other_provider:
+                other_provider.is_default = True
+        
+        db.session.commit()
         
         return jsonify({
             "status": "success",
-            "message": f"API key para {provider['display_name']} eliminada exitosamente"
+            "message": f"API key para {provider.display_name} eliminada exitosamente"
         })
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@job_queue.handler('publish')
+def run_publish_job(job, report_progress):
+    """Publish content through the platform client and record the published post.
+
+    A job recovered from a dead worker runs again, so the outcome is saved on
+    the job before the post is recorded: a post already recorded is returned
+    as is, a saved outcome is only recorded, and a publish interrupted before
+    its outcome was saved fails rather than risk posting twice.
+    """
+    payload = job.payload
+    published_post = db.session.get(PublishedPost, payload['post_id'])
+    if published_post is None:
+        checkpoint = job.result or {}
+        published = checkpoint.get('published')
+        if published is None:
+            if checkpoint.get('publishing'):
+                raise RuntimeError('La publicación se interrumpió; comprueba la plataforma antes de publicar de nuevo')
+            job.result = {'publishing': True}
+            report_progress(10, f"Publicando en {payload['platform']}")
+            
+            result = publish_content(payload['platform'], payload['content'], media_ids=payload.get('media_ids'))
+            if not result.get('success'):
+                # Nothing was posted, so the job may be run again
+                job.result = None
+                db.session.commit()
+                raise RuntimeError(result.get('error', 'Error al publicar contenido'))
+            published = {'account_id': result.get('account_id'), 'external_id': result.get('external_id')}
+            job.result = {'published': published}
+        
+        report_progress(90, "Registrando publicación")
+        published_post = PublishedPost(
+            id=payload['post_id'],
+            user_id=job.user_id,
+            platform=payload['platform'],
+            content=payload['content'],
+            hashtags=payload.get('hashtags', ''),
+            published_date=datetime.now(),
+            status='published',
+            likes=0,
+            shares=0,
+            account_id=published['account_id'],
+            external_id=published['external_id'],
+            job_id=job.id
+        )
+        metrics_ingestor.track(published_post)
+        publication_ledger.record(published_post)
+        db.session.commit()
+    
+    return {
+        'post_id': published_post.id,
+        'message': f'Contenido publicado exitosamente en {payload["platform"].capitalize()}'
+    }
+
 @app.route('/api/publish-now', methods=['POST'])
 @login_required
 def publish_now():
-    """Publish content immediately to social media platform"""
+    """Queue content for immediate publishing on a social media platform"""
     try:
         data = request.get_json()
         platform = data.get('platform')
         content = data.get('content')
         hashtags = data.get('hashtags', '')
+        media_ids = data.get('media_ids') or []
         
         if not platform or not content:
             return jsonify({
@@ -1355,34 +1825,27 @@ def publish_now():
                 'message': 'Plataforma y contenido son requeridos'
             }), 400
         
-        # Add to published posts tracking
-        if 'published_posts' not in session:
-            session['published_posts'] = []
-        
-        import uuid
+        if media_ids and media_store.get_many(media_ids) is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Archivo multimedia no encontrado'
+            }), 400
         
-        published_post = {
-            'id': str(uuid.uuid4()),
+        job = job_queue.enqueue('publish', {
+            'post_id': str(uuid.uuid4()),
             'platform': platform,
             'content': content,
             'hashtags': hashtags,
-            'published_date': datetime.now().isoformat(),
-            'status': 'published',
-            'likes': 0,
-            'shares': 0
-        }
-        
-        session['published_posts'].append(published_post)
-        
-        # Simulate API call delay
-        import time
-        time.sleep(1)
+            'media_ids': media_ids
+        }, user_id=current_user.get_id())
         
         return jsonify({
-            'status': 'success',
-            'message': f'Contenido publicado exitosamente en {platform.capitalize()}',
-            'post_id': published_post['id']
-        })
+            'status': 'accepted',
+            'message': f'Publicación en cola para {platform.capitalize()}',
+            'job_id': job.id,
+            'post_id': job.payload['post_id'],
+            'status_url': url_for('get_job_status', job_id=job.id)
+        }), 202
         
     except Exception as e:
         logging.error(f"Error publishing content: {e}")
@@ -1391,15 +1854,83 @@ def publish_now():
             'message': 'Error al publicar contenido'
         }), 500
 
+@app.route('/api/media', methods=['POST'])
+@login_required
+def upload_media():
+    """Store an image or video to attach to posts.
+
+    The body is either the raw file (name in ?filename=) or a multipart form
+    with a 'file' field; either way it is streamed to disk as it arrives.
+    Uploading a file that is already stored returns the existing media.
+    """
+    try:
+        if request.content_length and request.content_length > MEDIA_MAX_BYTES:
+            return jsonify({"error": f"El archivo supera el máximo de {MEDIA_MAX_BYTES // (1024 * 1024)} MB"}), 413
+        
+        if request.mimetype == 'multipart/form-data':
+            upload = request.files.get('file')
+            if upload is None:
+                return jsonify({"error": "Missing required field: file"}), 400
+            stream, filename = upload.stream, upload.filename
+        else:
+            stream, filename = request.stream, request.args.get('filename')
+        
+        asset, created = media_store.save(stream, filename)
+        return jsonify({
+            "status": "success",
+            "message": "Archivo subido exitosamente" if created else "El archivo ya existía",
+            "media": asset.to_dict()
+        }), 201 if created else 200
+        
+    except MediaTooLarge:
+        return jsonify({"error": f"El archivo supera el máximo de {MEDIA_MAX_BYTES // (1024 * 1024)} MB"}), 413
+    except UnsupportedMedia as e:
+        return jsonify({"error": str(e)}), 415
+    except Exception as e:
+        logging.error(f"Error uploading media: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/media/<int:media_id>', methods=['GET'])
+@login_required
+def get_media(media_id):
+    """Get an uploaded media file's details"""
+    asset = db.session.get(MediaAsset, media_id)
+    if asset is None:
+        return jsonify({"error": "Media not found"}), 404
+    return jsonify({"status": "success", "media": asset.to_dict()})
+
+@app.route('/api/media/<int:media_id>/content', methods=['GET'])
+@login_required
+def get_media_content(media_id):
+    """Download an uploaded media file (supports Range requests)"""
+    asset = db.session.get(MediaAsset, media_id)
+    if asset is None:
+        return jsonify({"error": "Media not found"}), 404
+    return send_file(
+        media_store.path(asset), mimetype=asset.content_type, conditional=True,
+        etag=asset.sha256, download_name=asset.filename or asset.sha256, max_age=86400
+    )
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_job_status(job_id):
+    """Get the status and progress of a background job"""
+    job = job_queue.get(job_id, user_id=current_user.get_id())
+    if not job:
+        return jsonify({'status': 'error', 'message': 'Trabajo no encontrado'}), 404
+    
+    return jsonify({
+        'status': 'success',
+        'job': job.to_dict()
+    })
+
 @app.route('/api/monitoring-data', methods=['GET'])
 @login_required
 def get_monitoring_data():
     """Get social media monitoring data"""
     try:
-        import random
-        
-        # Get published posts from session
-        published_posts = session.get('published_posts', [])
+        # Publications by this user and by the scheduler
+        owners = [current_user.get_id(), SHARED_OWNER]
         
         # Calculate platform statistics
         platforms_data = {
@@ -1409,25 +1940,13 @@ def get_monitoring_data():
             'facebook': {'status': 'connected', 'published_today': 0, 'total_posts': 0}
         }
         
-        today = datetime.now().date()
-        
-        for post in published_posts:
-            platform = post['platform']
-            post_date = datetime.fromisoformat(post['published_date']).date()
-            
+        for platform, counts in publication_ledger.summary(owners).items():
             if platform in platforms_data:
-                platforms_data[platform]['total_posts'] += 1
-                if post_date == today:
-                    platforms_data[platform]['published_today'] += 1
-        
-        # Add some sample engagement data
-        for post in published_posts[-10:]:  # Last 10 posts
-            post['likes'] = random.randint(5, 150)
-            post['shares'] = random.randint(1, 25)
+                platforms_data[platform].update(counts)
         
         monitoring_data = {
             'platforms': platforms_data,
-            'recent_posts': published_posts[-10:] if published_posts else []
+            'recent_posts': [post.to_dict() for post in publication_ledger.recent(owners)]
         }
         
         return jsonify({
@@ -1442,6 +1961,64 @@ def get_monitoring_data():
             'message': 'Error al obtener datos de monitoreo'
         }), 500
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose request, provider and cache metrics in the Prometheus text format"""
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Not found"}), 404
+    if METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied.encode(), METRICS_TOKEN.encode()):
+            return Response('Unauthorized\n', status=401, content_type='text/plain; charset=utf-8')
+    elif not current_user.is_authenticated:
+        return login_manager.unauthorized()
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/api/profiles', methods=['GET'])
+@login_required
+def list_profiles():
+    """List the request profiles kept in this worker, newest first"""
+    return jsonify({"profiles": request_profiler.recent()})
+
+@app.route('/api/profiles/<profile_id>', methods=['GET'])
+@login_required
+def download_profile(profile_id):
+    """Download a request profile as collapsed stacks; ?weight=cpu weights them by CPU time"""
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        return jsonify({'status': 'error', 'message': 'Perfil no encontrado'}), 404
+    weight = request.args.get('weight', 'wall')
+    if weight not in ('wall', 'cpu'):
+        return jsonify({'status': 'error', 'message': "weight debe ser 'wall' o 'cpu'"}), 400
+    response = Response(profile.collapsed(weight), content_type='text/plain; charset=utf-8')
+    response.headers['Content-Disposition'] = f'attachment; filename="profile-{profile.id}-{weight}.folded"'
+    return response
+
+@app.route('/api/profiles', methods=['DELETE'])
+@login_required
+def clear_profiles():
+    """Drop every kept request profile"""
+    request_profiler.clear()
+    return jsonify({"status": "success"})
+
+@app.before_request
+def import_session_drafts():
+    """Move drafts left in the cookie session by earlier versions into the draft store"""
+    if 'drafts' not in session or not current_user.is_authenticated:
+        return
+    try:
+        for draft in session.get('drafts') or []:
+            draft_store.create(
+                current_user.get_id(),
+                draft.get('platform'),
+                draft.get('content') or '',
+                draft.get('hashtags')
+            )
+        session.pop('drafts', None)
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error importing session drafts: {e}")
+
 @app.route('/api/save-draft', methods=['POST'])
 @login_required
 def save_draft():
@@ -1449,31 +2026,21 @@ def save_draft():
     try:
         data = request.get_json()
         
-        # Create a draft entry
-        draft = {
-            'id': len(session.get('drafts', [])) + 1,
-            'platform': data.get('platform'),
-            'content': data.get('content'),
-            'hashtags': data.get('hashtags'),
-            'created_at': data.get('created_at'),
-            'type': 'draft',
-            'title': data.get('content', '')[:50] + '...' if len(data.get('content', '')) > 50 else data.get('content', '')
-        }
-        
-        # Store in session
-        if 'drafts' not in session:
-            session['drafts'] = []
-        
-        session['drafts'].append(draft)
-        session.modified = True
+        draft = draft_store.create(
+            current_user.get_id(),
+            data.get('platform'),
+            data.get('content', ''),
+            data.get('hashtags')
+        )
         
         return jsonify({
             'success': True,
             'message': 'Borrador guardado exitosamente',
-            'draft_id': draft['id']
+            'draft_id': draft.id
         })
         
     except Exception as e:
+        db.session.rollback()
         logging.error(f"Error saving draft: {e}")
         return jsonify({
             'success': False,
@@ -1483,12 +2050,36 @@ def save_draft():
 @app.route('/api/drafts')
 @login_required
 def get_drafts():
-    """Get all saved drafts"""
+    """Get a page of saved drafts, newest first, optionally filtered by a full-text query.
+
+    Pages are numbered (?page=&per_page=) or, with ?limit= and the returned
+    cursor, keyset-paginated; ?fields= trims each draft.
+    """
     try:
-        drafts = session.get('drafts', [])
-        return jsonify({
+        user_id = current_user.get_id()
+        query = request.args.get('q')
+        if 'limit' in request.args or 'cursor' in request.args:
+            return list_response(
+                'drafts',
+                lambda after_id, limit: draft_store.list_after(user_id, after_id, limit, query),
+                scope=user_id,
+                envelope=lambda drafts: {'success': True, 'drafts': drafts}
+            )
+        
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+        counted = {}
+        
+        def load_page(after_id, limit):
+            drafts, counted['total'] = draft_store.list(user_id, page, per_page, query)
+            return drafts
+        
+        return list_response('drafts', load_page, scope=user_id, envelope=lambda drafts: {
             'success': True,
-            'drafts': drafts
+            'drafts': drafts,
+            'page': max(1, page),
+            'per_page': max(1, min(MAX_DRAFT_PAGE_SIZE, per_page)),
+            'total': counted['total']
         })
     except Exception as e:
         logging.error(f"Error getting drafts: {e}")
@@ -1497,20 +2088,38 @@ def get_drafts():
             'error': str(e)
         }), 500
 
+@app.route('/api/drafts/<int:draft_id>')
+@login_required
+def get_draft(draft_id):
+    """Get a specific draft"""
+    draft = draft_store.get(current_user.get_id(), draft_id)
+    if not draft:
+        return jsonify({
+            'success': False,
+            'error': 'Borrador no encontrado'
+        }), 404
+    return jsonify({
+        'success': True,
+        'draft': draft.to_dict()
+    })
+
 @app.route('/api/drafts/<int:draft_id>', methods=['DELETE'])
 @login_required
 def delete_draft(draft_id):
     """Delete a specific draft"""
     try:
-        drafts = session.get('drafts', [])
-        session['drafts'] = [draft for draft in drafts if draft['id'] != draft_id]
-        session.modified = True
+        if not draft_store.delete(current_user.get_id(), draft_id):
+            return jsonify({
+                'success': False,
+                'error': 'Borrador no encontrado'
+            }), 404
         
         return jsonify({
             'success': True,
             'message': 'Borrador eliminado exitosamente'
         })
     except Exception as e:
+        db.session.rollback()
         logging.error(f"Error deleting draft: {e}")
         return jsonify({
             'success': False,
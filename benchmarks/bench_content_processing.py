@@ -0,0 +1,124 @@
+"""Microbenchmark: single-pass output normalizer vs the per-endpoint post-processing it replaced.
+
+Run from the repository root:
+
+    python benchmarks/bench_content_processing.py [--size-kb 50] [--repeat 200]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from content_processing import normalize_output  # noqa: E402
+
+
+def legacy_twitter(content):
+    meta_phrases = [
+        r'¡claro[^"]*"',
+        r'aquí tienes[^"]*"',
+        r'here\'s[^"]*:',
+        r'here is[^"]*:',
+        r'"[^"]*puedes hacerme[^"]*"',
+        r'tweet sobre[^"]*:',
+        r'contenido[^"]*para twitter[^"]*:'
+    ]
+    cleaned_content = content
+    for phrase in meta_phrases:
+        cleaned_content = re.sub(phrase, '', cleaned_content, flags=re.IGNORECASE)
+    hashtags = re.findall(r'#\w+', cleaned_content)
+    main_content = re.sub(r'#\w+', '', cleaned_content).strip()
+    main_content = re.sub(r'^["\'"]*|["\'"]*$', '', main_content).strip()
+    main_content = re.sub(r'\n+', ' ', main_content).strip()
+    if not main_content or len(main_content) < 10 or 'puedes hacerme' in main_content.lower():
+        main_content = "Contenido generado automáticamente"
+    return main_content, hashtags
+
+
+def legacy_generate_web(content):
+    lines = content.split('\n')
+    hashtag_lines = []
+    content_lines = []
+    for line in lines:
+        if line.strip().startswith('#') or '**#' in line:
+            hashtag_lines.append(line.strip())
+        else:
+            content_lines.append(line)
+    main_content = '\n'.join(content_lines).strip()
+    hashtags_found = []
+    for line in hashtag_lines:
+        hashtags_found.extend(re.findall(r'#\w+', line))
+    return main_content, list(dict.fromkeys(hashtags_found))
+
+
+def legacy_adapt(content):
+    main_content = content
+    hashtags_found = []
+    if '#' in content:
+        lines = content.split('\n')
+        for i in range(len(lines) - 1, -1, -1):
+            line = lines[i].strip()
+            if line and all(word.startswith('#') or not word for word in line.split()):
+                hashtags_found.extend([tag for tag in line.split() if tag.startswith('#')])
+                lines.pop(i)
+            elif line:
+                break
+        main_content = '\n'.join(lines).strip()
+    return main_content, hashtags_found
+
+
+def make_web_article(size_kb):
+    """A markdown article shaped like provider output: headings, a few citations, hashtags at the end"""
+    paragraph = (
+        "La inteligencia artificial está transformando el marketing digital. Las marcas que "
+        "adoptan estas herramientas generan contenido más relevante, miden mejor su impacto y "
+        "responden antes a las tendencias del mercado{citation}.\n\n"
+    )
+    sections = []
+    size = 0
+    index = 1
+    while size < size_kb * 1024:
+        body = ''.join(paragraph.format(citation=f" [{index}]" if i == 0 else '') for i in range(3))
+        sections.append(f"## Sección {index}\n\n{body}")
+        size += len(sections[-1])
+        index += 1
+    return (
+        "Aquí tienes el artículo solicitado:\n" + ''.join(sections)
+        + "**#IA** **#Marketing**\n#Tecnología #Innovación"
+    )
+
+
+def make_tweet():
+    return '¡Claro! Aquí tienes un tweet: "La #IA cambia el marketing: más datos, mejores decisiones [1]" #Marketing'
+
+
+def bench(label, func, content, repeat):
+    seconds = min(timeit.repeat(lambda: func(content), number=repeat, repeat=5)) / repeat
+    print(f"{label:<40} {seconds * 1e6:10.1f} µs/call")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-kb', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    article = make_web_article(args.size_kb)
+    tweet = make_tweet()
+    print(f"web article: {len(article) / 1024:.1f} KB, tweet: {len(tweet)} chars\n")
+
+    web_generate = bench('legacy generate (web branch)', legacy_generate_web, article, args.repeat)
+    web_adapt = bench('legacy adapt (trailing lines)', legacy_adapt, article, args.repeat)
+    web_new = bench('normalize_output(web)', lambda text: normalize_output(text, 'web'), article, args.repeat)
+    print(f"{'speedup vs generate / adapt':<40} {web_generate / web_new:9.2f}x / {web_adapt / web_new:.2f}x\n")
+
+    tweet_old = bench('legacy process_twitter_content', legacy_twitter, tweet, args.repeat * 50)
+    tweet_new = bench('normalize_output(twitter)', lambda text: normalize_output(text, 'twitter'), tweet, args.repeat * 50)
+    print(f"{'speedup':<40} {tweet_old / tweet_new:9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
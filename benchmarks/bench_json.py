@@ -0,0 +1,130 @@
+"""JSON benchmark: serialization and compressed transfer of large API responses.
+
+Run from the repository root:
+
+    python benchmarks/bench_json.py [--posts 2000] [--runs 20] [--bandwidth 10]
+
+Compares Flask's default provider as the app used it (stdlib json, sorted
+keys, datetimes pre-formatted with isoformat()) with the app's providers,
+then the size and estimated transfer time of each payload uncompressed,
+gzipped and, when the brotli package is installed, brotli-compressed.
+"""
+import argparse
+import gzip
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SCHEDULER_ENABLED', '0')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from app import app  # noqa: E402
+from models import ScheduledPost  # noqa: E402
+from json_provider import IsoJSONProvider, OrjsonProvider  # noqa: E402
+from compression import GZIP_LEVEL, BROTLI_QUALITY  # noqa: E402
+
+TOPIC = 'Lanzamiento de la nueva colección de otoño con descuentos exclusivos para suscriptores'
+
+
+def post_list(count):
+    """The /api/posts body for count posts, as model dicts"""
+    start = datetime(2025, 1, 1, 9, 0)
+    posts = []
+    for index in range(count):
+        post = ScheduledPost(
+            id=index + 1, title=f'Publicación {index}', content=f'{TOPIC} #{index} ' * 3,
+            platform=('twitter', 'linkedin', 'instagram', 'facebook')[index % 4],
+            scheduled_date=(start + timedelta(hours=index)).isoformat(), status='scheduled',
+            engagement=index * 3, reach=index * 40, timezone='Europe/Madrid',
+            created_at=start, updated_at=start + timedelta(minutes=index)
+        )
+        posts.append(post.to_dict())
+    return posts
+
+
+def adaptation(size_kb):
+    """An /api/adapt-content body echoing roughly size_kb of original content"""
+    original = (TOPIC + '. ') * (size_kb * 1024 // (len(TOPIC) + 2))
+    platforms = ('twitter', 'linkedin', 'instagram', 'facebook')
+    return {
+        'status': 'success',
+        'original_content': original,
+        'style': 'profesional',
+        'tone': 'cercano',
+        'provider': 'openai',
+        'adapted_content': {platform: original[:len(original) // 4] for platform in platforms},
+        'answered_by': {platform: 'openai' for platform in platforms},
+        'generated_at': datetime.now()
+    }
+
+
+def preformatted(value):
+    """Replace datetimes with isoformat() strings, as the app did before its provider handled them"""
+    if isinstance(value, dict):
+        return {key: preformatted(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [preformatted(item) for item in value]
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def timed(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--content-kb', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--bandwidth', type=float, default=10.0, help='link speed in Mbit/s for transfer estimates')
+    args = parser.parse_args()
+
+    providers = [('flask default (before)', DefaultJSONProvider(app)), ('stdlib iso', IsoJSONProvider(app))]
+    try:
+        providers.append(('orjson', OrjsonProvider(app)))
+    except ImportError:
+        print('orjson not installed, skipping it\n')
+    codecs = [('identity', lambda data: data), ('gzip', lambda data: gzip.compress(data, compresslevel=GZIP_LEVEL))]
+    try:
+        import brotli
+        codecs.append(('br', lambda data: brotli.compress(data, quality=BROTLI_QUALITY)))
+    except ImportError:
+        print('brotli not installed, skipping it\n')
+
+    payloads = [
+        (f'/api/posts ({args.posts} posts)', post_list(args.posts)),
+        (f'/api/adapt-content (~{args.content_kb} KB)', adaptation(args.content_kb))
+    ]
+    bytes_per_second = args.bandwidth * 1_000_000 / 8
+    print(f"median of {args.runs} runs, python {sys.version.split()[0]}, {args.bandwidth:g} Mbit/s link")
+
+    with app.app_context():
+        for label, payload in payloads:
+            print(f"\n{label}")
+            print(f"  {'provider':<24}{'serialize':>12}")
+            body = None
+            for name, provider in providers:
+                data = preformatted(payload) if type(provider) is DefaultJSONProvider else payload
+                seconds, response = timed(lambda: provider.response(data).get_data(), args.runs)
+                body = response
+                print(f"  {name:<24}{seconds * 1000:>9.2f} ms")
+
+            print(f"  {'encoding':<24}{'size':>12}{'compress':>12}{'transfer':>12}{'total':>12}")
+            for name, codec in codecs:
+                seconds, encoded = timed(lambda: codec(body), args.runs)
+                transfer = len(encoded) / bytes_per_second
+                print(f"  {name:<24}{len(encoded) / 1024:>9.1f} KB{seconds * 1000:>9.2f} ms"
+                      f"{transfer * 1000:>9.1f} ms{(seconds + transfer) * 1000:>9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
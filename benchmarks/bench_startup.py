@@ -0,0 +1,114 @@
+"""Startup benchmark: worker import time and first-request latency, each run in a fresh interpreter.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py [--runs 10] [--database-url sqlite:///...] [--modules 15]
+
+Without --database-url a temporary SQLite database is created by a warm-up
+run, so the figures are for an instance starting against an existing schema.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Measured inside the child: import of the gunicorn entry point, then the
+# first request a worker serves (which boots it) and a second one for reference
+CHILD = """
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+client = main.app.test_client()
+client.get('/login')
+first = time.perf_counter()
+client.get('/login')
+second = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'first_request': first - imported,
+    'second_request': second - first
+}))
+"""
+
+
+def child_env(database_url):
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': database_url,
+        'SCHEDULER_ENABLED': '0',
+        'LOG_LEVEL': 'WARNING',
+        'PYTHONPATH': ROOT
+    })
+    return env
+
+
+def run_child(database_url):
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD], env=child_env(database_url), cwd=ROOT,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_modules(database_url, count):
+    """Get the app's direct imports with the largest cumulative import time, from -X importtime"""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'], env=child_env(database_url), cwd=ROOT,
+        capture_output=True, text=True, check=True
+    ).stderr
+    modules = []
+    subtree = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        # Children are listed before their parent: keep the subtree that ends at main
+        if depth == 0:
+            if name.strip() == 'main':
+                modules = subtree
+            subtree = []
+        # app is at depth 1 and its own imports at depth 2; deeper imports are counted in their parents
+        elif depth <= 2:
+            subtree.append((int(cumulative), name.strip()))
+    return sorted(modules, reverse=True)[:count]
+
+
+def summary(label, values):
+    values = [value * 1000 for value in values]
+    print(f"{label:<20} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms   max {max(values):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--database-url')
+    parser.add_argument('--modules', type=int, default=15, help='slowest imports to list (0 to skip)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = args.database_url or f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        # Compile bytecode and create the schema so every measured run starts alike
+        run_child(database_url)
+
+        results = [run_child(database_url) for _ in range(args.runs)]
+        print(f"{args.runs} runs, python {sys.version.split()[0]}\n")
+        summary('import main', [result['import'] for result in results])
+        summary('first request', [result['first_request'] for result in results])
+        summary('second request', [result['second_request'] for result in results])
+        summary('import + first', [result['import'] + result['first_request'] for result in results])
+
+        if args.modules:
+            print("\nslowest imports made by app (cumulative):")
+            for microseconds, name in slowest_modules(database_url, args.modules):
+                print(f"  {microseconds / 1000:8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
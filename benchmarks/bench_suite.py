@@ -0,0 +1,302 @@
+"""Benchmark suite: the app's hot functions, with JSON results and comparison against a saved baseline.
+
+Run from the repository root:
+
+    python benchmarks/bench_suite.py [--filter calendar] [--sizes 1000,10000,100000,1000000]
+                                     [--json results.json] [--save-baseline benchmarks/baseline.json]
+                                     [--compare benchmarks/baseline.json] [--threshold 0.1]
+
+Covers tweet and per-platform output processing as the generate and adapt
+endpoints run it, prompt building, the calendar, today and upcoming
+endpoints over synthetic post tables of each --sizes count, credential
+encryption and JSON serialization of large responses. The 1M-post table
+takes about a minute to build; pass smaller --sizes for a quick run.
+
+Each benchmark is timed in batches of calls lasting at least --min-time
+seconds. Baselines are compared on the fastest batch, which other load on
+the machine disturbs least. --compare exits with status 1 when any
+benchmark is slower than the baseline by more than --threshold, so it can
+gate a CI job run on the same machine as the baseline.
+"""
+import argparse
+import atexit
+import fnmatch
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Calendar benchmarks need a database of their own, grown in place from one size to the next
+DATA_DIR = tempfile.mkdtemp(prefix='nova-bench-')
+atexit.register(shutil.rmtree, DATA_DIR, ignore_errors=True)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DATA_DIR, 'bench.db')}"
+os.environ.setdefault('SCHEDULER_ENABLED', '0')
+os.environ.setdefault('METRICS_INGESTION_ENABLED', '0')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import schedule_index  # noqa: E402
+from app import (  # noqa: E402
+    app, boot, create_adaptation_prompt, new_adaptation_response, new_generation_response,
+    process_twitter_content, record_adaptation_result, record_generation_result
+)
+from ai_content_generator import content_generator  # noqa: E402
+from encryption import encryption_service  # noqa: E402
+from models import db, ScheduledPost  # noqa: E402
+from bench_content_processing import make_tweet, make_web_article  # noqa: E402
+from bench_json import TOPIC, adaptation, post_list  # noqa: E402
+
+DEFAULT_SIZES = '1000,10000,100000,1000000'
+# Synthetic posts are spread uniformly over this many days around now
+POST_SPAN_DAYS = 730
+PLATFORMS = ('twitter', 'linkedin', 'instagram', 'facebook')
+INSERT_BATCH = 20000
+
+
+def provider_post(platform_name):
+    """A provider answer shaped like what each platform's prompt produces"""
+    if platform_name == 'twitter':
+        return make_tweet()
+    if platform_name == 'web':
+        return make_web_article(5)
+    body = '\n\n'.join(f"{TOPIC}. Párrafo {index} con una #idea en línea [{index}]." for index in range(1, 6))
+    tags = ' '.join(f'#Etiqueta{index}' for index in range(10 if platform_name == 'instagram' else 3))
+    return f"Aquí tienes tu publicación:\n{body}\n\n**#Marca** **#Otoño**\n{tags}"
+
+
+def content_benchmarks():
+    """Output processing as done by the generate and adapt endpoints"""
+    tweet = make_tweet()
+    yield 'content/process_twitter_content', lambda: process_twitter_content(tweet)
+    for name in PLATFORMS + ('web',):
+        result = {'success': True, 'content': provider_post(name), 'provider': 'openai'}
+        yield (f'content/generate_hashtags[{name}]',
+               lambda result=result, name=name: record_generation_result(
+                   new_generation_response(TOPIC, 'openai'), name, 'openai', result))
+        yield (f'content/adapt_hashtags[{name}]',
+               lambda result=result, name=name: record_adaptation_result(
+                   new_adaptation_response(TOPIC, 'profesional', 'cercano', 'openai'), name, 'openai', result))
+
+
+def prompt_benchmarks():
+    """Prompt building for generation and adaptation"""
+    for name in ('twitter', 'linkedin', 'instagram'):
+        yield (f'prompts/enhance_prompt[{name}]',
+               lambda name=name: content_generator._enhance_prompt_for_platform(
+                   f"Crea contenido sobre '{TOPIC}' para {name}", name))
+    original = (TOPIC + '. ') * 25
+    for name in ('twitter', 'linkedin', 'web'):
+        yield (f'prompts/create_adaptation_prompt[{name}]',
+               lambda name=name: create_adaptation_prompt(original, name, 'summary', 'profesional', 'engagement'))
+
+
+def encryption_benchmarks():
+    """Credential encryption, and decryption with and without the plaintext cache"""
+    credentials = {
+        'api_key': 'k' * 25, 'api_secret': 's' * 50, 'access_token': 'a' * 50,
+        'access_token_secret': 't' * 45, 'bearer_token': 'b' * 110, 'username': '@nova'
+    }
+    encryption_service.warm()
+    encrypted = encryption_service.encrypt_credentials(credentials)
+
+    def decrypt_uncached():
+        encryption_service.clear_cache()
+        return encryption_service.decrypt_credentials(encrypted)
+
+    yield 'encryption/encrypt_credentials', lambda: encryption_service.encrypt_credentials(credentials)
+    yield 'encryption/decrypt_credentials[uncached]', decrypt_uncached
+    yield 'encryption/decrypt_credentials[cached]', lambda: encryption_service.decrypt_credentials(encrypted)
+
+
+def json_benchmarks():
+    """Serialization of the largest responses with the app's JSON provider"""
+    posts = post_list(2000)
+    adapted = adaptation(200)
+    yield 'json/posts[2000]', lambda: app.json.response(posts).get_data()
+    yield 'json/adapt_content[200KB]', lambda: app.json.response(adapted).get_data()
+
+
+def grow_posts(target, rng):
+    """Insert synthetic posts, scheduled in UTC, until the table holds target rows"""
+    count = db.session.query(ScheduledPost.id).count()
+    now = int(time.time())
+    half_span = POST_SPAN_DAYS * 86400 // 2
+    created_at = datetime.now()
+    while count < target:
+        rows = []
+        for index in range(count, min(target, count + INSERT_BATCH)):
+            scheduled_ts = now + rng.randint(-half_span, half_span)
+            rows.append({
+                'title': f'Publicación {index}', 'content': f'{TOPIC} #{index}',
+                'platform': PLATFORMS[index % len(PLATFORMS)],
+                'scheduled_date': datetime.fromtimestamp(scheduled_ts, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S'),
+                'scheduled_ts': scheduled_ts, 'status': 'scheduled', 'engagement': 0, 'reach': 0,
+                'timezone': 'UTC', 'created_at': created_at, 'attempts': 0
+            })
+        db.session.execute(ScheduledPost.__table__.insert(), rows)
+        db.session.commit()
+        count += len(rows)
+
+
+def calendar_benchmarks(sizes):
+    """The calendar, today and upcoming endpoints as the table grows"""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+    today = schedule_index.today()
+
+    def get(path):
+        response = client.get(path)
+        response.close()
+        assert response.status_code == 200, (path, response.status_code)
+
+    for size in sizes:
+        yield f'calendar/month[{size}]', lambda: get(f'/api/posts/calendar/{today.year}/{today.month}'), size
+        yield f'calendar/today[{size}]', lambda: get('/api/posts/today'), size
+        yield f'calendar/upcoming[{size}]', lambda: get('/api/posts/upcoming'), size
+
+
+def measure(function, min_time, repeat):
+    """Time function in repeat batches of at least min_time seconds; returns per-call seconds"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.2))
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        'median': statistics.median(timings),
+        'min': min(timings),
+        'max': max(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'calls_per_batch': number,
+        'batches': len(timings)
+    }
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('µs', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+    return f"{seconds / 1e-9:8.1f} ns"
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print each benchmark's change against the baseline; returns the names that regressed"""
+    regressions = []
+    print(f"\n{'benchmark (fastest batch)':<48}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            print(f"{name:<48}{'-':>12}{format_time(result['min']):>12}{'new':>9}")
+            continue
+        ratio = result['min'] / before['min']
+        verdict = ''
+        if ratio > 1 + threshold:
+            verdict = '  slower'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            verdict = '  faster'
+        print(f"{name:<48}{format_time(before['min']):>12}{format_time(result['min']):>12}"
+              f"{(ratio - 1) * 100:>+8.1f}%{verdict}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filter', action='append', help='only run benchmarks matching this glob (repeatable)')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='comma-separated post counts for calendar benchmarks')
+    parser.add_argument('--min-time', type=float, default=0.2, help='minimum seconds per timed batch')
+    parser.add_argument('--repeat', type=int, default=5, help='timed batches per benchmark')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--save-baseline', help='write results to this file as the new baseline')
+    parser.add_argument('--compare', help='compare against a baseline written by --save-baseline')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown reported as a regression')
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.sizes.split(',') if size)
+    patterns = [pattern if any(c in pattern for c in '*?[') else f'*{pattern}*' for pattern in args.filter or []]
+
+    def wanted(name):
+        return not patterns or any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+    with app.app_context():
+        boot()
+
+    benchmarks = []
+    for group in (content_benchmarks(), prompt_benchmarks(), encryption_benchmarks(), json_benchmarks()):
+        benchmarks.extend((name, function, None) for name, function in group)
+    benchmarks.extend(calendar_benchmarks(sizes))
+
+    print(f"python {sys.version.split()[0]}, median of {args.repeat} batches of at least {args.min_time:g} s\n")
+    print(f"{'benchmark':<48}{'median':>12}{'min':>12}{'stdev':>12}")
+    results = {}
+    rng = random.Random(42)
+    for name, function, size in benchmarks:
+        if not wanted(name):
+            continue
+        if size is not None:
+            with app.app_context():
+                grow_posts(size, rng)
+        with app.app_context():
+            result = measure(function, args.min_time, args.repeat)
+        results[name] = result
+        print(f"{name:<48}{format_time(result['median']):>12}{format_time(result['min']):>12}"
+              f"{format_time(result['stdev']):>12}")
+
+    report = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'json_provider': type(app.json).__name__,
+            'min_time': args.min_time,
+            'repeat': args.repeat
+        },
+        'results': results
+    }
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, 'w') as output:
+                json.dump(report, output, indent=2)
+                output.write('\n')
+            print(f"\nresults written to {path}")
+
+    if args.compare:
+        with open(args.compare) as source:
+            baseline = json.load(source)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import os
+import gzip
+import logging
+from flask import request
+
+# Responses smaller than this many bytes are sent uncompressed
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+# gzip level and brotli quality; moderate settings suit per-request compression
+GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', '5'))
+# Content types worth compressing
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'application/x-ndjson',
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'image/svg+xml'
+}
+
+
+class ResponseCompressor:
+    """Compresses large responses with brotli or gzip, as negotiated by Accept-Encoding.
+
+    Brotli is offered only when the brotli package is installed. Streamed
+    responses (server-sent events, NDJSON) and files sent with send_file are
+    left alone. A compressed response's ETag is made weak, since its bytes
+    differ from the identity encoding.
+    """
+
+    def __init__(self):
+        try:
+            import brotli
+            self._brotli = brotli
+            self.encodings = ['br', 'gzip']
+        except ImportError:
+            self._brotli = None
+            self.encodings = ['gzip']
+
+    def init_app(self, app):
+        app.after_request(self.compress)
+        logging.info(f"Response compression: {', '.join(self.encodings)}"
+                     + ('' if self._brotli else " (brotli is not installed)"))
+
+    def compress(self, response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        if encoding == 'br':
+            response.set_data(self._brotli.compress(data, quality=BROTLI_QUALITY))
+        else:
+            response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+# Global response compressor instance
+response_compressor = ResponseCompressor()
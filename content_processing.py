@@ -0,0 +1,114 @@
+import re
+from typing import List, NamedTuple
+
+# Meta-text providers put around a tweet, e.g. "¡Claro! Aquí tienes un tweet: ..."
+TWITTER_META_PHRASES = [
+    r'¡claro[^"]*"',
+    r'aquí tienes[^"]*"',
+    r'here\'s[^"]*:',
+    r'here is[^"]*:',
+    r'"[^"]*puedes hacerme[^"]*"',
+    r'tweet sobre[^"]*:',
+    r'contenido[^"]*para twitter[^"]*:'
+]
+
+# Body used when a tweet is empty or nothing but meta-text once cleaned
+TWITTER_FALLBACK = "Contenido generado automáticamente"
+
+_HASHTAG = re.compile(r'#\w+')
+
+# Tweets: meta phrases are cut one after another, in list order, then hashtags;
+# citation markers are recorded but stay in the text, as they always have
+_TWITTER_META = [re.compile(phrase, re.IGNORECASE) for phrase in TWITTER_META_PHRASES]
+_TWITTER_QUOTES = re.compile(r'^["\']+|["\']+$')
+_NEWLINES = re.compile(r'\n+')
+
+# Other platforms: a leading "Here's your post:" line, lines made only of
+# hashtags (optionally **bold** or comma-separated) and hashtags trailing the
+# last line are cut out; inline hashtags and citation markers stay in the body
+_POST_META = re.compile(r'[ \t]*(?:¡?claro|aquí tienes|here\'s|here is)[^\n]*:[ \t]*(?:\n|\Z)', re.IGNORECASE)
+# Starts at the newline before the line: a literal first character lets the
+# regex engine skip ahead instead of trying every position
+_HASHTAG_LINE = re.compile(r'\n[ \t]*(?:\**#\w+\**[ \t,]*)+(?=\n|\Z)')
+_TRAILING_HASHTAGS = re.compile(r'(?:[ \t]+\**#\w+\**)+[ \t]*$')
+_CITATION = re.compile(r'\[(\d+)\]')
+
+
+class NormalizedContent(NamedTuple):
+    """Provider output split into its parts"""
+    body: str
+    hashtags: List[str]
+    meta: List[str]
+    citations: List[int]
+
+
+def normalize_output(content: str, platform: str) -> NormalizedContent:
+    """Split AI output into publishable body, hashtags, meta-text and citation markers.
+
+    The text is scanned once with a precompiled pattern for the platform and
+    hashtags are returned in order of appearance. Tweets give exactly what
+    process_twitter_content always did, so a repeated hashtag is listed each
+    time; other platforms list each hashtag once.
+    """
+    content = content.strip()
+    if platform == 'twitter':
+        return _normalize_tweet(content)
+    return _normalize_post(content)
+
+
+def _normalize_tweet(content: str) -> NormalizedContent:
+    meta = []
+    for pattern in _TWITTER_META:
+        # Each phrase is cut from what the previous ones left, so a cut can join text into a new match
+        content = pattern.sub(lambda match: meta.append(match.group()) or '', content)
+
+    pieces = []
+    hashtags = []
+    position = 0
+    for match in _HASHTAG.finditer(content):
+        pieces.append(content[position:match.start()])
+        position = match.end()
+        hashtags.append(match.group())
+    pieces.append(content[position:])
+
+    body = _TWITTER_QUOTES.sub('', ''.join(pieces).strip()).strip()
+    body = _NEWLINES.sub(' ', body).strip()
+    # If content is still too meta or empty, use a simple fallback
+    if len(body) < 10 or 'puedes hacerme' in body.lower():
+        body = TWITTER_FALLBACK
+    citations = list(map(int, _CITATION.findall(body))) if '[' in body else []
+    return NormalizedContent(body, hashtags, meta, citations)
+
+
+def _normalize_post(content: str) -> NormalizedContent:
+    hashtags = {}
+    meta = []
+
+    match = _POST_META.match(content)
+    if match:
+        meta.append(match.group().strip())
+        content = content[match.end():]
+
+    # Hashtag-only lines are cut together with the blank lines before them,
+    # so removing one never leaves a gap wider than the text already had
+    text = '\n' + content
+    pieces = []
+    position = 0
+    if '#' in text:
+        for match in _HASHTAG_LINE.finditer(text):
+            pieces.append(text[position:match.start()].rstrip('\n'))
+            position = match.end()
+            for tag in _HASHTAG.findall(match.group()):
+                hashtags.setdefault(tag, None)
+    pieces.append(text[position:])
+    body = ''.join(pieces).rstrip()
+
+    last_line = body.rfind('\n') + 1
+    match = _TRAILING_HASHTAGS.search(body, last_line)
+    if match and match.start() > last_line:
+        for tag in _HASHTAG.findall(match.group()):
+            hashtags.setdefault(tag, None)
+        body = body[:match.start()]
+
+    citations = list(dict.fromkeys(map(int, _CITATION.findall(body)))) if '[' in body else []
+    return NormalizedContent(body.strip(), list(hashtags), meta, citations)
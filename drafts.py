@@ -0,0 +1,137 @@
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import inspect, literal_column, select, table, text
+from models import db, Draft
+
+# Largest page a client may request
+MAX_PAGE_SIZE = 100
+
+# SQLite full-text index kept in sync with the drafts table by triggers
+SQLITE_FTS_STATEMENTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS drafts_fts USING fts5("
+    "title, content, content='drafts', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS drafts_fts_insert AFTER INSERT ON drafts BEGIN "
+    "INSERT INTO drafts_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS drafts_fts_delete AFTER DELETE ON drafts BEGIN "
+    "INSERT INTO drafts_fts(drafts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS drafts_fts_update AFTER UPDATE ON drafts BEGIN "
+    "INSERT INTO drafts_fts(drafts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO drafts_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "INSERT INTO drafts_fts(drafts_fts) VALUES ('rebuild')",
+]
+
+# PostgreSQL: the search expression and the GIN index over it must match exactly
+POSTGRES_SEARCH_VECTOR = "to_tsvector('simple', coalesce(drafts.title, '') || ' ' || drafts.content)"
+POSTGRES_SEARCH_INDEX = (
+    "CREATE INDEX IF NOT EXISTS ix_drafts_search ON drafts "
+    "USING GIN (to_tsvector('simple', coalesce(title, '') || ' ' || content))"
+)
+
+
+def create_search_index():
+    """Create the full-text index over draft titles and content.
+
+    Falls back to LIKE searches when the database has no full-text support
+    (e.g. SQLite built without FTS5).
+    """
+    dialect = db.engine.dialect.name
+    try:
+        with db.engine.begin() as connection:
+            if dialect == 'postgresql':
+                connection.execute(text(POSTGRES_SEARCH_INDEX))
+            elif dialect == 'sqlite':
+                for statement in SQLITE_FTS_STATEMENTS:
+                    connection.execute(text(statement))
+    except Exception as e:
+        logging.warning(f"Draft full-text index unavailable, searches will use LIKE: {e}")
+
+
+def make_title(content: str) -> str:
+    """Derive a draft title from the start of its content"""
+    content = content or ''
+    return content[:50] + '...' if len(content) > 50 else content
+
+
+class DraftStore:
+    """Per-user draft repository backed by the drafts table"""
+
+    def __init__(self):
+        self._fts_available = None
+
+    def create(self, user_id: str, platform: Optional[str], content: str, hashtags=None,
+               created_at: Optional[datetime] = None) -> Draft:
+        """Save a new draft"""
+        draft = Draft(
+            user_id=user_id,
+            platform=platform,
+            title=make_title(content),
+            content=content or '',
+            hashtags=hashtags,
+            created_at=created_at or datetime.now()
+        )
+        db.session.add(draft)
+        db.session.commit()
+        return draft
+
+    def get(self, user_id: str, draft_id: int) -> Optional[Draft]:
+        """Find one of a user's drafts"""
+        return Draft.query.filter_by(id=draft_id, user_id=user_id).first()
+
+    def delete(self, user_id: str, draft_id: int) -> bool:
+        """Delete one of a user's drafts; returns whether it existed"""
+        deleted = Draft.query.filter_by(id=draft_id, user_id=user_id).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted > 0
+
+    def list(self, user_id: str, page: int = 1, per_page: int = 20,
+             query: Optional[str] = None) -> Tuple[List[Draft], int]:
+        """Get one page of a user's drafts, newest first, and the total matching count"""
+        page = max(1, page)
+        per_page = max(1, min(MAX_PAGE_SIZE, per_page))
+        drafts = Draft.query.filter(Draft.user_id == user_id)
+        if query and query.strip():
+            drafts = self._search(drafts, query.strip())
+        total = drafts.count()
+        items = drafts.order_by(Draft.id.desc()).offset((page - 1) * per_page).limit(per_page).all()
+        return items, total
+
+    def list_after(self, user_id: str, after_id: Optional[int] = None, limit: Optional[int] = None,
+                   query: Optional[str] = None) -> List[Draft]:
+        """Get a user's drafts, newest first, that come after the draft with id after_id (keyset paging)"""
+        drafts = Draft.query.filter(Draft.user_id == user_id)
+        if query and query.strip():
+            drafts = self._search(drafts, query.strip())
+        if after_id is not None:
+            drafts = drafts.filter(Draft.id < after_id)
+        return drafts.order_by(Draft.id.desc()).limit(limit).all()
+
+    def _search(self, drafts, query: str):
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            return drafts.filter(text(
+                f"{POSTGRES_SEARCH_VECTOR} @@ plainto_tsquery('simple', :draft_query)"
+            ).bindparams(draft_query=query))
+        if dialect == 'sqlite' and self._has_sqlite_fts():
+            matches = select(literal_column('rowid')).select_from(table('drafts_fts')).where(
+                text('drafts_fts MATCH :draft_query').bindparams(draft_query=self._fts_query(query))
+            )
+            return drafts.filter(Draft.id.in_(matches))
+        pattern = f"%{query}%"
+        return drafts.filter(db.or_(Draft.title.ilike(pattern), Draft.content.ilike(pattern)))
+
+    def _has_sqlite_fts(self) -> bool:
+        if self._fts_available is None:
+            self._fts_available = inspect(db.engine).has_table('drafts_fts')
+        return self._fts_available
+
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        """Quote every term so user input is never parsed as FTS5 syntax; the last one matches as a prefix"""
+        terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+
+# Global draft store instance
+draft_store = DraftStore()
@@ -1,19 +1,59 @@
 import os
+import time
 import base64
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+import threading
+from collections import OrderedDict
 import logging
 
+# Seconds a decrypted secret stays in the in-memory cache
+DECRYPT_CACHE_TTL = float(os.environ.get('ENCRYPTION_CACHE_TTL', '300'))
+# Decrypted secrets kept in memory per process, least recently used evicted first
+DECRYPT_CACHE_SIZE = int(os.environ.get('ENCRYPTION_CACHE_SIZE', '256'))
+# Credential fields stored encrypted by encrypt_credentials and needed in clear by the API clients
+ENCRYPTED_CREDENTIAL_FIELDS = ('api_key', 'api_secret', 'access_token', 'access_token_secret', 'bearer_token')
+
 class APIKeyEncryption:
-    """Secure encryption for API keys using Fernet symmetric encryption"""
+    """Secure encryption for API keys using Fernet symmetric encryption.
+
+    The key is derived, and cryptography imported, on first use (or by warm(),
+    e.g. in the gunicorn master before workers fork). Decrypted values
+    are cached by ciphertext for a short time; a rotated or removed secret has
+    a new or no ciphertext, and forget() drops the old value right away.
+    """
     
     def __init__(self):
-        self.encryption_key = self._get_or_create_key()
-        self.cipher = Fernet(self.encryption_key)
+        self._cipher = None
+        self._encryption_key = None
+        self._key_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+    
+    @property
+    def cipher(self):
+        """Fernet cipher, deriving the key on first use"""
+        if self._cipher is None:
+            self.warm()
+        return self._cipher
+    
+    @property
+    def encryption_key(self):
+        """Derived Fernet key"""
+        if self._encryption_key is None:
+            self.warm()
+        return self._encryption_key
+    
+    def warm(self):
+        """Derive the key now instead of on the first encrypt or decrypt"""
+        from cryptography.fernet import Fernet
+        with self._key_lock:
+            if self._cipher is None:
+                self._encryption_key = self._get_or_create_key()
+                self._cipher = Fernet(self._encryption_key)
     
     def _get_or_create_key(self):
         """Get existing encryption key or create a new one"""
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
         # Use a combination of environment variables to create a stable key
         password = os.environ.get("SESSION_SECRET", "default-secret-key")
         salt = b'social_media_dashboard_salt'  # Static salt for consistency
@@ -42,13 +82,52 @@ class APIKeyEncryption:
         """Decrypt an API key"""
         if not encrypted_key:
             return None
+        cached = self._cached(encrypted_key)
+        if cached is not None:
+            return cached
         try:
             encrypted_data = base64.urlsafe_b64decode(encrypted_key.encode())
-            decrypted_key = self.cipher.decrypt(encrypted_data)
-            return decrypted_key.decode()
+            decrypted_key = self.cipher.decrypt(encrypted_data).decode()
         except Exception as e:
             logging.error(f"Error decrypting API key: {e}")
             return None
+        self._store(encrypted_key, decrypted_key)
+        return decrypted_key
+    
+    def forget(self, *encrypted_values):
+        """Drop cached plaintext for ciphertexts that were rotated or removed"""
+        with self._cache_lock:
+            for value in encrypted_values:
+                if isinstance(value, dict):
+                    for item in value.values():
+                        self._cache.pop(item, None)
+                elif value:
+                    self._cache.pop(value, None)
+    
+    def clear_cache(self):
+        """Drop every cached plaintext"""
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def _cached(self, encrypted_key):
+        with self._cache_lock:
+            entry = self._cache.get(encrypted_key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._cache[encrypted_key]
+                return None
+            self._cache.move_to_end(encrypted_key)
+            return entry[0]
+    
+    def _store(self, encrypted_key, decrypted_key):
+        if DECRYPT_CACHE_SIZE <= 0 or DECRYPT_CACHE_TTL <= 0:
+            return
+        with self._cache_lock:
+            self._cache[encrypted_key] = (decrypted_key, time.monotonic() + DECRYPT_CACHE_TTL)
+            self._cache.move_to_end(encrypted_key)
+            while len(self._cache) > DECRYPT_CACHE_SIZE:
+                self._cache.popitem(last=False)
     
     def encrypt_credentials(self, credentials_dict):
         """Encrypt a dictionary of credentials"""
@@ -64,7 +143,7 @@ class APIKeyEncryption:
         """Decrypt a dictionary of credentials"""
         decrypted_creds = {}
         for key, value in encrypted_creds.items():
-            if value and isinstance(value, str) and key in ['api_key', 'api_secret', 'access_token']:
+            if value and isinstance(value, str) and key in ENCRYPTED_CREDENTIAL_FIELDS:
                 decrypted_creds[key] = self.decrypt_api_key(value)
             else:
                 decrypted_creds[key] = value
@@ -0,0 +1,38 @@
+import os
+import sys
+
+# Derive the encryption key once in the master so forked workers inherit it
+# instead of each running PBKDF2 on their first request
+DERIVE_KEY_IN_MASTER = os.environ.get('ENCRYPTION_DERIVE_IN_MASTER', '1') == '1'
+# Boot each worker and open its database and AI provider connections before
+# it accepts requests, instead of on its first request
+PREWARM_AFTER_FORK = os.environ.get('PREWARM_AFTER_FORK', '0') == '1'
+
+
+def on_starting(server):
+    """Runs in the master before any worker is forked"""
+    if DERIVE_KEY_IN_MASTER:
+        from encryption import encryption_service
+        encryption_service.warm()
+        server.log.info("Encryption key derived in master")
+
+
+def post_fork(server, worker):
+    """Runs in each worker right after fork"""
+    # With --preload the app was imported in the master: drop any pooled
+    # connection it may have opened so workers never share a socket
+    from http_client import http_client
+    http_client.reset()
+    if 'app' in sys.modules:
+        from app import app
+        from models import db
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    """Runs in each worker once the app is loaded, before it accepts requests"""
+    if PREWARM_AFTER_FORK:
+        from app import prewarm_connections
+        prewarm_connections()
+        worker.log.info("Worker pre-warmed")
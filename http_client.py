@@ -0,0 +1,109 @@
+import os
+import logging
+import threading
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    import requests
+
+# Connection pool and timeout defaults, overridable per deployment
+DEFAULT_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '10'))
+DEFAULT_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', '5'))
+DEFAULT_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', '30'))
+
+
+class HTTPClient:
+    """Shared outbound HTTP transport with keep-alive connection pools per host"""
+
+    def __init__(self, pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT):
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._host_pool_sizes: Dict[str, int] = {}
+        self._sessions: Dict[str, 'requests.Session'] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """Default (connect, read) timeout applied to every request"""
+        return (self.connect_timeout, self.read_timeout)
+
+    def configure_host(self, url: str, pool_maxsize: int):
+        """Set the connection pool size for the host of the given URL"""
+        host = self._host_key(url)
+        with self._lock:
+            self._host_pool_sizes[host] = max(1, pool_maxsize)
+            # Rebuild the session on next use so the new size takes effect
+            session = self._sessions.pop(host, None)
+        if session is not None:
+            session.close()
+
+    def session_for(self, url: str) -> 'requests.Session':
+        """Get the pooled session for the host of the given URL"""
+        if self._pid != os.getpid():
+            # Sockets inherited from a parent process must not be reused
+            self.reset()
+
+        host = self._host_key(url)
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = self._create_session(self._host_pool_sizes.get(host, self.pool_maxsize))
+                    self._sessions[host] = session
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> 'requests.Response':
+        """Send a request through the host's pooled session"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session_for(url).request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> 'requests.Response':
+        """Send a GET request"""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> 'requests.Response':
+        """Send a POST request"""
+        return self.request('POST', url, **kwargs)
+
+    def warm(self, urls):
+        """Open a pooled connection to each URL's host ahead of the first real request"""
+        for url in urls:
+            try:
+                self.request('HEAD', url, timeout=(self.connect_timeout, self.connect_timeout))
+            except Exception as e:
+                logging.warning(f"Could not pre-open a connection to {self._host_key(url)}: {e}")
+
+    def reset(self):
+        """Close every pooled connection"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions = {}
+            self._pid = os.getpid()
+        for session in sessions:
+            session.close()
+
+    def _create_session(self, pool_maxsize: int) -> 'requests.Session':
+        """Create a keep-alive session with a bounded connection pool"""
+        # Imported on first use so starting a worker does not pay for requests
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    @staticmethod
+    def _host_key(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+
+# Global HTTP client instance
+http_client = HTTPClient()
@@ -0,0 +1,195 @@
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from sqlalchemy import and_, or_, update
+from models import db, Job
+
+# Threads running background jobs in each worker process
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '4'))
+# Jobs whose worker has not reported for this long, or still queued after it, are recovered
+JOB_CLAIM_TIMEOUT = int(os.environ.get('JOB_CLAIM_TIMEOUT', '300'))
+# Attempts before an abandoned job is marked as failed instead of run again
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+# How often each worker looks for abandoned jobs, in seconds
+JOB_RECOVERY_INTERVAL = float(os.environ.get('JOB_RECOVERY_INTERVAL', '60'))
+
+
+class JobQueue:
+    """Runs background jobs on a worker pool and records their progress in the database.
+
+    Jobs start in the process that enqueued them, while their status lives
+    in the jobs table so any worker can answer a status poll. A job runs in
+    the worker whose conditional UPDATE claims it, and its claim is renewed
+    whenever it reports progress. Every worker periodically re-runs jobs left
+    queued or running by a worker that was recycled or crashed, so a job
+    started by a dead process is finished by another one, or failed after
+    JOB_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._handlers: Dict[str, Callable] = {}
+        self._executor = None
+        self._pid = None
+        self._thread = None
+        self._thread_pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+
+    @property
+    def enabled(self) -> bool:
+        return os.environ.get('JOB_RECOVERY_ENABLED', '1') != '0'
+
+    def start(self):
+        """Start the recovery thread in this process if it is not running"""
+        if not self.enabled or self.app is None:
+            return
+        if self._thread_pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._recover_loop, name='job-recovery', daemon=True)
+            self._thread.start()
+
+    def handler(self, kind: str):
+        """Register the function that runs jobs of the given kind.
+
+        The function receives the Job and a report_progress(progress, message)
+        callback; its return value is stored as the job result and raising
+        marks the job as failed.
+        """
+        def decorator(func):
+            self._handlers[kind] = func
+            return func
+        return decorator
+
+    def enqueue(self, kind: str, payload: Dict, user_id: Optional[str] = None) -> Job:
+        """Record a new job and hand it to the worker pool"""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+
+        job = Job(id=str(uuid.uuid4()), kind=kind, user_id=user_id, status='queued', progress=0, payload=payload)
+        db.session.add(job)
+        db.session.commit()
+
+        self._get_executor().submit(self._run, job.id)
+        return job
+
+    def get(self, job_id: str, user_id: Optional[str] = None) -> Optional[Job]:
+        """Find a job, optionally restricted to the user who created it"""
+        query = Job.query.filter_by(id=job_id)
+        if user_id is not None:
+            query = query.filter_by(user_id=user_id)
+        return query.first()
+
+    def recover(self, now: Optional[float] = None) -> int:
+        """Re-run jobs abandoned by a dead worker and fail those out of attempts; returns how many were found"""
+        now = int(now if now is not None else time.time())
+        stale = or_(
+            and_(Job.status == 'queued', Job.created_at < datetime.fromtimestamp(now - JOB_CLAIM_TIMEOUT)),
+            and_(Job.status == 'running', Job.locked_at < now - JOB_CLAIM_TIMEOUT)
+        )
+        abandoned = Job.query.filter(stale).all()
+        db.session.commit()
+        for job in abandoned:
+            if job.attempts < JOB_MAX_ATTEMPTS:
+                logging.warning(f"Recovering job {job.id} ({job.kind}) left {job.status} by {job.locked_by or 'its worker'}")
+                self._get_executor().submit(self._run, job.id)
+                continue
+            # Conditional, so a job another worker just claimed or finished is left alone
+            giving_up = update(Job).where(Job.id == job.id, stale).values(
+                status='failed',
+                error='El trabajo se interrumpió demasiadas veces',
+                locked_by=None,
+                locked_at=None,
+                finished_at=datetime.now()
+            ).execution_options(synchronize_session=False)
+            if db.session.execute(giving_up).rowcount:
+                logging.error(f"Giving up on job {job.id} ({job.kind}) after {job.attempts} attempts")
+            db.session.commit()
+        return len(abandoned)
+
+    def _recover_loop(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.recover()
+            except Exception as e:
+                logging.error(f"Error recovering jobs: {e}")
+            time.sleep(JOB_RECOVERY_INTERVAL)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Get this process's worker pool, creating it on first use"""
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='jobs')
+                    self._pid = os.getpid()
+                    # State inherited from a parent process belongs to that process
+                    self.worker_id = f"{socket.gethostname()}:{self._pid}"
+        return self._executor
+
+    def _claim(self, job_id: str, now: int) -> bool:
+        """Atomically mark a queued or abandoned job as run by this worker"""
+        claim = update(Job).where(
+            Job.id == job_id,
+            Job.attempts < JOB_MAX_ATTEMPTS,
+            or_(
+                Job.status == 'queued',
+                and_(Job.status == 'running', Job.locked_at < now - JOB_CLAIM_TIMEOUT)
+            )
+        ).values(
+            status='running',
+            locked_by=self.worker_id,
+            locked_at=now,
+            started_at=datetime.now(),
+            attempts=Job.attempts + 1
+        ).execution_options(synchronize_session=False)
+        claimed = db.session.execute(claim).rowcount == 1
+        db.session.commit()
+        return claimed
+
+    def _run(self, job_id: str):
+        with self.app.app_context():
+            if not self._claim(job_id, int(time.time())):
+                return
+            job = db.session.get(Job, job_id)
+
+            def report_progress(progress: int, message: Optional[str] = None):
+                job.progress = max(0, min(100, int(progress)))
+                if message:
+                    job.message = message
+                # Reporting renews the claim, so a long job is not taken for abandoned
+                job.locked_at = int(time.time())
+                db.session.commit()
+
+            try:
+                job.result = self._handlers[job.kind](job, report_progress)
+                job.status = 'succeeded'
+                job.progress = 100
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Job {job_id} ({job.kind}) failed: {e}")
+                job.status = 'failed'
+                job.error = str(e)
+            job.locked_by = None
+            job.locked_at = None
+            job.finished_at = datetime.now()
+            db.session.commit()
+
+
+# Global job queue instance
+job_queue = JobQueue()
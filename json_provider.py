@@ -0,0 +1,78 @@
+import os
+import logging
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+
+# JSON implementation for responses: 'orjson', 'stdlib', or 'auto' (orjson when installed)
+JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto')
+
+
+class IsoJSONProvider(DefaultJSONProvider):
+    """Standard library JSON with ISO 8601 dates, matching what orjson produces.
+
+    Flask's default encodes datetimes as HTTP dates; models and responses pass
+    datetimes as they are and rely on the provider to format them. Keys stay
+    sorted, as with Flask's default, so response bodies are unchanged.
+    """
+
+    ensure_ascii = False
+
+    @staticmethod
+    def default(value):
+        if isinstance(value, date):
+            return value.isoformat()
+        return DefaultJSONProvider.default(value)
+
+
+class OrjsonProvider(IsoJSONProvider):
+    """orjson-backed provider: serializes datetimes, dates, UUIDs and dataclasses natively.
+
+    Responses are built from the bytes orjson returns, skipping the str
+    round trip of the standard provider.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        import orjson
+        self._orjson = orjson
+        self._options = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs) -> str:
+        return self._dumps(obj, kwargs).decode()
+
+    def loads(self, s, **kwargs):
+        return self._orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        options = self._options
+        if self.sort_keys:
+            options |= self._orjson.OPT_SORT_KEYS
+        if self._app.debug:
+            options |= self._orjson.OPT_INDENT_2
+        return self._app.response_class(
+            self._orjson.dumps(obj, default=self.default, option=options | self._orjson.OPT_APPEND_NEWLINE),
+            mimetype=self.mimetype
+        )
+
+    def _dumps(self, obj, kwargs) -> bytes:
+        options = self._options
+        if kwargs.get('sort_keys', self.sort_keys):
+            options |= self._orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            options |= self._orjson.OPT_INDENT_2
+        return self._orjson.dumps(obj, default=kwargs.get('default', self.default), option=options)
+
+
+def init_json(app):
+    """Install the fastest available JSON provider on the app"""
+    if JSON_PROVIDER != 'stdlib':
+        try:
+            app.json = OrjsonProvider(app)
+            logging.info("JSON provider: orjson")
+            return
+        except ImportError:
+            if JSON_PROVIDER == 'orjson':
+                logging.warning("JSON_PROVIDER=orjson but orjson is not installed, using the standard library")
+    app.json = IsoJSONProvider(app)
+    logging.info("JSON provider: standard library")
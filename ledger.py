@@ -0,0 +1,105 @@
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from models import db, PublishedPost, PublishCounter, RecentPublication
+
+# Publications kept per owner in the recent-posts ring
+RECENT_SIZE = int(os.environ.get('LEDGER_RECENT_SIZE', '10'))
+# Owner of publications not made by a specific user, such as scheduled posts
+SHARED_OWNER = ''
+# Counter period holding the all-time count
+TOTAL_PERIOD = 'all'
+# Counter platform holding the owner's count over every platform, used to number ring slots
+ALL_PLATFORMS = '*'
+
+
+class PublicationLedger:
+    """Records published posts and keeps their monitoring aggregates up to date.
+
+    Every publication bumps an all-time and a per-day counter for its owner
+    and platform and takes the next slot of the owner's recent-posts ring, in
+    the same transaction as the post itself. Reads only touch those rows, so
+    they cost the same however long the publish history is.
+    """
+
+    def record(self, post: PublishedPost):
+        """Add a published post and update the aggregates; the caller commits"""
+        if post.published_date is None:
+            post.published_date = datetime.now()
+        db.session.add(post)
+        db.session.flush()
+        self.count(post.id, post.user_id, post.platform, post.published_date)
+
+    def count(self, post_id: str, user_id: Optional[str], platform: str, published_date: datetime):
+        """Update the aggregates for a post that is already stored; the caller commits"""
+        owner = user_id or SHARED_OWNER
+        self._increment(owner, platform, TOTAL_PERIOD)
+        self._increment(owner, platform, published_date.date().isoformat())
+        seq = self._increment(owner, ALL_PLATFORMS, TOTAL_PERIOD)
+        self._store_recent(owner, seq, post_id)
+
+    def summary(self, owners: Iterable[str], day: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """Get published_today and total_posts per platform, summed over the given owners"""
+        day = day or datetime.now().date().isoformat()
+        counters = PublishCounter.query.filter(
+            PublishCounter.user_id.in_(list(owners)),
+            PublishCounter.platform != ALL_PLATFORMS,
+            PublishCounter.period.in_([TOTAL_PERIOD, day])
+        )
+        summary = {}
+        for counter in counters:
+            platform = summary.setdefault(counter.platform, {'published_today': 0, 'total_posts': 0})
+            if counter.period == TOTAL_PERIOD:
+                platform['total_posts'] += counter.count
+            else:
+                platform['published_today'] += counter.count
+        return summary
+
+    def recent(self, owners: Iterable[str], limit: int = RECENT_SIZE) -> List[PublishedPost]:
+        """Get the most recent publications of the given owners, oldest first"""
+        posts = db.session.query(PublishedPost).join(
+            RecentPublication, RecentPublication.post_id == PublishedPost.id
+        ).filter(
+            RecentPublication.user_id.in_(list(owners))
+        ).order_by(PublishedPost.published_date.desc()).limit(limit).all()
+        posts.reverse()
+        return posts
+
+    def _increment(self, owner: str, platform: str, period: str) -> int:
+        """Add one to a counter, creating it if needed, and return its new value"""
+        key = (
+            PublishCounter.user_id == owner,
+            PublishCounter.platform == platform,
+            PublishCounter.period == period
+        )
+        bump = update(PublishCounter).where(*key).values(
+            count=PublishCounter.count + 1
+        ).execution_options(synchronize_session=False)
+
+        if db.session.execute(bump).rowcount == 0:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(PublishCounter(user_id=owner, platform=platform, period=period, count=1))
+                return 1
+            except IntegrityError:
+                # Another worker created the counter first
+                db.session.execute(bump)
+        return db.session.query(PublishCounter.count).filter(*key).scalar()
+
+    def _store_recent(self, owner: str, seq: int, post_id: str):
+        """Overwrite the oldest slot of the owner's ring with a publication"""
+        slot = (seq - 1) % RECENT_SIZE
+        replace = update(RecentPublication).where(
+            RecentPublication.user_id == owner,
+            RecentPublication.slot == slot
+        ).values(seq=seq, post_id=post_id).execution_options(synchronize_session=False)
+
+        if db.session.execute(replace).rowcount == 0:
+            db.session.add(RecentPublication(user_id=owner, slot=slot, seq=seq, post_id=post_id))
+            db.session.flush()
+
+
+# Global ledger instance
+publication_ledger = PublicationLedger()
@@ -0,0 +1,157 @@
+import json
+import base64
+import hashlib
+from urllib.parse import urlencode
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from flask import Response, jsonify, request
+from sqlalchemy import event, update
+from models import db, CollectionVersion
+
+# Tables whose list endpoints answer conditional GETs
+VERSIONED_TABLES = ('scheduled_posts', 'social_accounts', 'drafts', 'ai_providers')
+# Largest page a client may request
+MAX_LIMIT = 500
+
+
+class InvalidListArgs(ValueError):
+    """A list request has a malformed cursor, limit or fields parameter"""
+
+
+class CollectionVersions:
+    """Per-table change counters that make list ETags cheap to check.
+
+    Every flush that inserts, updates or deletes rows of a versioned table,
+    and every bulk UPDATE/DELETE issued through the session, bumps the table's
+    counter in the same transaction. A list endpoint can then answer
+    If-None-Match by reading one row, without loading or serializing the
+    collection. Writes made outside the ORM session are not seen.
+    """
+
+    def init_app(self, app):
+        event.listen(db.session, 'after_flush', self._after_flush)
+        event.listen(db.session, 'do_orm_execute', self._on_execute)
+
+    def seed(self):
+        """Create the counter of every versioned table that has none; the caller commits"""
+        existing = {name for (name,) in db.session.query(CollectionVersion.name)}
+        for name in VERSIONED_TABLES:
+            if name not in existing:
+                db.session.add(CollectionVersion(name=name, version=0))
+
+    def get(self, table_name: str) -> Optional[int]:
+        """Get a table's current version, or None if it is not tracked"""
+        return db.session.query(CollectionVersion.version).filter_by(name=table_name).scalar()
+
+    @staticmethod
+    def _bump(connection, table_names: Iterable[str]):
+        for name in sorted(table_names):
+            connection.execute(
+                update(CollectionVersion.__table__).where(CollectionVersion.__table__.c.name == name)
+                .values(version=CollectionVersion.__table__.c.version + 1)
+            )
+
+    def _after_flush(self, session, flush_context):
+        changed = {obj for obj in session.new | session.deleted}
+        changed.update(obj for obj in session.dirty if session.is_modified(obj, include_collections=False))
+        tables = {getattr(type(obj), '__tablename__', None) for obj in changed}
+        tables.intersection_update(VERSIONED_TABLES)
+        if tables:
+            self._bump(session.connection(), tables)
+
+    def _on_execute(self, orm_execute_state):
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.local_table.name in VERSIONED_TABLES:
+            self._bump(orm_execute_state.session.connection(), [mapper.local_table.name])
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({'id': last_id}).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))['id'])
+    except (ValueError, KeyError, TypeError):
+        raise InvalidListArgs('Invalid cursor')
+
+
+def list_args() -> Tuple[Optional[int], Optional[int], Optional[List[str]]]:
+    """Read cursor, limit and fields from the query string.
+
+    Without a limit (and cursor) the whole collection is returned, as before
+    pagination existed.
+    """
+    cursor = request.args.get('cursor')
+    after_id = decode_cursor(cursor) if cursor else None
+    limit = request.args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise InvalidListArgs('Invalid limit')
+        limit = max(1, min(MAX_LIMIT, limit))
+    elif after_id is not None:
+        limit = MAX_LIMIT
+    fields = request.args.get('fields')
+    fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+    return after_id, limit, fields
+
+
+def trim(item: Dict, fields: Optional[List[str]]) -> Dict:
+    """Keep only the requested fields of a serialized item (and always its id)"""
+    if not fields:
+        return item
+    return {key: item[key] for key in ['id'] + fields if key in item}
+
+
+def list_response(table_name: str, load: Callable[[Optional[int], Optional[int]], List],
+                  scope: str = '', envelope: Optional[Callable[[List[Dict]], Dict]] = None) -> Response:
+    """Serve one page of a collection with a version-derived ETag.
+
+    load(after_id, limit) returns the items following the cursor in list
+    order, at most limit + 1 of them so a next page can be detected. scope
+    adds anything else the body depends on (e.g. the user) to the ETag, and
+    envelope wraps the item list when the endpoint does not return a bare
+    array. The next cursor is sent in X-Next-Cursor and a Link header.
+    """
+    try:
+        after_id, limit, fields = list_args()
+    except InvalidListArgs as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Read before the items: a write landing in between only makes the ETag stale, never wrong
+    version = collection_versions.get(table_name)
+    etag = None
+    if version is not None:
+        raw = f"{table_name}:{version}:{scope}:{request.query_string.decode()}"
+        etag = hashlib.sha256(raw.encode()).hexdigest()[:32]
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+
+    items = load(after_id, limit + 1 if limit else None)
+    next_cursor = None
+    if limit and len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].id)
+
+    body = [trim(item.to_dict(), fields) for item in items]
+    response = jsonify(envelope(body) if envelope else body)
+    if etag:
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    if next_cursor:
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        args.setdefault('limit', str(limit))
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+    return response
+
+
+# Global collection versions instance
+collection_versions = CollectionVersions()
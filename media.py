@@ -0,0 +1,165 @@
+import os
+import time
+import hashlib
+import logging
+import tempfile
+from datetime import datetime
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from models import db, MediaAsset, MediaUpload
+
+# Directory holding uploaded media, one file per content hash
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'media'))
+# Largest upload accepted, in bytes
+MEDIA_MAX_BYTES = int(os.environ.get('MEDIA_MAX_BYTES', str(512 * 1024 * 1024)))
+# Buffer used to stream uploads to disk
+BUFFER_SIZE = 1024 * 1024
+# Platform media ids this close to expiry are uploaded again rather than reused
+EXPIRY_MARGIN = 600
+
+# Leading bytes of the accepted formats; the client's Content-Type is not trusted
+SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+
+class MediaTooLarge(Exception):
+    """An upload exceeded MEDIA_MAX_BYTES"""
+
+
+class UnsupportedMedia(Exception):
+    """An upload is empty or not an accepted image or video format"""
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Identify an accepted media type from a file's first 16 bytes"""
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[4:8] == b'ftyp':
+        return 'video/quicktime' if head[8:10] == b'qt' else 'video/mp4'
+    return None
+
+
+class MediaStore:
+    """Content-addressed storage for uploaded images and videos.
+
+    Uploads are streamed to a temporary file in fixed-size reads while being
+    hashed, then moved to a path derived from their SHA-256, so the same file
+    uploaded twice is stored once and maps to one MediaAsset. Platform
+    uploads are tracked per asset and account (MediaUpload): their protocol
+    state is saved after every step so an interrupted upload resumes, and a
+    finished one is reused until the platform expires its media id.
+    """
+
+    def __init__(self, root: str = MEDIA_ROOT):
+        self.root = root
+
+    def path(self, asset: MediaAsset) -> str:
+        return os.path.join(self.root, asset.sha256[:2], asset.sha256[2:4], asset.sha256)
+
+    def save(self, stream: BinaryIO, filename: Optional[str] = None,
+             max_bytes: int = MEDIA_MAX_BYTES) -> Tuple[MediaAsset, bool]:
+        """Store an uploaded file read from a stream; returns its asset and whether it is new"""
+        temp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        head = b''
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                while True:
+                    chunk = stream.read(BUFFER_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise MediaTooLarge(f"Media larger than {max_bytes} bytes")
+                    if len(head) < 16:
+                        head += chunk[:16 - len(head)]
+                    digest.update(chunk)
+                    output.write(chunk)
+
+            content_type = sniff_content_type(head)
+            if not size or content_type is None:
+                raise UnsupportedMedia("Only JPEG, PNG, GIF, WebP, MP4 and MOV files are accepted")
+
+            sha256 = digest.hexdigest()
+            path = os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        asset = MediaAsset.query.filter_by(sha256=sha256).first()
+        if asset:
+            return asset, False
+        asset = MediaAsset(
+            sha256=sha256, content_type=content_type, size=size,
+            filename=os.path.basename(filename)[:255] if filename else None,
+            created_at=datetime.now()
+        )
+        try:
+            with db.session.begin_nested():
+                db.session.add(asset)
+        except IntegrityError:
+            # Another worker stored the same file first
+            return MediaAsset.query.filter_by(sha256=sha256).one(), False
+        db.session.commit()
+        return asset, True
+
+    def get_many(self, asset_ids: List[int]) -> Optional[List[MediaAsset]]:
+        """Get assets in the given order, or None if any does not exist"""
+        if not asset_ids:
+            return []
+        assets = {asset.id: asset for asset in MediaAsset.query.filter(MediaAsset.id.in_(asset_ids))}
+        if any(asset_id not in assets for asset_id in asset_ids):
+            return None
+        return [assets[asset_id] for asset_id in asset_ids]
+
+    def platform_media_id(self, asset: MediaAsset, platform: str, account_id: int,
+                          upload: Callable[[str, str, Dict, Callable[[Dict], None]], Optional[str]]) -> Optional[str]:
+        """Get the platform media id of an asset, uploading it or resuming its upload if needed.
+
+        upload(path, content_type, state, save_progress) runs the platform's
+        protocol from the saved state and returns the media id, or None on error.
+        """
+        record = MediaUpload.query.filter_by(asset_id=asset.id, platform=platform, account_id=account_id).first()
+        if record is None:
+            record = MediaUpload(asset_id=asset.id, platform=platform, account_id=account_id, state={})
+            try:
+                with db.session.begin_nested():
+                    db.session.add(record)
+            except IntegrityError:
+                record = MediaUpload.query.filter_by(asset_id=asset.id, platform=platform, account_id=account_id).one()
+            db.session.commit()
+        elif record.media_id and (record.expires_ts or 0) > time.time() + EXPIRY_MARGIN:
+            return record.media_id
+
+        def save_progress(state: Dict):
+            record.state = dict(state)
+            record.updated_at = datetime.now()
+            db.session.commit()
+
+        state = dict(record.state or {}) if not record.media_id else {}
+        media_id = upload(self.path(asset), asset.content_type, state, save_progress)
+        if media_id:
+            record.media_id = media_id
+            record.expires_ts = int(state.get('expires_at') or 0)
+            record.state = {}
+            record.updated_at = datetime.now()
+            db.session.commit()
+            logging.info(f"Uploaded media {asset.id} to {platform} as {media_id}")
+        return media_id
+
+
+# Global media store instance
+media_store = MediaStore()
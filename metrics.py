@@ -0,0 +1,452 @@
+import os
+import json
+import time
+import bisect
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Serve GET /metrics; scrapers authenticate with "Authorization: Bearer <METRICS_TOKEN>",
+# without a token only logged-in users can read it
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# Directory where every worker process publishes its samples, so whichever
+# worker answers a scrape reports all of them; unset keeps metrics per process
+METRICS_DIR = os.environ.get('METRICS_DIR')
+# Seconds between two snapshots written to METRICS_DIR
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '5'))
+
+# Histogram bucket bounds: seconds for latencies, bytes for sizes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Family:
+    """A named metric with a fixed set of label names.
+
+    Updates go to a dict owned by the updating thread, so they take no lock:
+    only the owner writes to it and a scrape copies it. The registry lock is
+    taken once per thread and family, when the thread first updates it, and
+    by collection.
+    """
+
+    kind = ''
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._registry = registry
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, Dict]] = []
+        # Values of threads that have exited, folded in by collection
+        self._retired: Dict = {}
+
+    def _shard(self) -> Dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = {}
+            with self._registry._lock:
+                self._shards.append((threading.current_thread(), values))
+            self._local.values = values
+            return values
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple([str(labels[name]) for name in self.labelnames])
+
+    def _merge(self, total: Dict, values: Dict):
+        for key, value in values.items():
+            total[key] = total.get(key, 0) + value
+
+    def _collect(self) -> Dict:
+        # Caller holds the registry lock
+        total = dict(self._retired)
+        live = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                live.append((thread, values))
+                self._merge(total, values.copy())
+            else:
+                self._merge(self._retired, values)
+                self._merge(total, values)
+        self._shards = live
+        return total
+
+    def _reset(self):
+        # Caller holds the registry lock
+        self._retired = {}
+        for _, values in self._shards:
+            values.clear()
+        self._shards = [(thread, values) for thread, values in self._shards if thread.is_alive()]
+
+
+class Counter(_Family):
+    """A value that only goes up"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        values = self._shard()
+        key = self._key(labels)
+        values[key] = values.get(key, 0) + amount
+
+
+class Gauge(_Family):
+    """A value that goes up and down, such as the number of requests in flight.
+
+    Threads record increments and decrements, which are summed on collection.
+    """
+
+    kind = 'gauge'
+
+    def inc(self, amount: float = 1, **labels):
+        values = self._shard()
+        key = self._key(labels)
+        values[key] = values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels) -> Iterator[None]:
+        """Count the enclosed block as in progress"""
+        self.inc(1, **labels)
+        try:
+            yield
+        finally:
+            self.inc(-1, **labels)
+
+
+class Histogram(_Family):
+    """Observations counted in cumulative buckets, with their sum and count"""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        values = self._shard()
+        key = self._key(labels)
+        cells = values.get(key)
+        if cells is None:
+            # One count per bucket plus +Inf, then the sum
+            cells = values[key] = [0] * (len(self.buckets) + 2)
+        cells[bisect.bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+    def _merge(self, total: Dict, values: Dict):
+        for key, cells in values.items():
+            cells = list(cells)
+            current = total.get(key)
+            total[key] = cells if current is None else [a + b for a, b in zip(current, cells)]
+
+
+class MetricsRegistry:
+    """In-process metric families rendered in the Prometheus text format.
+
+    Families are declared once at import time and updated from any thread
+    without locking. Callbacks registered with add_collector report values
+    that other components already keep (e.g. cache counters) and are read
+    only when metrics are collected.
+
+    With METRICS_DIR set, each process writes its samples to
+    <METRICS_DIR>/metrics-<pid>.json every METRICS_FLUSH_INTERVAL seconds and
+    a scrape merges every file: counters and histograms are summed across
+    processes, including exited ones, and gauges across running ones.
+    """
+
+    def __init__(self, directory: Optional[str] = METRICS_DIR, flush_interval: float = METRICS_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._families: Dict[str, _Family] = {}
+        self._collectors: List[Callable[[], List[Dict]]] = []
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._pid = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, family: _Family) -> _Family:
+        with self._lock:
+            if family.name in self._families:
+                raise ValueError(f"Metric {family.name} is already registered")
+            self._families[family.name] = family
+        return family
+
+    def add_collector(self, collector: Callable[[], List[Dict]]):
+        """Register a callback returning families as dicts with name, kind, help, labelnames and values.
+
+        values maps tuples of label values to numbers. A family marked
+        per_process is reported with a pid label instead of being summed
+        across processes, for values such as ratios that do not add up.
+        """
+        self._collectors.append(collector)
+
+    def start(self):
+        """Start publishing this process's samples to METRICS_DIR, once per process"""
+        if not self.directory or (self._flusher is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._flusher is not None and self._pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._pid = os.getpid()
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+            self._flusher.start()
+
+    def _after_fork(self):
+        # Samples recorded before the fork belong to the parent
+        self._lock = threading.Lock()
+        self._flusher = None
+        for family in self._families.values():
+            family._reset()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Collect this process's current values of every family"""
+        families = {}
+        with self._lock:
+            for family in self._families.values():
+                families[family.name] = {
+                    'kind': family.kind,
+                    'help': family.documentation,
+                    'labelnames': list(family.labelnames),
+                    'buckets': list(getattr(family, 'buckets', ())),
+                    'values': family._collect()
+                }
+        for collector in self._collectors:
+            try:
+                for family in collector():
+                    families[family['name']] = {
+                        'kind': family['kind'],
+                        'help': family['help'],
+                        'labelnames': list(family['labelnames']),
+                        'buckets': [],
+                        'values': family['values'],
+                        'per_process': family.get('per_process', False)
+                    }
+            except Exception as e:
+                logging.warning(f"Metrics collector failed: {e}")
+        return families
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f'metrics-{pid}.json')
+
+    def flush(self):
+        """Write this process's snapshot to METRICS_DIR"""
+        families = self.snapshot()
+        for family in families.values():
+            family['values'] = [[list(key), value] for key, value in family['values'].items()]
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.metrics-')
+        try:
+            with os.fdopen(fd, 'w') as output:
+                json.dump(families, output)
+            os.replace(temp_path, self._path(os.getpid()))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logging.warning(f"Could not write metrics snapshot: {e}")
+
+    def _merged(self) -> Dict[str, Dict]:
+        """Merge the snapshots of every process that wrote to METRICS_DIR"""
+        self.flush()
+        merged: Dict[str, Dict] = {}
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            try:
+                pid = int(filename[len('metrics-'):-len('.json')])
+                with open(os.path.join(self.directory, filename)) as source:
+                    families = json.load(source)
+            except (ValueError, OSError):
+                continue
+            running = _pid_running(pid)
+            for name, family in families.items():
+                if family['kind'] == 'gauge' and not running:
+                    continue
+                per_process = family.get('per_process')
+                labelnames = ['pid'] + family['labelnames'] if per_process else family['labelnames']
+                target = merged.setdefault(name, dict(family, labelnames=labelnames, values={}))
+                for key, value in family['values']:
+                    key = (str(pid), *key) if per_process else tuple(key)
+                    current = target['values'].get(key)
+                    if current is None:
+                        target['values'][key] = value
+                    elif isinstance(value, list):
+                        target['values'][key] = [a + b for a, b in zip(current, value)]
+                    else:
+                        target['values'][key] = current + value
+        return merged
+
+    def render(self) -> str:
+        """Render every family in the Prometheus text exposition format"""
+        families = self._merged() if self.directory else self.snapshot()
+        lines = []
+        for name in sorted(families):
+            family = families[name]
+            lines.append(f"# HELP {name} {_escape_help(family['help'])}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            labelnames = family['labelnames']
+            for key, value in sorted(family['values'].items()):
+                labels = list(zip(labelnames, key))
+                if family['kind'] != 'histogram':
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(family['buckets'] + ['+Inf'], value[:-1]):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _number(bound)
+                    lines.append(f"{name}_bucket{_labels(labels + [('le', le)])} {_number(cumulative)}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value[-1])}")
+                lines.append(f"{name}_count{_labels(labels)} {_number(cumulative)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _pid_running(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs: List[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# Global metrics registry instance
+metrics = MetricsRegistry()
+
+# Inbound requests, labelled by route pattern rather than path to keep the label set bounded
+HTTP_REQUESTS = metrics.counter(
+    'http_requests_total', 'HTTP requests served', ('route', 'method', 'status'))
+HTTP_DURATION = metrics.histogram(
+    'http_request_duration_seconds', 'Time to serve an HTTP request, including streamed bodies', ('route', 'method'))
+HTTP_RESPONSE_SIZE = metrics.histogram(
+    'http_response_size_bytes', 'Size of HTTP response bodies as sent', ('route',), SIZE_BUCKETS)
+HTTP_IN_FLIGHT = metrics.gauge(
+    'http_requests_in_flight', 'HTTP requests being served')
+
+# Outbound calls to AI providers and the Twitter API
+AI_REQUESTS = metrics.counter(
+    'ai_provider_requests_total', 'Requests sent to AI providers', ('provider', 'status'))
+AI_DURATION = metrics.histogram(
+    'ai_provider_request_duration_seconds',
+    'AI provider response time; time to the first byte for streamed responses', ('provider', 'status'))
+AI_RESPONSE_SIZE = metrics.histogram(
+    'ai_provider_response_size_bytes', 'Size of AI provider response bodies', ('provider',), SIZE_BUCKETS)
+AI_TOKENS = metrics.counter(
+    'ai_provider_tokens_total', 'Tokens reported by AI providers', ('provider', 'kind'))
+AI_IN_FLIGHT = metrics.gauge(
+    'ai_provider_requests_in_flight', 'Requests waiting on an AI provider', ('provider',))
+TWITTER_REQUESTS = metrics.counter(
+    'twitter_api_requests_total', 'Requests sent to the Twitter API', ('endpoint', 'status'))
+TWITTER_DURATION = metrics.histogram(
+    'twitter_api_request_duration_seconds', 'Twitter API response time', ('endpoint', 'status'))
+TWITTER_RESPONSE_SIZE = metrics.histogram(
+    'twitter_api_response_size_bytes', 'Size of Twitter API response bodies', ('endpoint',), SIZE_BUCKETS)
+TWITTER_IN_FLIGHT = metrics.gauge(
+    'twitter_api_requests_in_flight', 'Requests waiting on the Twitter API', ('endpoint',))
+
+
+def outcome(error: BaseException) -> str:
+    """Status label of an outbound call that raised instead of answering"""
+    return 'timeout' if 'Timeout' in type(error).__name__ else 'error'
+
+
+def response_size(response) -> Optional[int]:
+    """Body size of a requests response, without reading a streamed body"""
+    if response.raw is None or response._content_consumed:
+        return len(response.content or b'')
+    length = response.headers.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
+class RequestMetrics:
+    """Flask hooks recording the latency, status and size of every request.
+
+    Register before any hook that rewrites the body (e.g. compression) so
+    sizes are measured as sent. Durations end when the response is closed,
+    which covers the whole body of streamed responses.
+    """
+
+    def init_app(self, app):
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+
+    def _before(self):
+        from flask import g
+        metrics.start()
+        HTTP_IN_FLIGHT.inc()
+        g._metrics_started = time.perf_counter()
+
+    def _after(self, response):
+        from flask import g, request
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return response
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        method = request.method
+        HTTP_REQUESTS.inc(route=route, method=method, status=response.status_code)
+        if not response.is_streamed:
+            HTTP_RESPONSE_SIZE.observe(response.calculate_content_length() or 0, route=route)
+
+        def finish():
+            HTTP_DURATION.observe(time.perf_counter() - started, route=route, method=method)
+            HTTP_IN_FLIGHT.dec()
+        response.call_on_close(finish)
+        return response
+
+    def _teardown(self, error):
+        from flask import g
+        # The request failed before a response existed, so nothing will close it
+        if g.pop('_metrics_started', None) is not None:
+            HTTP_IN_FLIGHT.dec()
+
+
+# Global request metrics instance
+request_metrics = RequestMetrics()
@@ -0,0 +1,229 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import func, or_, update
+from models import db, PublishedPost, ScheduledPost, SocialAccount
+from analytics import analytics_store
+from encryption import encryption_service
+from rate_limits import RateLimitExceeded
+
+# Seconds between ingestion runs in each worker
+POLL_INTERVAL = float(os.environ.get('METRICS_POLL_INTERVAL', '60'))
+# A post is refreshed again after REFRESH_FACTOR times its age, within these bounds (seconds)
+REFRESH_FACTOR = float(os.environ.get('METRICS_REFRESH_FACTOR', '0.1'))
+MIN_REFRESH_INTERVAL = float(os.environ.get('METRICS_MIN_REFRESH_INTERVAL', '300'))
+MAX_REFRESH_INTERVAL = float(os.environ.get('METRICS_MAX_REFRESH_INTERVAL', '86400'))
+# Posts older than this are no longer refreshed
+MAX_AGE_DAYS = float(os.environ.get('METRICS_MAX_AGE_DAYS', '30'))
+# Lookup requests made per account in one run
+MAX_REQUESTS_PER_RUN = int(os.environ.get('METRICS_MAX_REQUESTS_PER_RUN', '5'))
+# Claims older than this are considered abandoned by a dead worker
+CLAIM_TIMEOUT = int(os.environ.get('METRICS_CLAIM_TIMEOUT', '300'))
+# Platforms with a metrics integration
+SUPPORTED_PLATFORMS = ('twitter',)
+
+
+def next_refresh_ts(published_ts: float, now: float) -> Optional[int]:
+    """Get when a post's metrics are next due, or None once it is too old to track"""
+    age = now - published_ts
+    if age > MAX_AGE_DAYS * 86400:
+        return None
+    return int(now + min(MAX_REFRESH_INTERVAL, max(MIN_REFRESH_INTERVAL, age * REFRESH_FACTOR)))
+
+
+class MetricsIngestor:
+    """Collects engagement metrics of published tweets into the posts and the analytics store.
+
+    Fresh posts are refreshed every few minutes and older ones less and less
+    often (see next_refresh_ts). Each run looks up the due tweets of every
+    account through the tweets endpoint, 100 ids per request, and fills the
+    last request of each account with the tweets due soonest so no request
+    goes out half empty. Posts are claimed with a conditional UPDATE, so
+    several workers never fetch the same post at once.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._thread = None
+        self._pid = None
+        self._condition = threading.Condition()
+        self._stopping = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+
+    @property
+    def enabled(self) -> bool:
+        return os.environ.get('METRICS_INGESTION_ENABLED', '1') != '0'
+
+    def start(self):
+        """Start the ingestion thread in this process if it is not running"""
+        if not self.enabled or self.app is None:
+            return
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._condition:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='metrics-ingestor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the ingestion thread"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+
+    def track(self, post: PublishedPost):
+        """Schedule the first metrics refresh of a newly published post"""
+        if post.platform in SUPPORTED_PLATFORMS and post.external_id:
+            post.metrics_next_refresh_ts = int(time.time() + MIN_REFRESH_INTERVAL)
+
+    def run_once(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Refresh every due post once; returns request and post counts"""
+        now = now if now is not None else time.time()
+        stats = {'requests': 0, 'posts': 0, 'missing': 0, 'rate_limited': 0}
+        due = db.session.query(PublishedPost.account_id, func.count()).filter(
+            PublishedPost.platform.in_(SUPPORTED_PLATFORMS),
+            PublishedPost.metrics_next_refresh_ts <= now,
+            PublishedPost.external_id.isnot(None),
+            PublishedPost.account_id.isnot(None)
+        ).group_by(PublishedPost.account_id).all()
+        for account_id, count in due:
+            try:
+                self._ingest_account(account_id, count, now, stats)
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Error ingesting metrics for account {account_id}: {e}")
+        return stats
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return
+            try:
+                with self.app.app_context():
+                    stats = self.run_once()
+                    if stats['requests']:
+                        logging.info(f"Metrics ingestion: {stats}")
+            except Exception as e:
+                logging.error(f"Error ingesting metrics: {e}")
+            with self._condition:
+                self._condition.wait(POLL_INTERVAL)
+
+    def _ingest_account(self, account_id: int, due: int, now: float, stats: Dict[str, int]):
+        from twitter_api import create_twitter_client, TWEETS_LOOKUP_MAX_IDS
+
+        account = db.session.get(SocialAccount, account_id)
+        client = None
+        if account and account.encrypted_credentials:
+            client = create_twitter_client(encryption_service.decrypt_credentials(account.encrypted_credentials))
+        if client is None:
+            # Nothing can be fetched until the account is reconnected
+            self._postpone(account_id, now, now + MAX_REFRESH_INTERVAL)
+            return
+
+        # Round up to whole requests: the last one is filled with posts due soonest
+        batches = min(MAX_REQUESTS_PER_RUN, -(-due // TWEETS_LOOKUP_MAX_IDS))
+        posts = self._claim(account_id, batches * TWEETS_LOOKUP_MAX_IDS, now)
+        for start in range(0, len(posts), TWEETS_LOOKUP_MAX_IDS):
+            batch = posts[start:start + TWEETS_LOOKUP_MAX_IDS]
+            try:
+                result = client.get_tweet_metrics([post.external_id for post in batch])
+            except RateLimitExceeded as e:
+                stats['rate_limited'] += 1
+                self._release(posts[start:], now + e.retry_after)
+                return
+            stats['requests'] += 1
+            if result is None:
+                self._release(batch, now + MIN_REFRESH_INTERVAL)
+                continue
+            stats['posts'] += len(result['metrics'])
+            stats['missing'] += len(result['missing'])
+            self._apply(batch, result, now)
+
+    def _claim(self, account_id: int, limit: int, now: float) -> List[PublishedPost]:
+        """Claim the account's posts due soonest for this run"""
+        claimable = (
+            PublishedPost.platform.in_(SUPPORTED_PLATFORMS),
+            PublishedPost.account_id == account_id,
+            PublishedPost.external_id.isnot(None),
+            PublishedPost.metrics_next_refresh_ts.isnot(None),
+            or_(PublishedPost.metrics_claim.is_(None), PublishedPost.metrics_next_refresh_ts <= now)
+        )
+        ids = [post_id for (post_id,) in db.session.query(PublishedPost.id).filter(*claimable).order_by(
+            PublishedPost.metrics_next_refresh_ts
+        ).limit(limit)]
+        if not ids:
+            return []
+
+        claim = uuid.uuid4().hex
+        db.session.execute(update(PublishedPost).where(PublishedPost.id.in_(ids), *claimable).values(
+            metrics_claim=claim,
+            metrics_next_refresh_ts=int(now + CLAIM_TIMEOUT)
+        ).execution_options(synchronize_session=False))
+        db.session.commit()
+        return PublishedPost.query.filter_by(metrics_claim=claim).order_by(PublishedPost.published_date).all()
+
+    def _release(self, posts: List[PublishedPost], retry_ts: float):
+        """Give claimed posts back, to be retried later"""
+        for post in posts:
+            post.metrics_claim = None
+            post.metrics_next_refresh_ts = int(retry_ts)
+        db.session.commit()
+
+    def _postpone(self, account_id: int, now: float, retry_ts: float):
+        """Push back every due post of an account"""
+        db.session.execute(update(PublishedPost).where(
+            PublishedPost.account_id == account_id,
+            PublishedPost.metrics_next_refresh_ts <= now
+        ).values(metrics_next_refresh_ts=int(retry_ts)).execution_options(synchronize_session=False))
+        db.session.commit()
+
+    def _apply(self, posts: List[PublishedPost], result: Dict, now: float):
+        """Store fetched metrics and record what changed since the last refresh as analytics samples"""
+        missing = set(result['missing'])
+        samples = []
+        for post in posts:
+            post.metrics_claim = None
+            metrics = result['metrics'].get(post.external_id)
+            if metrics is None:
+                # Deleted or private tweets are no longer tracked; anything else is retried
+                post.metrics_next_refresh_ts = None if post.external_id in missing else int(now + MIN_REFRESH_INTERVAL)
+                continue
+
+            current = {
+                'likes': metrics.get('like_count', 0),
+                'shares': metrics.get('retweet_count', 0) + metrics.get('quote_count', 0),
+                'comments': metrics.get('reply_count', 0),
+                'impressions': metrics.get('impression_count', 0)
+            }
+            for metric, value in current.items():
+                delta = value - (getattr(post, metric) or 0)
+                if delta:
+                    samples.append((post.account_id, post.platform, metric, delta, int(now)))
+                setattr(post, metric, value)
+            post.metrics_refreshed_at = datetime.now()
+            post.metrics_next_refresh_ts = next_refresh_ts(post.published_date.timestamp(), now)
+
+            if post.scheduled_post_id:
+                scheduled = db.session.get(ScheduledPost, post.scheduled_post_id)
+                if scheduled:
+                    scheduled.engagement = current['likes'] + current['shares'] + current['comments']
+                    scheduled.reach = current['impressions']
+
+        analytics_store.record_many(samples)
+        db.session.commit()
+
+
+# Global metrics ingestor instance
+metrics_ingestor = MetricsIngestor()
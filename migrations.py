@@ -0,0 +1,240 @@
+import logging
+import time
+from contextlib import contextmanager
+from sqlalchemy import DateTime, column, inspect, select, table, text
+from models import db, SchemaMigration
+
+# Arbitrary key for the PostgreSQL advisory lock held while migrating
+MIGRATION_LOCK_ID = 727001
+
+
+def _create_table(model):
+    """Create a model's table if it does not exist yet"""
+    model.__table__.create(db.engine, checkfirst=True)
+
+
+def _add_column(table, column, ddl):
+    """Add a column unless it already exists (tables created later already have it)"""
+    columns = {c['name'] for c in inspect(db.engine).get_columns(table)}
+    if column in columns:
+        return
+    with db.engine.begin() as connection:
+        connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+
+def _initial_schema():
+    """Create the base tables"""
+    db.create_all()
+
+
+def _add_scheduled_timestamp():
+    """Index scheduled posts by UTC epoch and backfill existing rows"""
+    from schedule_index import to_utc_timestamp
+
+    with db.engine.begin() as connection:
+        connection.execute(text('ALTER TABLE scheduled_posts ADD COLUMN scheduled_ts BIGINT'))
+        connection.execute(text(
+            'CREATE INDEX ix_scheduled_posts_scheduled_ts ON scheduled_posts (scheduled_ts)'
+        ))
+
+        rows = connection.execute(text('SELECT id, scheduled_date, timezone FROM scheduled_posts')).all()
+        updates = []
+        for post_id, scheduled_date, timezone_name in rows:
+            try:
+                updates.append({'id': post_id, 'ts': to_utc_timestamp(scheduled_date, timezone_name)})
+            except (TypeError, ValueError):
+                logging.warning(f"Post {post_id} has an invalid scheduled_date: {scheduled_date!r}")
+        if updates:
+            connection.execute(
+                text('UPDATE scheduled_posts SET scheduled_ts = :ts WHERE id = :id'),
+                updates
+            )
+
+
+def _add_publishing_state():
+    """Track scheduler claims, retries and publication time on scheduled posts"""
+    statements = [
+        'ALTER TABLE scheduled_posts ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE scheduled_posts ADD COLUMN next_attempt_ts BIGINT',
+        'ALTER TABLE scheduled_posts ADD COLUMN locked_by VARCHAR(128)',
+        'ALTER TABLE scheduled_posts ADD COLUMN locked_at BIGINT',
+        'ALTER TABLE scheduled_posts ADD COLUMN published_at TIMESTAMP',
+        'ALTER TABLE scheduled_posts ADD COLUMN last_error TEXT',
+        'CREATE INDEX ix_scheduled_posts_status_scheduled_ts ON scheduled_posts (status, scheduled_ts)',
+        'CREATE INDEX ix_scheduled_posts_status_next_attempt_ts ON scheduled_posts (status, next_attempt_ts)',
+    ]
+    with db.engine.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+
+
+def _add_jobs_and_published_posts():
+    """Store background jobs and published posts server-side"""
+    from models import Job, PublishedPost
+    _create_table(Job)
+    _create_table(PublishedPost)
+
+
+def _add_drafts():
+    """Store drafts server-side with a full-text index"""
+    from models import Draft
+    from drafts import create_search_index
+    _create_table(Draft)
+    create_search_index()
+
+
+def _add_publication_ledger():
+    """Keep monitoring counters and recent-post rings, backfilled from published_posts"""
+    from models import PublishCounter, RecentPublication
+    from ledger import publication_ledger
+    _create_table(PublishCounter)
+    _create_table(RecentPublication)
+
+    # Only the columns published_posts had at this version: the model has gained more since
+    posts = table(
+        'published_posts', column('id'), column('user_id'), column('platform'), column('published_date', DateTime)
+    )
+    rows = db.session.execute(
+        select(posts.c.id, posts.c.user_id, posts.c.platform, posts.c.published_date)
+        .order_by(posts.c.published_date)
+    ).all()
+    for post_id, user_id, platform, published_date in rows:
+        publication_ledger.count(post_id, user_id, platform, published_date)
+    db.session.commit()
+
+
+def _add_analytics():
+    """Store analytics samples and their rollups"""
+    from models import MetricBlock, MetricRollup
+    _create_table(MetricBlock)
+    _create_table(MetricRollup)
+
+
+def _add_rate_limit_buckets():
+    """Share API rate-limit state between workers"""
+    from models import RateLimitBucket
+    _create_table(RateLimitBucket)
+
+
+def _add_post_metrics():
+    """Track engagement metrics of published posts and when to refresh them"""
+    columns = [
+        ('scheduled_post_id', 'INTEGER'),
+        ('comments', 'INTEGER NOT NULL DEFAULT 0'),
+        ('impressions', 'INTEGER NOT NULL DEFAULT 0'),
+        ('metrics_next_refresh_ts', 'BIGINT'),
+        ('metrics_refreshed_at', 'TIMESTAMP'),
+        ('metrics_claim', 'VARCHAR(64)'),
+    ]
+    for column, ddl in columns:
+        _add_column('published_posts', column, ddl)
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_published_posts_platform_metrics_next_refresh_ts '
+            'ON published_posts (platform, metrics_next_refresh_ts)'
+        ))
+        # Tweets published so far get their metrics on the next ingestion run
+        connection.execute(text(
+            "UPDATE published_posts SET metrics_next_refresh_ts = :now "
+            "WHERE platform = 'twitter' AND external_id IS NOT NULL AND metrics_next_refresh_ts IS NULL"
+        ), {'now': int(time.time())})
+
+
+def _add_account_profile():
+    """Record the platform user id and follower count of verified accounts"""
+    _add_column('social_accounts', 'external_user_id', 'VARCHAR(64)')
+    _add_column('social_accounts', 'follower_count', 'INTEGER')
+
+
+def _add_media():
+    """Store uploaded media, their platform uploads and post attachments"""
+    from models import MediaAsset, MediaUpload
+
+    _create_table(MediaAsset)
+    _create_table(MediaUpload)
+    _add_column('scheduled_posts', 'media_ids', 'JSON')
+
+
+def _add_collection_versions():
+    """Track a change counter per listed table (rows are seeded at boot)"""
+    from models import CollectionVersion
+    _create_table(CollectionVersion)
+
+
+def _add_job_claims():
+    """Track which worker runs each job, so jobs abandoned by a dead worker can be recovered"""
+    _add_column('jobs', 'attempts', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column('jobs', 'locked_by', 'VARCHAR(128)')
+    _add_column('jobs', 'locked_at', 'BIGINT')
+
+
+# Ordered schema migrations. Append new (version, description, function)
+# entries here; never edit or reorder entries that have been released.
+MIGRATIONS = [
+    (1, 'Initial schema', _initial_schema),
+    (2, 'Add scheduled_posts.scheduled_ts', _add_scheduled_timestamp),
+    (3, 'Add scheduled post publishing state', _add_publishing_state),
+    (4, 'Add jobs and published_posts', _add_jobs_and_published_posts),
+    (5, 'Add drafts', _add_drafts),
+    (6, 'Add publication ledger', _add_publication_ledger),
+    (7, 'Add analytics samples and rollups', _add_analytics),
+    (8, 'Add rate limit buckets', _add_rate_limit_buckets),
+    (9, 'Add published post metrics', _add_post_metrics),
+    (10, 'Add account profile fields', _add_account_profile),
+    (11, 'Add media assets and uploads', _add_media),
+    (12, 'Add collection versions', _add_collection_versions),
+    (13, 'Add job claims', _add_job_claims),
+]
+
+
+def _create_extra_objects():
+    """Create database objects the models cannot describe (full-text indexes)"""
+    from drafts import create_search_index
+    create_search_index()
+
+
+@contextmanager
+def _migration_lock():
+    """Serialize migrations between workers booting at the same time"""
+    if db.engine.dialect.name != 'postgresql':
+        yield
+        return
+    with db.engine.connect() as connection:
+        connection.execute(text('SELECT pg_advisory_lock(:id)'), {'id': MIGRATION_LOCK_ID})
+        try:
+            yield
+        finally:
+            connection.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': MIGRATION_LOCK_ID})
+            connection.commit()
+
+
+def current_version():
+    """Get the latest applied migration version (0 for an empty database)"""
+    if not inspect(db.engine).has_table(SchemaMigration.__tablename__):
+        return 0
+    latest = db.session.query(db.func.max(SchemaMigration.version)).scalar()
+    return latest or 0
+
+
+def upgrade():
+    """Bring the database schema up to date"""
+    with _migration_lock():
+        version = current_version()
+
+        if version == 0:
+            # Fresh database: the models already describe the latest schema
+            db.create_all()
+            _create_extra_objects()
+            for number, description, _ in MIGRATIONS:
+                db.session.add(SchemaMigration(version=number, description=description))
+            db.session.commit()
+            logging.info(f"Database schema created at version {MIGRATIONS[-1][0]}")
+            return
+
+        for number, description, migrate in MIGRATIONS:
+            if number <= version:
+                continue
+            logging.info(f"Applying migration {number}: {description}")
+            migrate()
+            db.session.add(SchemaMigration(version=number, description=description))
+            db.session.commit()
@@ -0,0 +1,384 @@
+from datetime import datetime
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import DeclarativeBase
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+db = SQLAlchemy(model_class=Base)
+
+
+class ScheduledPost(db.Model):
+    """Post scheduled for publication on a social platform"""
+    __tablename__ = 'scheduled_posts'
+    __table_args__ = (
+        # Due-post lookups made by the publish scheduler
+        db.Index('ix_scheduled_posts_status_scheduled_ts', 'status', 'scheduled_ts'),
+        db.Index('ix_scheduled_posts_status_next_attempt_ts', 'status', 'next_attempt_ts'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(255), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    platform = db.Column(db.String(32), nullable=False, index=True)
+    scheduled_date = db.Column(db.String(64), nullable=False, index=True)
+    # scheduled_date normalized to UTC epoch seconds, used for range queries
+    scheduled_ts = db.Column(db.BigInteger, index=True)
+    status = db.Column(db.String(32), nullable=False, default='scheduled', index=True)
+    engagement = db.Column(db.Integer, nullable=False, default=0)
+    reach = db.Column(db.Integer, nullable=False, default=0)
+    timezone = db.Column(db.String(64), nullable=False, default='UTC')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    updated_at = db.Column(db.DateTime)
+    # Publishing state maintained by the scheduler
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_ts = db.Column(db.BigInteger)
+    locked_by = db.Column(db.String(128))
+    locked_at = db.Column(db.BigInteger)
+    published_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    # Ids of the MediaAsset rows attached to the post, in order
+    media_ids = db.Column(db.JSON)
+
+    def to_dict(self):
+        post = {
+            "id": self.id,
+            "title": self.title,
+            "content": self.content,
+            "platform": self.platform,
+            "scheduled_date": self.scheduled_date,
+            "status": self.status,
+            "engagement": self.engagement,
+            "reach": self.reach,
+            "created_at": self.created_at,
+            "timezone": self.timezone
+        }
+        if self.updated_at:
+            post["updated_at"] = self.updated_at
+        if self.published_at:
+            post["published_at"] = self.published_at
+        if self.last_error:
+            post["last_error"] = self.last_error
+        if self.media_ids:
+            post["media_ids"] = self.media_ids
+        return post
+
+
+class SocialAccount(db.Model):
+    """Connected social media account"""
+    __tablename__ = 'social_accounts'
+
+    id = db.Column(db.Integer, primary_key=True)
+    platform = db.Column(db.String(32), nullable=False, index=True)
+    account_name = db.Column(db.String(255), nullable=False)
+    display_name = db.Column(db.String(255))
+    status = db.Column(db.String(32), nullable=False, default='pending', index=True)
+    auto_posting = db.Column(db.Boolean, nullable=False, default=False)
+    is_default = db.Column(db.Boolean, nullable=False, default=False)
+    connected_date = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    has_api = db.Column(db.Boolean, nullable=False, default=False)
+    encrypted_credentials = db.Column(db.JSON)
+    last_tested = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    # Platform user id and follower count, recorded when the account is verified
+    external_user_id = db.Column(db.String(64))
+    follower_count = db.Column(db.Integer)
+
+    def to_dict(self):
+        account = {
+            "id": self.id,
+            "platform": self.platform,
+            "account_name": self.account_name,
+            "display_name": self.display_name,
+            "status": self.status,
+            "auto_posting": self.auto_posting,
+            "is_default": self.is_default,
+            "connected_date": self.connected_date,
+            "has_api": self.has_api,
+            "encrypted_credentials": self.encrypted_credentials
+        }
+        if self.last_tested:
+            account["last_tested"] = self.last_tested
+        if self.updated_at:
+            account["updated_at"] = self.updated_at
+        if self.follower_count is not None:
+            account["follower_count"] = self.follower_count
+        return account
+
+
+class AIProvider(db.Model):
+    """AI content provider and its encrypted API key"""
+    __tablename__ = 'ai_providers'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(32), nullable=False, unique=True, index=True)
+    display_name = db.Column(db.String(255), nullable=False)
+    encrypted_api_key = db.Column(db.Text)
+    status = db.Column(db.String(32), nullable=False, default='disconnected')
+    is_default = db.Column(db.Boolean, nullable=False, default=False)
+    model = db.Column(db.String(255))
+    last_tested = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "display_name": self.display_name,
+            "encrypted_api_key": self.encrypted_api_key,
+            "status": self.status,
+            "is_default": self.is_default,
+            "model": self.model,
+            "last_tested": self.last_tested
+        }
+
+
+class PromptSetting(db.Model):
+    """Prompt configuration entry (system, platform or tone prompts)"""
+    __tablename__ = 'prompt_settings'
+
+    key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.JSON, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+
+class SchemaMigration(db.Model):
+    """Applied schema migration versions"""
+    __tablename__ = 'schema_migrations'
+
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+
+class Job(db.Model):
+    """Background job and its progress, readable from any worker"""
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.String(36), primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)
+    user_id = db.Column(db.String(64), index=True)
+    status = db.Column(db.String(32), nullable=False, default='queued', index=True)
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    message = db.Column(db.String(255))
+    payload = db.Column(db.JSON)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    # Claim of the worker running the job, renewed as it reports progress
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    locked_by = db.Column(db.String(128))
+    locked_at = db.Column(db.BigInteger)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class PublishedPost(db.Model):
+    """Post published on a social platform"""
+    __tablename__ = 'published_posts'
+    __table_args__ = (
+        # Posts whose engagement metrics are due for a refresh
+        db.Index('ix_published_posts_platform_metrics_next_refresh_ts', 'platform', 'metrics_next_refresh_ts'),
+    )
+
+    id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.String(64), index=True)
+    platform = db.Column(db.String(32), nullable=False, index=True)
+    content = db.Column(db.Text, nullable=False)
+    hashtags = db.Column(db.JSON)
+    published_date = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+    status = db.Column(db.String(32), nullable=False, default='published')
+    likes = db.Column(db.Integer, nullable=False, default=0)
+    shares = db.Column(db.Integer, nullable=False, default=0)
+    account_id = db.Column(db.Integer)
+    external_id = db.Column(db.String(64))
+    job_id = db.Column(db.String(36))
+    scheduled_post_id = db.Column(db.Integer)
+    # Engagement maintained by the metrics ingestor (shares are reposts and quotes)
+    comments = db.Column(db.Integer, nullable=False, default=0)
+    impressions = db.Column(db.Integer, nullable=False, default=0)
+    # UTC epoch of the next metrics refresh; NULL once the post is no longer tracked
+    metrics_next_refresh_ts = db.Column(db.BigInteger)
+    metrics_refreshed_at = db.Column(db.DateTime)
+    # Ingestion run currently fetching the post's metrics
+    metrics_claim = db.Column(db.String(64))
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "platform": self.platform,
+            "content": self.content,
+            "hashtags": self.hashtags,
+            "published_date": self.published_date,
+            "status": self.status,
+            "likes": self.likes,
+            "shares": self.shares,
+            "comments": self.comments,
+            "impressions": self.impressions,
+            "metrics_refreshed_at": self.metrics_refreshed_at
+        }
+
+
+class PublishCounter(db.Model):
+    """Published post count per owner, platform and period ('all' or an ISO date)"""
+    __tablename__ = 'publish_counters'
+
+    user_id = db.Column(db.String(64), primary_key=True)
+    platform = db.Column(db.String(32), primary_key=True)
+    period = db.Column(db.String(10), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class RecentPublication(db.Model):
+    """Slot of an owner's fixed-size ring of most recent publications"""
+    __tablename__ = 'recent_publications'
+
+    user_id = db.Column(db.String(64), primary_key=True)
+    slot = db.Column(db.Integer, primary_key=True)
+    # Position in the owner's publication sequence; the highest is the newest
+    seq = db.Column(db.Integer, nullable=False)
+    post_id = db.Column(db.String(36), nullable=False)
+
+
+class MetricBlock(db.Model):
+    """One day of raw samples for an account metric, stored as packed columns"""
+    __tablename__ = 'analytics_blocks'
+
+    account_id = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(32), primary_key=True)
+    block_ts = db.Column(db.BigInteger, primary_key=True)
+    platform = db.Column(db.String(32), nullable=False)
+    # array('q') of UTC epoch seconds and array('d') of values, in arrival order
+    timestamps = db.Column(db.LargeBinary, nullable=False)
+    samples = db.Column(db.LargeBinary, nullable=False)
+
+
+class MetricRollup(db.Model):
+    """Aggregate of an account metric over one minute/hour/day/week bucket"""
+    __tablename__ = 'analytics_rollups'
+    # Keyed for range scans over every account of a metric; SQLite stores the
+    # rows in key order so those scans read contiguous pages
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    metric = db.Column(db.String(32), primary_key=True)
+    resolution = db.Column(db.String(8), primary_key=True)
+    bucket_ts = db.Column(db.BigInteger, primary_key=True)
+    account_id = db.Column(db.Integer, primary_key=True)
+    platform = db.Column(db.String(32), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0)
+    minimum = db.Column(db.Float)
+    maximum = db.Column(db.Float)
+    # Latest sample in the bucket, used for gauges such as followers
+    last_value = db.Column(db.Float)
+    last_ts = db.Column(db.BigInteger)
+
+
+class RateLimitBucket(db.Model):
+    """Token bucket for one rate-limited API endpoint, shared by every worker"""
+    __tablename__ = 'rate_limit_buckets'
+
+    # Endpoint and a hash of the credentials it is called with
+    key = db.Column(db.String(128), primary_key=True)
+    # Requests allowed per window, as last reported by the API
+    limit = db.Column(db.Integer, nullable=False)
+    # Negative while callers are waiting on reserved tokens
+    tokens = db.Column(db.Float, nullable=False)
+    updated_ts = db.Column(db.Float, nullable=False)
+    # UTC epoch at which the API resets the current window
+    reset_ts = db.Column(db.Float)
+    # No request is sent before this UTC epoch (after a 429 or an exhausted window)
+    blocked_until = db.Column(db.Float)
+
+
+class Draft(db.Model):
+    """Generated content saved by a user for later use"""
+    __tablename__ = 'drafts'
+    __table_args__ = (
+        # Newest-first listing of one user's drafts
+        db.Index('ix_drafts_user_id_id', 'user_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(64), nullable=False)
+    platform = db.Column(db.String(32))
+    title = db.Column(db.String(255), nullable=False, default='')
+    content = db.Column(db.Text, nullable=False, default='')
+    hashtags = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    updated_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "platform": self.platform,
+            "content": self.content,
+            "hashtags": self.hashtags,
+            "created_at": self.created_at,
+            "type": "draft",
+            "title": self.title
+        }
+
+
+class MediaAsset(db.Model):
+    """Uploaded image or video, stored on disk under its SHA-256"""
+    __tablename__ = 'media_assets'
+
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False, unique=True)
+    content_type = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    filename = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "sha256": self.sha256,
+            "content_type": self.content_type,
+            "size": self.size,
+            "filename": self.filename,
+            "created_at": self.created_at
+        }
+
+
+class MediaUpload(db.Model):
+    """Upload of a media asset to a platform account, kept so it can resume and be reused"""
+    __tablename__ = 'media_uploads'
+    __table_args__ = (
+        db.UniqueConstraint('asset_id', 'platform', 'account_id', name='uq_media_uploads_asset_platform_account'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    asset_id = db.Column(db.Integer, nullable=False)
+    platform = db.Column(db.String(32), nullable=False)
+    account_id = db.Column(db.Integer, nullable=False)
+    # Protocol progress (platform media id, next segment, ...) saved after every step
+    state = db.Column(db.JSON)
+    # Platform media id once the upload completed, usable until expires_ts (UTC epoch)
+    media_id = db.Column(db.String(64))
+    expires_ts = db.Column(db.BigInteger)
+    updated_at = db.Column(db.DateTime)
+
+
+class CollectionVersion(db.Model):
+    """Change counter of a table, bumped by every write; list ETags are derived from it"""
+    __tablename__ = 'collection_versions'
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
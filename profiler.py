@@ -0,0 +1,272 @@
+import os
+import sys
+import time
+import uuid
+import random
+import hmac
+import logging
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+# Share of requests profiled automatically; 0 profiles only requests that ask for it
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+# Request header asking for a profile: "1" from a logged-in user, or PROFILING_TOKEN when set
+PROFILE_HEADER = 'X-Profile'
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+# Seconds between two stack samples of a profiled request
+PROFILING_INTERVAL = float(os.environ.get('PROFILING_INTERVAL', '0.005'))
+# Finished profiles kept for download; older ones are dropped
+PROFILING_MAX_PROFILES = int(os.environ.get('PROFILING_MAX_PROFILES', '50'))
+# Distinct stacks kept per profile; further ones are counted under a single frame
+MAX_STACKS = 5000
+MAX_DEPTH = 128
+
+
+class Profile:
+    """Stack samples of one request, in the threads that worked on it"""
+
+    def __init__(self, method: str, path: str, route: str, reason: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.route = route
+        self.reason = reason
+        self.status = None
+        self.started_at = datetime.now()
+        self.duration = None
+        self.cpu_time = None
+        # Wall-clock sample counts and CPU microseconds, by stack
+        self.wall: Counter = Counter()
+        self.cpu: Counter = Counter()
+        self.samples = 0
+
+    def add(self, stack: str, cpu_us: int):
+        if stack not in self.wall and len(self.wall) >= MAX_STACKS:
+            stack = f"{self.method} {self.route};[truncated]"
+        self.wall[stack] += 1
+        if cpu_us > 0:
+            self.cpu[stack] += cpu_us
+        self.samples += 1
+
+    def collapsed(self, weight: str = 'wall') -> str:
+        """Stacks in the collapsed format read by flamegraph.pl, speedscope and similar tools"""
+        # Copied first: pool threads handed work by the request may still be adding samples
+        counts = Counter(dict(self.cpu if weight == 'cpu' else self.wall))
+        return ''.join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'method': self.method,
+            'path': self.path,
+            'route': self.route,
+            'reason': self.reason,
+            'status': self.status,
+            'started_at': self.started_at,
+            'duration_ms': round(self.duration * 1000, 1) if self.duration is not None else None,
+            'cpu_ms': round(self.cpu_time * 1000, 1) if self.cpu_time is not None else None,
+            'samples': self.samples
+        }
+
+
+class RequestProfiler:
+    """Opt-in sampling profiler for live requests.
+
+    A request is profiled when it is picked at PROFILING_SAMPLE_RATE or asks
+    for it with the X-Profile header. While any profiled request is running,
+    a background thread reads the stacks of its threads with
+    sys._current_frames() every PROFILING_INTERVAL seconds, including pool
+    threads running work it handed off through follow(). Each sample counts
+    for wall-clock time and, where the platform exposes per-thread CPU
+    clocks, is weighted by the CPU time the thread used since the previous
+    sample. Nothing runs while no request is profiled, so the cost of an
+    unprofiled request is one header lookup.
+
+    Finished profiles are kept in a ring of PROFILING_MAX_PROFILES.
+    """
+
+    def __init__(self, sample_rate: float = PROFILING_SAMPLE_RATE, interval: float = PROFILING_INTERVAL,
+                 max_profiles: int = PROFILING_MAX_PROFILES):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self._profiles: deque = deque(maxlen=max_profiles)
+        # Profile being recorded for each sampled thread, by thread ident
+        self._active: Dict[int, Profile] = {}
+        self._cpu_clocks: Dict[int, tuple] = {}
+        self._labels: Dict = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+    def init_app(self, app):
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+
+    def _requested(self) -> Optional[str]:
+        """Why the current request should be profiled, or None"""
+        from flask import request
+        from flask_login import current_user
+        value = request.headers.get(PROFILE_HEADER)
+        if value:
+            if PROFILING_TOKEN and hmac.compare_digest(value.encode(), PROFILING_TOKEN.encode()):
+                return 'header'
+            if value == '1' and current_user.is_authenticated:
+                return 'header'
+            return None
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    def _before(self):
+        from flask import g, request
+        if not self.sample_rate and PROFILE_HEADER not in request.headers:
+            return
+        if request.path.startswith('/api/profiles'):
+            return
+        reason = self._requested()
+        if reason:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            profile = Profile(request.method, request.path, route, reason)
+            g._profile = (profile, time.perf_counter(), time.thread_time())
+            self._attach(profile)
+
+    def _after(self, response):
+        from flask import g
+        state = g.pop('_profile', None)
+        if state is None:
+            return response
+        profile, started, cpu_started = state
+        profile.status = response.status_code
+        response.headers['X-Profile-Id'] = profile.id
+
+        def finish():
+            self._finish(profile, started, cpu_started)
+        response.call_on_close(finish)
+        return response
+
+    def _teardown(self, error):
+        from flask import g
+        # The request failed before a response existed, so nothing will close it
+        state = g.pop('_profile', None)
+        if state is not None:
+            self._finish(*state)
+
+    def _finish(self, profile: Profile, started: float, cpu_started: float):
+        profile.duration = time.perf_counter() - started
+        profile.cpu_time = time.thread_time() - cpu_started
+        self._detach()
+        with self._lock:
+            self._profiles.append(profile)
+
+    def follow(self, function: Callable) -> Callable:
+        """Wrap work handed to another thread so it is sampled into the current request's profile"""
+        profile = self._active.get(threading.get_ident())
+        if profile is None:
+            return function
+
+        def run(*args, **kwargs):
+            self._attach(profile)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._detach()
+        return run
+
+    def _attach(self, profile: Profile):
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] = profile
+            self._cpu_clocks[ident] = _cpu_clock(ident)
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                self._thread.start()
+            self._wakeup.notify()
+
+    def _detach(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self._active.pop(ident, None)
+            self._cpu_clocks.pop(ident, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._active:
+                    self._wakeup.wait()
+                active = dict(self._active)
+                clocks = dict(self._cpu_clocks)
+            try:
+                readings = self._sample(active, clocks)
+                with self._lock:
+                    for ident, reading in readings.items():
+                        if ident in self._cpu_clocks:
+                            self._cpu_clocks[ident] = reading
+            except Exception as e:
+                logging.warning(f"Profiler sample failed: {e}")
+            time.sleep(self.interval)
+
+    def _sample(self, active: Dict[int, Profile], clocks: Dict[int, tuple]) -> Dict[int, tuple]:
+        """Add one stack sample of every active thread; returns the new CPU clock readings"""
+        frames = sys._current_frames()
+        readings = {}
+        for ident, profile in active.items():
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            cpu_us = 0
+            clock = clocks.get(ident)
+            if clock is not None:
+                clock_id, last = clock
+                try:
+                    now = time.clock_gettime(clock_id)
+                except OSError:
+                    now = last
+                cpu_us = int((now - last) * 1_000_000)
+                readings[ident] = (clock_id, now)
+            names = []
+            while frame is not None and len(names) < MAX_DEPTH:
+                names.append(self._label(frame.f_code, frame.f_globals))
+                frame = frame.f_back
+            names.append(f"{profile.method} {profile.route}")
+            profile.add(';'.join(reversed(names)), cpu_us)
+        return readings
+
+    def _label(self, code, frame_globals) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            module = frame_globals.get('__name__') or os.path.basename(code.co_filename)
+            label = f"{module}:{getattr(code, 'co_qualname', code.co_name)}".replace(';', ':').replace(' ', '_')
+            self._labels[code] = label
+        return label
+
+    def recent(self) -> List[Dict]:
+        """Summaries of the kept profiles, newest first"""
+        with self._lock:
+            profiles = list(self._profiles)
+        return [profile.to_dict() for profile in reversed(profiles)]
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return next((profile for profile in self._profiles if profile.id == profile_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+def _cpu_clock(ident: int) -> Optional[tuple]:
+    """The CPU-time clock of a thread and its current reading, where the platform has one"""
+    try:
+        clock_id = time.pthread_getcpuclockid(ident)
+        return clock_id, time.clock_gettime(clock_id)
+    except (AttributeError, OSError):
+        return None
+
+
+# Global request profiler instance
+request_profiler = RequestProfiler()
@@ -0,0 +1,77 @@
+import os
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+# Successful request latencies kept per provider for the p95 estimate
+LATENCY_WINDOW = int(os.environ.get('AI_LATENCY_WINDOW', '200'))
+# Samples needed before the p95 estimate is trusted
+LATENCY_MIN_SAMPLES = int(os.environ.get('AI_LATENCY_MIN_SAMPLES', '20'))
+# Recent outcomes kept per provider for the error rate
+ERROR_WINDOW = int(os.environ.get('AI_ERROR_WINDOW', '20'))
+# Outcomes needed before a provider can be considered unhealthy
+ERROR_MIN_SAMPLES = int(os.environ.get('AI_ERROR_MIN_SAMPLES', '5'))
+
+
+class ProviderStats:
+    """Rolling latency and error-rate windows for each AI provider.
+
+    Used to order failover candidates and to size the hedging budget. The
+    windows are per process, which is enough to react to a provider that is
+    slow or failing right now.
+    """
+
+    def __init__(self, unhealthy_error_rate: float = 0.5):
+        self.unhealthy_error_rate = unhealthy_error_rate
+        self._latencies: Dict[str, deque] = {}
+        self._outcomes: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, latency: float, ok: bool):
+        """Record the outcome of one request to a provider"""
+        with self._lock:
+            if provider not in self._outcomes:
+                self._latencies[provider] = deque(maxlen=LATENCY_WINDOW)
+                self._outcomes[provider] = deque(maxlen=ERROR_WINDOW)
+            self._outcomes[provider].append(ok)
+            if ok:
+                self._latencies[provider].append(latency)
+
+    def p95(self, provider: str) -> Optional[float]:
+        """Get the 95th percentile latency of successful requests, or None without enough samples"""
+        with self._lock:
+            latencies = sorted(self._latencies.get(provider, ()))
+        if len(latencies) < LATENCY_MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def error_rate(self, provider: str) -> float:
+        """Get the share of recent requests to a provider that failed"""
+        with self._lock:
+            outcomes = list(self._outcomes.get(provider, ()))
+        if not outcomes:
+            return 0.0
+        return outcomes.count(False) / len(outcomes)
+
+    def is_healthy(self, provider: str) -> bool:
+        """Whether a provider's recent error rate is below the unhealthy threshold"""
+        with self._lock:
+            outcomes = list(self._outcomes.get(provider, ()))
+        if len(outcomes) < ERROR_MIN_SAMPLES:
+            return True
+        return outcomes.count(False) / len(outcomes) < self.unhealthy_error_rate
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Get the current latency and error figures for every provider seen"""
+        with self._lock:
+            providers = list(self._outcomes)
+        snapshot = {}
+        for provider in providers:
+            p95 = self.p95(provider)
+            snapshot[provider] = {
+                'p95_latency': round(p95, 3) if p95 is not None else None,
+                'error_rate': round(self.error_rate(provider), 4),
+                'samples': len(self._outcomes[provider]),
+                'healthy': self.is_healthy(provider)
+            }
+        return snapshot
@@ -0,0 +1,69 @@
+import logging
+from typing import Dict, Optional
+from encryption import encryption_service
+from media import media_store
+from models import SocialAccount
+
+
+def find_publishing_account(platform: str) -> Optional[SocialAccount]:
+    """Get the connected account used to publish on a platform, preferring the default one"""
+    return SocialAccount.query.filter_by(platform=platform, status='connected').order_by(
+        SocialAccount.is_default.desc(), SocialAccount.id
+    ).first()
+
+
+def compose_post_text(content: str, hashtags=None) -> str:
+    """Join post content and hashtags (list or space-separated string) into the text to publish"""
+    if isinstance(hashtags, (list, tuple)):
+        hashtags = ' '.join(hashtags)
+    hashtags = (hashtags or '').strip()
+    return f"{content}\n\n{hashtags}" if hashtags else content
+
+
+def publish_content(platform: str, content: str, hashtags=None, media_ids=None) -> Dict:
+    """Publish content on a platform through its API client, with optional MediaAsset ids attached.
+
+    Platforms without a client integration are simulated, as they were when
+    publishing happened inside the request handler.
+    """
+    text = compose_post_text(content, hashtags)
+    account = find_publishing_account(platform)
+
+    try:
+        assets = media_store.get_many(media_ids or [])
+        if assets is None:
+            return {'success': False, 'error': 'Archivo multimedia no encontrado'}
+
+        if platform == 'twitter' and account and account.encrypted_credentials:
+            from twitter_api import create_twitter_client
+            credentials = encryption_service.decrypt_credentials(account.encrypted_credentials)
+            client = create_twitter_client(credentials)
+            if not client:
+                return {'success': False, 'error': 'No se pudo crear el cliente de Twitter'}
+
+            platform_media_ids = []
+            for asset in assets:
+                media_id = media_store.platform_media_id(asset, platform, account.id, client.upload_media)
+                if not media_id:
+                    return {'success': False, 'error': f'No se pudo subir el archivo multimedia {asset.id}'}
+                platform_media_ids.append(media_id)
+
+            result = client.post_tweet(text, media_ids=platform_media_ids)
+            if result.get('status') not in ('success', 'simulated'):
+                return {'success': False, 'error': result.get('message', 'Error al publicar')}
+            return {
+                'success': True,
+                'message': result.get('message'),
+                'external_id': result.get('tweet_id'),
+                'account_id': account.id
+            }
+
+        return {
+            'success': True,
+            'message': f'Publicación simulada en {platform}',
+            'external_id': None,
+            'account_id': account.id if account else None
+        }
+    except Exception as e:
+        logging.error(f"Error publishing to {platform}: {e}")
+        return {'success': False, 'error': str(e)}
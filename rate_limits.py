@@ -0,0 +1,185 @@
+import os
+import math
+import time
+import logging
+import threading
+from typing import Dict, Mapping, Optional
+from flask import has_app_context
+from sqlalchemy.exc import IntegrityError
+from models import db, RateLimitBucket
+
+# Rate-limit window used to spread requests until the API reports its own
+WINDOW_SECONDS = float(os.environ.get('RATE_LIMIT_WINDOW', '900'))
+# Requests per window assumed for an endpoint before its first response
+DEFAULT_LIMIT = int(os.environ.get('RATE_LIMIT_DEFAULT', '15'))
+# Longest a request may wait for a token before giving up
+MAX_WAIT = float(os.environ.get('RATE_LIMIT_MAX_WAIT', '10'))
+# Block applied after a 429 that carries no reset or Retry-After header
+DEFAULT_BLOCK_SECONDS = 60.0
+# Times a shared bucket update is retried after losing a race with another worker
+MAX_UPDATE_ATTEMPTS = 50
+
+
+class RateLimitExceeded(Exception):
+    """A request would have to wait longer than allowed for its rate limit"""
+
+    def __init__(self, key: str, retry_after: float):
+        super().__init__(f"Rate limit for {key} exceeded, retry in {retry_after:.0f}s")
+        self.key = key
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """Per-endpoint token buckets kept in sync with the API's rate-limit headers.
+
+    Tokens refill continuously at limit/window so bursts are spread out, and
+    in full when the API's window resets. Every response brings the bucket in
+    line with what the API says is left, and a 429 or an exhausted window
+    blocks the endpoint until its reset. Buckets live in the database so every thread
+    and worker shares them; without an app context, or if the database
+    fails, a per-process copy is used instead.
+    """
+
+    def __init__(self):
+        self._local: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, max_wait: float = MAX_WAIT, default_limit: int = DEFAULT_LIMIT) -> float:
+        """Take a token for one request, sleeping until one is available; returns the seconds waited.
+
+        Raises RateLimitExceeded if no token is expected within max_wait.
+        """
+        started = time.time()
+        while True:
+            wait = self._update(key, self._take, default_limit)
+            if wait == 0:
+                return time.time() - started
+            waited = time.time() - started
+            if waited + wait > max_wait:
+                raise RateLimitExceeded(key, wait)
+            # Callers woken together race for the tokens again; losers wait another round
+            time.sleep(wait)
+
+    def observe(self, key: str, status_code: int, headers: Mapping[str, str], default_limit: int = DEFAULT_LIMIT):
+        """Narrow a bucket to the rate-limit state reported with a response"""
+        limit = _header_number(headers, 'x-rate-limit-limit')
+        remaining = _header_number(headers, 'x-rate-limit-remaining')
+        reset = _header_number(headers, 'x-rate-limit-reset')
+        retry_after = _header_number(headers, 'retry-after')
+        if status_code != 429 and remaining is None and retry_after is None:
+            return
+
+        def apply(state, now):
+            learned = bool(limit) and int(limit) != state['limit']
+            new_window = reset is not None and reset != state['reset_ts']
+            if limit:
+                state['limit'] = int(limit)
+            if reset:
+                state['reset_ts'] = reset
+            if remaining is not None:
+                # A new window or newly reported limit replaces our estimate; otherwise only narrow it
+                state['tokens'] = remaining if learned or new_window else min(state['tokens'], remaining)
+            if status_code == 429 or remaining == 0:
+                state['tokens'] = min(state['tokens'], 0.0)
+                until = now + retry_after if retry_after is not None else reset or now + DEFAULT_BLOCK_SECONDS
+                state['blocked_until'] = max(state['blocked_until'] or 0.0, until)
+
+        self._update(key, apply, default_limit)
+
+    @staticmethod
+    def retry_delay(headers: Mapping[str, str]) -> Optional[float]:
+        """Get the delay a Retry-After header asks for, if there is one"""
+        retry_after = _header_number(headers, 'retry-after')
+        return max(0.0, retry_after) if retry_after is not None else None
+
+    def block_remaining(self, key: str) -> float:
+        """Get the seconds until a blocked endpoint may be called again"""
+        return self._update(key, lambda state, now: max(0.0, (state['blocked_until'] or now) - now), DEFAULT_LIMIT)
+
+    @staticmethod
+    def _take(state: Dict, now: float) -> float:
+        """Take a token from a bucket; returns 0, or the wait until one is expected"""
+        if state['blocked_until'] and now < state['blocked_until']:
+            return state['blocked_until'] - now
+        if state['tokens'] < 1:
+            refill = (1 - state['tokens']) * WINDOW_SECONDS / state['limit']
+            return min(refill, state['reset_ts'] - now) if state['reset_ts'] else refill
+        state['tokens'] -= 1
+        return 0
+
+    def _update(self, key: str, change, default_limit: int):
+        """Apply a change to a bucket atomically and return its result"""
+        if has_app_context():
+            try:
+                return self._update_shared(key, change, default_limit)
+            except Exception as e:
+                logging.warning(f"Shared rate-limit state unavailable, using this worker's: {e}")
+        with self._lock:
+            now = time.time()
+            state = self._local.get(key) or _new_state(default_limit, now)
+            _refill(state, now)
+            result = change(state, now)
+            state['updated_ts'] = now
+            self._local[key] = state
+            return result
+
+    def _update_shared(self, key: str, change, default_limit: int):
+        """Apply a change to the bucket's row as a compare-and-swap on its updated_ts.
+
+        SELECT ... FOR UPDATE is a no-op on SQLite, so the write only lands if
+        no other thread or worker wrote the row since it was read; otherwise
+        the change is recomputed from the fresh row.
+        """
+        table = RateLimitBucket.__table__
+        for _ in range(MAX_UPDATE_ATTEMPTS):
+            try:
+                # Own connection and transaction, so the caller's session is never committed here
+                with db.engine.begin() as connection:
+                    row = connection.execute(
+                        table.select().where(table.c.key == key).with_for_update()
+                    ).mappings().first()
+                    now = time.time()
+                    state = dict(row) if row else _new_state(default_limit, now)
+                    _refill(state, now)
+                    result = change(state, now)
+                    state['key'] = key
+                    if not row:
+                        connection.execute(table.insert().values(**state))
+                        return result
+                    # Always moves forward, so a writer that read the same row cannot match it again
+                    state['updated_ts'] = max(now, math.nextafter(row['updated_ts'], math.inf))
+                    written = connection.execute(table.update().where(
+                        table.c.key == key, table.c.updated_ts == row['updated_ts']
+                    ).values(**state)).rowcount
+                if written:
+                    return result
+            except IntegrityError:
+                # Another worker created the bucket first
+                continue
+        raise RuntimeError(f"Rate-limit bucket {key} kept changing during {MAX_UPDATE_ATTEMPTS} updates")
+
+
+def _new_state(limit: int, now: float) -> Dict:
+    return {'limit': limit, 'tokens': float(limit), 'updated_ts': now, 'reset_ts': None, 'blocked_until': None}
+
+
+def _refill(state: Dict, now: float):
+    """Add the tokens accrued since the bucket was last updated, or all of them after a window reset"""
+    limit = state['limit']
+    if state['reset_ts'] and now >= state['reset_ts']:
+        state['tokens'] = float(limit)
+        state['reset_ts'] = None
+    else:
+        state['tokens'] = min(limit, state['tokens'] + (now - state['updated_ts']) * limit / WINDOW_SECONDS)
+
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+# Global rate limiter instance
+rate_limiter = RateLimiter()
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class ResponseCache:
+    """Size- and TTL-bounded LRU cache for AI generation results.
+
+    Entries live in an in-process tier and, when `shared_path` is set, in a
+    SQLite file shared by every worker on the host. Lookups check the
+    in-process tier first and promote shared hits into it.
+    """
+
+    def __init__(self, enabled: bool = False, max_entries: int = 512, ttl: float = 3600,
+                 shared_path: Optional[str] = None, shared_max_entries: int = 10000):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared_path = shared_path
+        self.shared_max_entries = shared_max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    @staticmethod
+    def make_key(provider: str, model: str, prompt: str, temperature: float, system_prompt: str) -> str:
+        """Build the cache key for a generation request"""
+        raw = json.dumps([provider, model, prompt, temperature, system_prompt], ensure_ascii=False)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Get a cached result, or None when missing or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return dict(value)
+                del self._entries[key]
+
+        value = self._shared_get(key, now) if self.shared_path else None
+        with self._lock:
+            if value is None:
+                self._counters['misses'] += 1
+                return None
+            self._counters['hits'] += 1
+            self._counters['shared_hits'] += 1
+            self._store_local(key, value, now + self.ttl)
+        return dict(value)
+
+    def set(self, key: str, value: Dict):
+        """Store a result in every tier"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._counters['stores'] += 1
+            self._store_local(key, dict(value), expires_at)
+        if self.shared_path:
+            self._shared_set(key, value, expires_at)
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._entries.clear()
+        if self.shared_path:
+            try:
+                connection = self._shared_connection()
+                with connection:
+                    connection.execute('DELETE FROM ai_response_cache')
+            except sqlite3.Error as e:
+                logging.warning(f"Could not clear shared AI cache: {e}")
+
+    def stats(self) -> Dict:
+        """Get hit/miss counters and current size"""
+        with self._lock:
+            counters = dict(self._counters)
+            counters['entries'] = len(self._entries)
+        lookups = counters['hits'] + counters['misses']
+        counters['hit_ratio'] = round(counters['hits'] / lookups, 4) if lookups else 0.0
+        counters['enabled'] = self.enabled
+        counters['shared'] = bool(self.shared_path)
+        return counters
+
+    def _store_local(self, key: str, value: Dict, expires_at: float):
+        # Caller holds self._lock
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def _shared_connection(self) -> sqlite3.Connection:
+        """Get this thread's connection to the shared tier"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.shared_path, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS ai_response_cache '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS ix_ai_response_cache_expires_at ON ai_response_cache (expires_at)'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _shared_get(self, key: str, now: float) -> Optional[Dict]:
+        try:
+            row = self._shared_connection().execute(
+                'SELECT value FROM ai_response_cache WHERE key = ? AND expires_at > ?', (key, now)
+            ).fetchone()
+            return json.loads(row[0]) if row else None
+        except sqlite3.Error as e:
+            logging.warning(f"Shared AI cache read failed: {e}")
+            return None
+
+    def _shared_set(self, key: str, value: Dict, expires_at: float):
+        try:
+            connection = self._shared_connection()
+            with connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO ai_response_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                    (key, json.dumps(value, ensure_ascii=False), expires_at)
+                )
+                connection.execute('DELETE FROM ai_response_cache WHERE expires_at <= ?', (time.time(),))
+                # Keep the shared tier bounded by dropping the entries closest to expiry
+                connection.execute(
+                    'DELETE FROM ai_response_cache WHERE key IN ('
+                    'SELECT key FROM ai_response_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+                    (self.shared_max_entries,)
+                )
+        except sqlite3.Error as e:
+            logging.warning(f"Shared AI cache write failed: {e}")
+
+
+def create_response_cache() -> ResponseCache:
+    """Create the AI response cache from environment settings"""
+    return ResponseCache(
+        enabled=os.environ.get('AI_CACHE_ENABLED', '0') == '1',
+        max_entries=int(os.environ.get('AI_CACHE_MAX_ENTRIES', '512')),
+        ttl=float(os.environ.get('AI_CACHE_TTL', '3600')),
+        shared_path=os.environ.get('AI_CACHE_SHARED_PATH') or None,
+        shared_max_entries=int(os.environ.get('AI_CACHE_SHARED_MAX_ENTRIES', '10000'))
+    )
@@ -0,0 +1,82 @@
+import os
+import calendar
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from models import ScheduledPost
+
+# Timezone used to decide which day or month a post falls on
+CALENDAR_TIMEZONE = os.environ.get('CALENDAR_TIMEZONE', 'Europe/Madrid')
+
+
+def get_zone(name: Optional[str]):
+    """Resolve a timezone name, falling back to UTC when unknown"""
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return dt_timezone.utc
+
+
+def parse_scheduled_date(scheduled_date: str, timezone_name: Optional[str] = 'UTC') -> datetime:
+    """Parse a post's scheduled date into an aware UTC datetime.
+
+    Dates without an offset are wall-clock times in the post's own timezone,
+    which is what the scheduling form sends.
+    """
+    parsed = datetime.fromisoformat(scheduled_date.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=get_zone(timezone_name))
+    return parsed.astimezone(dt_timezone.utc)
+
+
+def to_utc_timestamp(scheduled_date: str, timezone_name: Optional[str] = 'UTC') -> int:
+    """Get the UTC epoch seconds used to index a post's scheduled date"""
+    return int(parse_scheduled_date(scheduled_date, timezone_name).timestamp())
+
+
+def _local_midnight_timestamp(day: date, zone) -> int:
+    return int(datetime(day.year, day.month, day.day, tzinfo=zone).timestamp())
+
+
+def day_window(day: date, timezone_name: str = CALENDAR_TIMEZONE) -> Tuple[int, int]:
+    """Get the [start, end) epoch range covering a calendar day"""
+    zone = get_zone(timezone_name)
+    return _local_midnight_timestamp(day, zone), _local_midnight_timestamp(day + timedelta(days=1), zone)
+
+
+def month_window(year: int, month: int, timezone_name: str = CALENDAR_TIMEZONE) -> Tuple[int, int]:
+    """Get the [start, end) epoch range covering a calendar month"""
+    zone = get_zone(timezone_name)
+    days_in_month = calendar.monthrange(year, month)[1]
+    first_day = date(year, month, 1)
+    return (
+        _local_midnight_timestamp(first_day, zone),
+        _local_midnight_timestamp(first_day + timedelta(days=days_in_month), zone)
+    )
+
+
+def upcoming_window(days: int, now: Optional[datetime] = None) -> Tuple[int, int]:
+    """Get the [start, end) epoch range from now through the next `days` days"""
+    start = int((now or datetime.now(dt_timezone.utc)).timestamp())
+    return start, start + days * 86400 + 1
+
+
+def today(timezone_name: str = CALENDAR_TIMEZONE) -> date:
+    """Get the current date in the calendar timezone"""
+    return datetime.now(get_zone(timezone_name)).date()
+
+
+def posts_in_window(start_ts: int, end_ts: int, *columns):
+    """Query posts scheduled in [start_ts, end_ts), in time order.
+
+    The range is answered from the scheduled_ts index, so cost grows with the
+    number of matching posts rather than the size of the table. Pass columns
+    to load only what the caller needs.
+    """
+    query = ScheduledPost.query
+    if columns:
+        query = query.with_entities(*columns)
+    return query.filter(
+        ScheduledPost.scheduled_ts >= start_ts,
+        ScheduledPost.scheduled_ts < end_ts
+    ).order_by(ScheduledPost.scheduled_ts, ScheduledPost.id)
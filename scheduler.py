@@ -0,0 +1,236 @@
+import os
+import heapq
+import logging
+import random
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import and_, or_, update
+from models import db, ScheduledPost, PublishedPost
+from publisher import publish_content
+from ledger import publication_ledger
+from metrics_ingestion import metrics_ingestor
+
+# How often the due-post window is reloaded from the database, in seconds
+REFRESH_INTERVAL = float(os.environ.get('SCHEDULER_REFRESH_INTERVAL', '30'))
+# Threads publishing due posts in parallel
+PUBLISH_WORKERS = int(os.environ.get('SCHEDULER_PUBLISH_WORKERS', '8'))
+# Attempts before a post is marked as failed
+MAX_ATTEMPTS = int(os.environ.get('SCHEDULER_MAX_ATTEMPTS', '5'))
+# Retry backoff: base * 2^(attempt - 1), capped, with jitter
+RETRY_BASE_DELAY = float(os.environ.get('SCHEDULER_RETRY_BASE_DELAY', '30'))
+RETRY_MAX_DELAY = float(os.environ.get('SCHEDULER_RETRY_MAX_DELAY', '3600'))
+# Claims older than this are considered abandoned by a dead worker
+CLAIM_TIMEOUT = int(os.environ.get('SCHEDULER_CLAIM_TIMEOUT', '300'))
+
+
+class PublishScheduler:
+    """Publishes scheduled posts when they become due.
+
+    Due times for the near future are kept in a min-heap, refilled from the
+    scheduled_ts index every REFRESH_INTERVAL seconds, so the table is never
+    scanned. Every worker process runs its own scheduler; a post is only
+    published by the worker whose conditional UPDATE claims it, so several
+    gunicorn workers never publish the same post twice.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._heap = []
+        self._queued = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._executor = None
+        self._pid = None
+        self._stopping = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+
+    @property
+    def enabled(self) -> bool:
+        return os.environ.get('SCHEDULER_ENABLED', '1') != '0'
+
+    def start(self):
+        """Start the scheduler thread in this process if it is not running"""
+        if not self.enabled or self.app is None:
+            return
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._condition:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            # State inherited from a parent process belongs to that process
+            self._pid = os.getpid()
+            self.worker_id = f"{socket.gethostname()}:{self._pid}"
+            self._heap = []
+            self._queued = {}
+            self._stopping = False
+            self._executor = ThreadPoolExecutor(max_workers=PUBLISH_WORKERS, thread_name_prefix='publisher')
+            self._thread = threading.Thread(target=self._run, name='publish-scheduler', daemon=True)
+            self._thread.start()
+            logging.info(f"Publish scheduler started ({self.worker_id})")
+
+    def stop(self):
+        """Stop the scheduler thread"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
+    def notify(self, post_id: int, due_ts: Optional[int]):
+        """Queue a post that was just scheduled or rescheduled in this worker"""
+        if due_ts is None or self._pid != os.getpid():
+            return
+        if due_ts > time.time() + REFRESH_INTERVAL * 2:
+            # Far enough ahead for a regular refresh to pick it up
+            return
+        with self._condition:
+            self._push(post_id, due_ts)
+            self._condition.notify()
+
+    def _push(self, post_id: int, due_ts: int):
+        if self._queued.get(post_id) == due_ts:
+            return
+        self._queued[post_id] = due_ts
+        heapq.heappush(self._heap, (due_ts, post_id))
+
+    def _run(self):
+        next_refresh = 0
+        while True:
+            now = time.time()
+            if now >= next_refresh:
+                try:
+                    self._refresh(now)
+                except Exception as e:
+                    logging.error(f"Error loading due posts: {e}")
+                next_refresh = now + REFRESH_INTERVAL
+
+            with self._condition:
+                if self._stopping:
+                    return
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due_ts, post_id = heapq.heappop(self._heap)
+                    # Skip entries superseded by a later push for the same post
+                    if self._queued.get(post_id) == due_ts:
+                        del self._queued[post_id]
+                        due.append(post_id)
+
+                if not due:
+                    wake_at = next_refresh
+                    if self._heap:
+                        wake_at = min(wake_at, self._heap[0][0])
+                    self._condition.wait(timeout=max(0.0, wake_at - time.time()))
+                    continue
+
+            for post_id in due:
+                self._executor.submit(self._publish, post_id)
+
+    def _refresh(self, now: float):
+        """Load posts due before the next refresh from the indexed columns"""
+        horizon = int(now + REFRESH_INTERVAL * 2)
+        stale_before = int(now - CLAIM_TIMEOUT)
+        with self.app.app_context():
+            scheduled = db.session.query(ScheduledPost.id, ScheduledPost.scheduled_ts).filter(
+                ScheduledPost.status == 'scheduled',
+                ScheduledPost.scheduled_ts <= horizon
+            )
+            retrying = db.session.query(ScheduledPost.id, ScheduledPost.next_attempt_ts).filter(
+                ScheduledPost.status == 'retrying',
+                ScheduledPost.next_attempt_ts <= horizon
+            )
+            abandoned = db.session.query(ScheduledPost.id, ScheduledPost.locked_at).filter(
+                ScheduledPost.status == 'publishing',
+                ScheduledPost.locked_at < stale_before
+            )
+            rows = scheduled.all() + retrying.all() + [
+                (post_id, int(now)) for post_id, _ in abandoned.all()
+            ]
+
+        with self._condition:
+            for post_id, due_ts in rows:
+                self._push(post_id, due_ts)
+
+    def _claim(self, post_id: int, now: int) -> bool:
+        """Atomically mark a due post as being published by this worker"""
+        claim = update(ScheduledPost).where(
+            ScheduledPost.id == post_id,
+            or_(
+                and_(ScheduledPost.status == 'scheduled', ScheduledPost.scheduled_ts <= now),
+                and_(ScheduledPost.status == 'retrying', ScheduledPost.next_attempt_ts <= now),
+                and_(ScheduledPost.status == 'publishing', ScheduledPost.locked_at < now - CLAIM_TIMEOUT)
+            )
+        ).values(
+            status='publishing',
+            locked_by=self.worker_id,
+            locked_at=now,
+            attempts=ScheduledPost.attempts + 1
+        ).execution_options(synchronize_session=False)
+        claimed = db.session.execute(claim).rowcount == 1
+        db.session.commit()
+        return claimed
+
+    def _publish(self, post_id: int):
+        with self.app.app_context():
+            try:
+                if not self._claim(post_id, int(time.time())):
+                    return
+
+                post = db.session.get(ScheduledPost, post_id)
+                result = publish_content(post.platform, post.content, media_ids=post.media_ids)
+
+                post.locked_by = None
+                post.locked_at = None
+                post.updated_at = datetime.now()
+                if result.get('success'):
+                    post.status = 'published'
+                    post.published_at = datetime.now()
+                    post.next_attempt_ts = None
+                    post.last_error = None
+                    published_post = PublishedPost(
+                        id=str(uuid.uuid4()),
+                        platform=post.platform,
+                        content=post.content,
+                        published_date=post.published_at,
+                        status='published',
+                        likes=0,
+                        shares=0,
+                        account_id=result.get('account_id'),
+                        external_id=result.get('external_id'),
+                        scheduled_post_id=post.id
+                    )
+                    metrics_ingestor.track(published_post)
+                    publication_ledger.record(published_post)
+                    logging.info(f"Published scheduled post {post_id} to {post.platform}")
+                else:
+                    post.last_error = result.get('error')
+                    if post.attempts >= MAX_ATTEMPTS:
+                        post.status = 'failed'
+                        post.next_attempt_ts = None
+                        logging.error(f"Giving up on scheduled post {post_id}: {post.last_error}")
+                    else:
+                        post.status = 'retrying'
+                        post.next_attempt_ts = int(time.time() + self._retry_delay(post.attempts))
+                        self.notify(post_id, post.next_attempt_ts)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Error publishing scheduled post {post_id}: {e}")
+
+    @staticmethod
+    def _retry_delay(attempts: int) -> float:
+        delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+
+# Global scheduler instance
+publish_scheduler = PublishScheduler()
@@ -36,18 +36,17 @@ async function adaptContent() {
         button.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i>Adaptando...';
         button.disabled = true;
         
-        const response = await fetchData('/api/adapt-content', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                original_content: originalContent,
-                style: style,
-                tone: tone,
-                platforms: platforms,
-                provider: provider,
-                focus: focus
-            })
-        });
+        const resultContainer = document.getElementById('adapted-content-results');
+        showStreamingPreview(resultContainer, platforms);
+        
+        const response = await streamEvents('/api/adapt-content/stream', {
+            original_content: originalContent,
+            style: style,
+            tone: tone,
+            platforms: platforms,
+            provider: provider,
+            focus: focus
+        }, (event, data) => updateStreamingPreview(resultContainer, event, data));
         
         if (response.status === 'success') {
             displayAdaptedContent(response.adapted_content, platforms);
@@ -532,14 +532,13 @@ async function generateContent() {
     try {
         console.log('Generating content with:', { topic, tone, platforms, provider });
         
-        const response = await fetchData('/api/generate-content', {
-            method: 'POST',
-            body: JSON.stringify({ 
-                topic: topic, 
-                platforms: platforms,
-                provider: provider
-            })
-        });
+        showStreamingPreview(resultContainer, platforms);
+        
+        const response = await streamEvents('/api/generate-content/stream', {
+            topic: topic, 
+            platforms: platforms,
+            provider: provider
+        }, (event, data) => updateStreamingPreview(resultContainer, event, data));
         
         console.log('Generation response:', response);
         
@@ -976,6 +975,95 @@ async function fetchData(url, options = {}) {
     }
 }
 
+// POST a JSON payload to a server-sent events endpoint, calling onEvent(name, data)
+// for every event. Resolves with the data of the final 'done' event; endpoints that
+// answer with plain JSON (e.g. validation errors) resolve with that body instead.
+async function streamEvents(url, payload, onEvent) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+        },
+        body: JSON.stringify(payload)
+    });
+    
+    const contentType = response.headers.get('Content-Type') || '';
+    if (!contentType.includes('text/event-stream')) {
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || data.message || `HTTP error! status: ${response.status}`);
+        }
+        return data;
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = null;
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let eventName = 'message';
+            const dataLines = [];
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    eventName = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    dataLines.push(line.slice(5).trimStart());
+                }
+            });
+            if (dataLines.length === 0) continue;
+            
+            const data = JSON.parse(dataLines.join('\n'));
+            if (eventName === 'done' || eventName === 'error') {
+                result = data;
+            }
+            if (onEvent) onEvent(eventName, data);
+        }
+    }
+    
+    if (!result) {
+        throw new Error('La conexión se cerró antes de completar la generación');
+    }
+    return result;
+}
+
+// Show one live preview card per platform while content streams in
+function showStreamingPreview(container, platforms) {
+    container.innerHTML = platforms.map(platform => `
+        <div class="card mb-3">
+            <div class="card-header">
+                <i class="fab fa-${platform} me-2"></i>${platform.charAt(0).toUpperCase() + platform.slice(1)}
+                <span class="spinner-border spinner-border-sm ms-2" data-stream-status="${platform}"></span>
+            </div>
+            <div class="card-body">
+                <div class="content-preview" style="white-space: pre-wrap;" data-stream-platform="${platform}"></div>
+            </div>
+        </div>
+    `).join('');
+}
+
+function updateStreamingPreview(container, event, data) {
+    if (!data || !data.platform) return;
+    
+    if (event === 'token') {
+        const preview = container.querySelector(`[data-stream-platform="${data.platform}"]`);
+        if (preview) preview.textContent += data.delta;
+    } else if (event === 'platform_done' || event === 'platform_error') {
+        const status = container.querySelector(`[data-stream-status="${data.platform}"]`);
+        if (status) status.remove();
+    }
+}
+
 function formatDate(dateString) {
     const date = new Date(dateString);
     return date.toLocaleDateString('es-ES', {
@@ -3398,11 +3486,11 @@ function displayNoDraftsMessage() {
 
 async function selectDraft(draftId) {
     try {
-        const response = await fetch('/api/drafts');
+        const response = await fetch(`/api/drafts/${draftId}`);
         const result = await response.json();
         
         if (result.success) {
-            const draft = result.drafts.find(d => d.id === draftId);
+            const draft = result.draft;
             if (draft) {
                 // Fill form with draft data
                 document.getElementById('calendarPostContent').value = draft.content;
@@ -3474,7 +3562,9 @@ async function publishNowFromCalendar() {
             })
         });
         
-        if (response.success) {
+        const job = await waitForJob(response.job_id);
+        
+        if (job.status === 'succeeded') {
             showSuccessMessage('¡Publicación enviada exitosamente!');
             
             // Close modal
@@ -3486,7 +3576,7 @@ async function publishNowFromCalendar() {
                 await loadMonitoringData();
             }
         } else {
-            showErrorMessage(response.error || 'Error al publicar el contenido');
+            showErrorMessage(job.error || 'Error al publicar el contenido');
         }
     } catch (error) {
         console.error('Error publishing now:', error);
@@ -1,3 +1,24 @@
+// Poll a background job until it finishes and return its final state
+async function waitForJob(jobId, intervalMs = 500, timeoutMs = 120000) {
+    const deadline = Date.now() + timeoutMs;
+    
+    while (Date.now() < deadline) {
+        const response = await fetch(`/api/jobs/${jobId}`);
+        const data = await response.json();
+        
+        if (!response.ok) {
+            throw new Error(data.message || `HTTP error! status: ${response.status}`);
+        }
+        if (data.job.status === 'succeeded' || data.job.status === 'failed') {
+            return data.job;
+        }
+        
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+    
+    throw new Error('Tiempo de espera agotado al publicar');
+}
+
 // Publish Now functionality
 async function publishNow(platform, content, hashtags) {
     // Find the publish button and add loading state
@@ -25,8 +46,11 @@ async function publishNow(platform, content, hashtags) {
         });
 
         const data = await response.json();
+        
+        // Publishing runs in the background; wait for the job to finish
+        const job = data.status === 'accepted' ? await waitForJob(data.job_id) : null;
 
-        if (data.status === 'success') {
+        if (job && job.status === 'succeeded') {
             // Success feedback with animation
             publishBtn.innerHTML = '<i class="fas fa-check me-1"></i>Publicado';
             publishBtn.classList.remove('btn-success', 'btn-loading');
@@ -48,7 +72,8 @@ async function publishNow(platform, content, hashtags) {
                 publishBtn.disabled = false;
             }, 3000);
         } else {
-            showErrorMessage(`Error al publicar en ${platform}: ${data.message || 'Error desconocido'}`);
+            const errorMessage = job ? job.error : data.message;
+            showErrorMessage(`Error al publicar en ${platform}: ${errorMessage || 'Error desconocido'}`);
             // Reset button on error
             publishBtn.innerHTML = originalText;
             publishBtn.classList.remove('btn-loading');
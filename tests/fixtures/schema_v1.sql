@@ -0,0 +1,62 @@
+-- Schema at migration version 1, as created on SQLite by that release
+
+CREATE TABLE scheduled_posts (
+	id INTEGER NOT NULL, 
+	title VARCHAR(255) NOT NULL, 
+	content TEXT NOT NULL, 
+	platform VARCHAR(32) NOT NULL, 
+	scheduled_date VARCHAR(64) NOT NULL, 
+	status VARCHAR(32) NOT NULL, 
+	engagement INTEGER NOT NULL, 
+	reach INTEGER NOT NULL, 
+	timezone VARCHAR(64) NOT NULL, 
+	created_at DATETIME NOT NULL, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id)
+);
+CREATE TABLE social_accounts (
+	id INTEGER NOT NULL, 
+	platform VARCHAR(32) NOT NULL, 
+	account_name VARCHAR(255) NOT NULL, 
+	display_name VARCHAR(255), 
+	status VARCHAR(32) NOT NULL, 
+	auto_posting BOOLEAN NOT NULL, 
+	is_default BOOLEAN NOT NULL, 
+	connected_date DATETIME NOT NULL, 
+	has_api BOOLEAN NOT NULL, 
+	encrypted_credentials JSON, 
+	last_tested DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id)
+);
+CREATE TABLE ai_providers (
+	id INTEGER NOT NULL, 
+	name VARCHAR(32) NOT NULL, 
+	display_name VARCHAR(255) NOT NULL, 
+	encrypted_api_key TEXT, 
+	status VARCHAR(32) NOT NULL, 
+	is_default BOOLEAN NOT NULL, 
+	model VARCHAR(255), 
+	last_tested DATETIME, 
+	PRIMARY KEY (id)
+);
+CREATE TABLE prompt_settings (
+	"key" VARCHAR(64) NOT NULL, 
+	value JSON NOT NULL, 
+	updated_at DATETIME NOT NULL, 
+	PRIMARY KEY ("key")
+);
+CREATE TABLE schema_migrations (
+	version INTEGER NOT NULL, 
+	description VARCHAR(255) NOT NULL, 
+	applied_at DATETIME NOT NULL, 
+	PRIMARY KEY (version)
+);
+CREATE INDEX ix_scheduled_posts_scheduled_date ON scheduled_posts (scheduled_date);
+CREATE INDEX ix_scheduled_posts_platform ON scheduled_posts (platform);
+CREATE INDEX ix_scheduled_posts_status ON scheduled_posts (status);
+CREATE INDEX ix_social_accounts_status ON social_accounts (status);
+CREATE INDEX ix_social_accounts_platform ON social_accounts (platform);
+CREATE UNIQUE INDEX ix_ai_providers_name ON ai_providers (name);
+
+INSERT INTO schema_migrations (version, description, applied_at) VALUES (1, 'Initial schema', '2025-01-01 00:00:00');
@@ -0,0 +1,110 @@
+-- Schema at migration version 4, as created on SQLite by that release
+
+CREATE TABLE scheduled_posts (
+	id INTEGER NOT NULL, 
+	title VARCHAR(255) NOT NULL, 
+	content TEXT NOT NULL, 
+	platform VARCHAR(32) NOT NULL, 
+	scheduled_date VARCHAR(64) NOT NULL, 
+	scheduled_ts BIGINT, 
+	status VARCHAR(32) NOT NULL, 
+	engagement INTEGER NOT NULL, 
+	reach INTEGER NOT NULL, 
+	timezone VARCHAR(64) NOT NULL, 
+	created_at DATETIME NOT NULL, 
+	updated_at DATETIME, 
+	attempts INTEGER NOT NULL, 
+	next_attempt_ts BIGINT, 
+	locked_by VARCHAR(128), 
+	locked_at BIGINT, 
+	published_at DATETIME, 
+	last_error TEXT, 
+	PRIMARY KEY (id)
+);
+CREATE TABLE social_accounts (
+	id INTEGER NOT NULL, 
+	platform VARCHAR(32) NOT NULL, 
+	account_name VARCHAR(255) NOT NULL, 
+	display_name VARCHAR(255), 
+	status VARCHAR(32) NOT NULL, 
+	auto_posting BOOLEAN NOT NULL, 
+	is_default BOOLEAN NOT NULL, 
+	connected_date DATETIME NOT NULL, 
+	has_api BOOLEAN NOT NULL, 
+	encrypted_credentials JSON, 
+	last_tested DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id)
+);
+CREATE TABLE ai_providers (
+	id INTEGER NOT NULL, 
+	name VARCHAR(32) NOT NULL, 
+	display_name VARCHAR(255) NOT NULL, 
+	encrypted_api_key TEXT, 
+	status VARCHAR(32) NOT NULL, 
+	is_default BOOLEAN NOT NULL, 
+	model VARCHAR(255), 
+	last_tested DATETIME, 
+	PRIMARY KEY (id)
+);
+CREATE TABLE prompt_settings (
+	"key" VARCHAR(64) NOT NULL, 
+	value JSON NOT NULL, 
+	updated_at DATETIME NOT NULL, 
+	PRIMARY KEY ("key")
+);
+CREATE TABLE schema_migrations (
+	version INTEGER NOT NULL, 
+	description VARCHAR(255) NOT NULL, 
+	applied_at DATETIME NOT NULL, 
+	PRIMARY KEY (version)
+);
+CREATE TABLE jobs (
+	id VARCHAR(36) NOT NULL, 
+	kind VARCHAR(32) NOT NULL, 
+	user_id VARCHAR(64), 
+	status VARCHAR(32) NOT NULL, 
+	progress INTEGER NOT NULL, 
+	message VARCHAR(255), 
+	payload JSON, 
+	result JSON, 
+	error TEXT, 
+	created_at DATETIME NOT NULL, 
+	started_at DATETIME, 
+	finished_at DATETIME, 
+	PRIMARY KEY (id)
+);
+CREATE TABLE published_posts (
+	id VARCHAR(36) NOT NULL, 
+	user_id VARCHAR(64), 
+	platform VARCHAR(32) NOT NULL, 
+	content TEXT NOT NULL, 
+	hashtags JSON, 
+	published_date DATETIME NOT NULL, 
+	status VARCHAR(32) NOT NULL, 
+	likes INTEGER NOT NULL, 
+	shares INTEGER NOT NULL, 
+	account_id INTEGER, 
+	external_id VARCHAR(64), 
+	job_id VARCHAR(36), 
+	PRIMARY KEY (id)
+);
+CREATE INDEX ix_scheduled_posts_platform ON scheduled_posts (platform);
+CREATE INDEX ix_scheduled_posts_scheduled_ts ON scheduled_posts (scheduled_ts);
+CREATE INDEX ix_scheduled_posts_scheduled_date ON scheduled_posts (scheduled_date);
+CREATE INDEX ix_scheduled_posts_status_next_attempt_ts ON scheduled_posts (status, next_attempt_ts);
+CREATE INDEX ix_scheduled_posts_status_scheduled_ts ON scheduled_posts (status, scheduled_ts);
+CREATE INDEX ix_scheduled_posts_status ON scheduled_posts (status);
+CREATE INDEX ix_social_accounts_status ON social_accounts (status);
+CREATE INDEX ix_social_accounts_platform ON social_accounts (platform);
+CREATE UNIQUE INDEX ix_ai_providers_name ON ai_providers (name);
+CREATE INDEX ix_jobs_user_id ON jobs (user_id);
+CREATE INDEX ix_jobs_status ON jobs (status);
+CREATE INDEX ix_published_posts_published_date ON published_posts (published_date);
+CREATE INDEX ix_published_posts_user_id ON published_posts (user_id);
+CREATE INDEX ix_published_posts_platform ON published_posts (platform);
+
+INSERT INTO schema_migrations (version, description, applied_at) VALUES (1, 'Initial schema', '2025-01-01 00:00:00');
+INSERT INTO schema_migrations (version, description, applied_at) VALUES (2, 'Add scheduled_posts.scheduled_ts', '2025-01-01 00:00:00');
+INSERT INTO schema_migrations (version, description, applied_at) VALUES (3, 'Add scheduled post publishing state', '2025-01-01 00:00:00');
+INSERT INTO schema_migrations (version, description, applied_at) VALUES (4, 'Add jobs and published_posts', '2025-01-01 00:00:00');
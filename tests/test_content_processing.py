@@ -0,0 +1,52 @@
+"""normalize_output against the cleanup it replaced."""
+import random
+
+import pytest
+
+from benchmarks.bench_content_processing import legacy_twitter
+from content_processing import TWITTER_FALLBACK, normalize_output
+
+SAMPLE_TWEETS = [
+    '¡Claro! Aquí tienes un tweet: "La #IA cambia el marketing: más datos, mejores decisiones [1]" #Marketing',
+    'Gran avance en IA [1] que cambia todo #IA #Tecnología #IA',
+    'Here\'s a tweet about AI: Las marcas que usan #IA responden antes a las tendencias #Marketing',
+    '"Aprende a medir el impacto de cada campaña" #Analítica\n#Datos',
+    'Tweet sobre marketing: Tres claves para 2025:\n\n1. Datos\n2. Contenido\n3. Comunidad #Estrategia',
+    'Contenido optimizado para Twitter: El 70% de los usuarios prefiere vídeo corto [2][3] #Vídeo',
+    '¿Puedes hacerme un tweet? "Claro, puedes hacerme otro" #IA',
+    '#IA #Marketing',
+    '',
+]
+
+FRAGMENTS = [
+    '¡Claro! Aquí tienes un tweet: "', 'Aquí tienes "', 'Here\'s the tweet:', 'here is it:',
+    '"Si puedes hacerme un favor"', 'Tweet sobre IA:', 'Contenido para Twitter:', '#IA', '#Marketing',
+    '[1]', ' [2] ', '"', "'", '\n', '\n\n', ' ', 'Gran avance en IA', 'que cambia', 'más datos', '##x', '#_a1',
+]
+
+
+@pytest.mark.parametrize('tweet', SAMPLE_TWEETS)
+def test_tweets_match_legacy_output(tweet):
+    normalized = normalize_output(tweet, 'twitter')
+    assert (normalized.body, normalized.hashtags) == legacy_twitter(tweet)
+
+
+def test_generated_tweets_match_legacy_output():
+    rng = random.Random(11)
+    for _ in range(2000):
+        tweet = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 10)))
+        normalized = normalize_output(tweet, 'twitter')
+        assert (normalized.body, normalized.hashtags) == legacy_twitter(tweet), tweet
+
+
+def test_tweet_keeps_citations_and_repeated_hashtags():
+    normalized = normalize_output('Gran avance en IA [1] que cambia #IA todo #IA', 'twitter')
+    assert normalized.body == 'Gran avance en IA [1] que cambia  todo'
+    assert normalized.hashtags == ['#IA', '#IA']
+    assert normalized.citations == [1]
+
+
+def test_meta_only_tweet_falls_back():
+    normalized = normalize_output('¡Claro! Aquí tienes un tweet: "', 'twitter')
+    assert normalized.body == TWITTER_FALLBACK
+    assert normalized.meta == ['¡Claro! Aquí tienes un tweet: "']
@@ -0,0 +1,137 @@
+"""Claiming and recovery of background jobs left behind by a dead worker."""
+import importlib
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from jobs import JobQueue, JOB_CLAIM_TIMEOUT, JOB_MAX_ATTEMPTS
+from models import db, Job, PublishedPost
+
+
+@pytest.fixture
+def queue(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'jobs.db'}"
+    db.init_app(app)
+    queue = JobQueue(app)
+    runs = []
+
+    @queue.handler('echo')
+    def echo(job, report_progress):
+        runs.append(job.id)
+        return {'echo': job.payload}
+
+    queue.runs = runs
+    with app.app_context():
+        db.create_all()
+        yield queue
+
+
+def _add_job(status, attempts=0, locked_at=None, age=0):
+    job = Job(
+        id=f'job-{status}-{attempts}', kind='echo', user_id='1', status=status, progress=0, payload={'n': 1},
+        attempts=attempts, locked_by='dead-host:1' if locked_at else None, locked_at=locked_at,
+        created_at=datetime.now() - timedelta(seconds=age)
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def _wait(queue):
+    queue._executor.shutdown(wait=True)
+    db.session.expire_all()
+
+
+def test_claim_is_exclusive(queue):
+    job_id = _add_job('queued')
+    now = int(time.time())
+    assert queue._claim(job_id, now)
+    assert not queue._claim(job_id, now)
+    job = db.session.get(Job, job_id)
+    assert job.status == 'running' and job.attempts == 1 and job.locked_by == queue.worker_id
+
+
+def test_recover_reruns_abandoned_jobs(queue):
+    stale = int(time.time()) - JOB_CLAIM_TIMEOUT - 1
+    running = _add_job('running', attempts=1, locked_at=stale)
+    queued = _add_job('queued', age=JOB_CLAIM_TIMEOUT + 1)
+    _add_job('running', attempts=2, locked_at=int(time.time()))
+    _add_job('queued', attempts=1)
+
+    assert queue.recover() == 2
+    _wait(queue)
+
+    assert sorted(queue.runs) == sorted([running, queued])
+    for job_id in (running, queued):
+        job = db.session.get(Job, job_id)
+        assert job.status == 'succeeded' and job.locked_at is None
+    assert db.session.get(Job, running).attempts == 2
+
+
+def test_recover_fails_jobs_out_of_attempts(queue):
+    job_id = _add_job('running', attempts=JOB_MAX_ATTEMPTS, locked_at=int(time.time()) - JOB_CLAIM_TIMEOUT - 1)
+
+    assert queue.recover() == 1
+
+    job = db.session.get(Job, job_id)
+    assert job.status == 'failed' and job.error and job.finished_at is not None
+    assert queue.runs == []
+
+
+@pytest.fixture
+def publish_app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setenv('SCHEDULER_ENABLED', '0')
+    monkeypatch.setenv('METRICS_INGESTION_ENABLED', '0')
+    monkeypatch.setenv('JOB_RECOVERY_ENABLED', '0')
+    import app as app_module
+    app_module = importlib.reload(app_module)
+    published = []
+
+    def publish_content(platform, content, media_ids=None):
+        published.append(content)
+        return {'success': True, 'account_id': None, 'external_id': f'tweet-{len(published)}'}
+
+    monkeypatch.setattr(app_module, 'publish_content', publish_content)
+    app_module.published = published
+    with app_module.app.app_context():
+        db.create_all()
+        yield app_module
+
+
+def _publish_job(job_id='job-publish', result=None):
+    job = Job(id=job_id, kind='publish', user_id='1', status='running', progress=0, result=result, payload={
+        'post_id': 'post-1', 'platform': 'twitter', 'content': 'Nueva colección', 'hashtags': '#Moda'
+    })
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def test_publish_job_runs_again_without_posting_twice(publish_app):
+    job = _publish_job()
+    publish_app.run_publish_job(job, lambda progress, message=None: db.session.commit())
+    publish_app.run_publish_job(job, lambda progress, message=None: db.session.commit())
+
+    assert publish_app.published == ['Nueva colección']
+    assert db.session.get(PublishedPost, 'post-1').external_id == 'tweet-1'
+
+
+def test_publish_job_records_a_saved_outcome(publish_app):
+    # The platform accepted the post, then the worker died before recording it
+    job = _publish_job(result={'published': {'account_id': None, 'external_id': 'tweet-7'}})
+    publish_app.run_publish_job(job, lambda progress, message=None: db.session.commit())
+
+    assert publish_app.published == []
+    assert db.session.get(PublishedPost, 'post-1').external_id == 'tweet-7'
+
+
+def test_publish_job_interrupted_mid_publish_is_not_retried(publish_app):
+    job = _publish_job(result={'publishing': True})
+    with pytest.raises(RuntimeError):
+        publish_app.run_publish_job(job, lambda progress, message=None: db.session.commit())
+    assert publish_app.published == []
+    assert db.session.get(PublishedPost, 'post-1') is None
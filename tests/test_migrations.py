@@ -0,0 +1,99 @@
+"""Upgrades from every released schema version to the latest one.
+
+fixtures/schema_vN.sql holds the SQLite schema a fresh install of the
+release that introduced migration N created, so each test starts from a
+database that has never seen the current models.
+"""
+import os
+import sqlite3
+from datetime import datetime
+
+import pytest
+from flask import Flask
+from sqlalchemy import inspect, text
+
+import migrations
+from models import db, PublishedPost, PublishCounter, RecentPublication
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+LATEST = migrations.MIGRATIONS[-1][0]
+OLD_VERSIONS = [number for number, _, _ in migrations.MIGRATIONS[:-1]]
+
+
+def _insert(connection, table, values):
+    """Insert the values whose columns exist in the table at this schema version"""
+    columns = [row[1] for row in connection.execute(f'PRAGMA table_info({table})')]
+    if not columns:
+        return
+    values = {key: value for key, value in values.items() if key in columns}
+    connection.execute(
+        f"INSERT INTO {table} ({', '.join(values)}) VALUES ({', '.join('?' for _ in values)})",
+        list(values.values())
+    )
+
+
+@pytest.fixture
+def old_database(tmp_path):
+    def build(version):
+        path = tmp_path / f'v{version}.db'
+        connection = sqlite3.connect(path)
+        with open(os.path.join(FIXTURES, f'schema_v{version}.sql')) as source:
+            connection.executescript(source.read())
+        _insert(connection, 'scheduled_posts', {
+            'id': 1, 'title': 'Lanzamiento', 'content': 'Nueva colección', 'platform': 'twitter',
+            'scheduled_date': '2025-03-01T10:00:00', 'status': 'published', 'engagement': 0,
+            'reach': 0, 'timezone': 'Europe/Madrid', 'created_at': '2025-02-01 09:00:00', 'attempts': 0
+        })
+        _insert(connection, 'published_posts', {
+            'id': 'post-1', 'user_id': '1', 'platform': 'twitter', 'content': 'Nueva colección',
+            'published_date': '2025-03-01 10:00:05', 'status': 'published', 'likes': 3, 'shares': 1,
+            'comments': 0, 'impressions': 0, 'account_id': 1, 'external_id': '1890'
+        })
+        connection.commit()
+        connection.close()
+
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+        db.init_app(app)
+        return app
+    return build
+
+
+@pytest.mark.parametrize('version', OLD_VERSIONS)
+def test_upgrade_to_latest(old_database, version):
+    app = old_database(version)
+    with app.app_context():
+        assert migrations.current_version() == version
+        migrations.upgrade()
+        assert migrations.current_version() == LATEST
+
+        # Every table and column the models declare now exists
+        inspector = inspect(db.engine)
+        for table in db.metadata.sorted_tables:
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            assert set(table.columns.keys()) <= columns, table.name
+
+        post = db.session.get(PublishedPost, 'post-1')
+        if version < 4:
+            # published_posts did not exist yet, so there is nothing to carry over
+            assert post is None
+            return
+        assert post.likes == 3 and post.comments == 0 and post.impressions == 0
+        assert post.published_date == datetime(2025, 3, 1, 10, 0, 5)
+        if version < 9:
+            # Migration 9 queued the existing tweet for a metrics refresh
+            assert post.metrics_next_refresh_ts is not None
+        if version < 6:
+            # Migration 6 backfilled the ledger from the existing post
+            total = PublishCounter.query.filter_by(user_id='1', platform='twitter', period='all').one()
+            assert total.count == 1
+            assert RecentPublication.query.filter_by(user_id='1', post_id='post-1').count() == 1
+
+
+def test_upgrade_is_a_no_op_at_latest(old_database):
+    app = old_database(OLD_VERSIONS[-1])
+    with app.app_context():
+        migrations.upgrade()
+        migrations.upgrade()
+        versions = db.session.execute(text('SELECT COUNT(*) FROM schema_migrations')).scalar()
+        assert versions == LATEST
@@ -0,0 +1,73 @@
+"""Shared token buckets under concurrent workers."""
+import multiprocessing
+
+import pytest
+from flask import Flask
+
+import rate_limits
+from models import db, RateLimitBucket
+from rate_limits import RateLimiter
+
+WORKERS = 4
+TAKES = 200
+LIMIT = 1000
+
+
+def _app(uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    db.init_app(app)
+    return app
+
+
+def _take_tokens(uri, limit, results):
+    app = _app(uri)
+    limiter = RateLimiter()
+    warnings = []
+    rate_limits.logging.warning = warnings.append
+    with app.app_context():
+        granted = sum(1 for _ in range(TAKES) if limiter._update('k', limiter._take, limit) == 0)
+    results.put((granted, warnings))
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    # No refill while the test runs, so every granted token shows in the row
+    monkeypatch.setattr(rate_limits, 'WINDOW_SECONDS', 1e12)
+    uri = f"sqlite:///{tmp_path / 'limits.db'}"
+    app = _app(uri)
+    with app.app_context():
+        db.create_all()
+        db.engine.dispose()
+    return app, uri
+
+
+def _run_workers(uri, limit):
+    """Take TAKES tokens in each of WORKERS processes; returns how many were granted"""
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [context.Process(target=_take_tokens, args=(uri, limit, results)) for _ in range(WORKERS)]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join()
+    # Every update went through the shared row, none fell back to a worker's own copy
+    assert all(not warnings for _, warnings in outcomes)
+    return sum(count for count, _ in outcomes)
+
+
+def test_workers_share_one_bucket(database):
+    app, uri = database
+    granted = _run_workers(uri, LIMIT)
+    assert granted == WORKERS * TAKES
+    with app.app_context():
+        bucket = db.session.get(RateLimitBucket, 'k')
+        assert bucket.tokens == pytest.approx(LIMIT - granted, abs=1e-6)
+
+
+def test_workers_never_grant_more_than_the_limit(database):
+    app, uri = database
+    assert _run_workers(uri, 300) == 300
+    with app.app_context():
+        assert db.session.get(RateLimitBucket, 'k').tokens == pytest.approx(0, abs=1e-6)
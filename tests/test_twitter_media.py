@@ -0,0 +1,117 @@
+"""Chunked media upload against a mocked Twitter session."""
+import json
+
+import pytest
+import requests
+
+import twitter_api
+from http_client import http_client
+from twitter_api import TwitterAPI
+
+
+class UserAuth(requests.auth.AuthBase):
+    """Stands in for OAuth 1.0a signing"""
+
+    def __call__(self, request):
+        request.headers['Authorization'] = 'OAuth signed'
+        return request
+
+
+class FakeSession:
+    """Answers the media upload commands and records what was sent"""
+
+    def __init__(self, fail_append_at=None):
+        self.calls = []
+        self.fail_append_at = fail_append_at
+
+    def request(self, method, url, data=None, params=None, files=None, auth=None, **kwargs):
+        fields = data or params
+        self.calls.append({
+            'command': fields['command'],
+            'segment_index': fields.get('segment_index'),
+            'media': files['media'][1] if files else None,
+            'auth': auth,
+            'timeout': kwargs.get('timeout')
+        })
+        if fields['command'] == 'INIT':
+            return _response(202, {'media_id_string': '710511363345354753', 'expires_after_secs': 86400})
+        if fields['command'] == 'APPEND':
+            if fields['segment_index'] == self.fail_append_at:
+                raise requests.exceptions.ConnectionError('connection reset')
+            return _response(204)
+        return _response(201, {'media_id_string': '710511363345354753', 'size': 10})
+
+
+def _response(status, body=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(body).encode() if body is not None else b''
+    return response
+
+
+@pytest.fixture
+def media_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(twitter_api, 'MEDIA_SEGMENT_SIZE', 4)
+    path = tmp_path / 'photo.png'
+    path.write_bytes(b'0123456789')
+    return str(path)
+
+
+@pytest.fixture
+def client():
+    client = TwitterAPI('key', 'secret', 'bearer', 'access', 'access-secret')
+    client.user_auth = UserAuth()
+    return client
+
+
+def _use(monkeypatch, session):
+    monkeypatch.setattr(http_client, 'session_for', lambda url: session)
+
+
+def test_upload_sends_init_append_finalize(monkeypatch, media_file, client):
+    session = FakeSession()
+    _use(monkeypatch, session)
+    saved = []
+
+    media_id = client.upload_media(media_file, 'image/png', {}, lambda state: saved.append(dict(state)))
+
+    assert media_id == '710511363345354753'
+    assert [(call['command'], call['segment_index']) for call in session.calls] == [
+        ('INIT', None), ('APPEND', 0), ('APPEND', 1), ('APPEND', 2), ('FINALIZE', None)
+    ]
+    assert b''.join(call['media'] for call in session.calls if call['media']) == b'0123456789'
+    assert all(call['auth'] is client.user_auth for call in session.calls)
+    assert all(call['timeout'] == twitter_api.TWITTER_TIMEOUT for call in session.calls)
+    assert saved[-1]['finalized'] and saved[-1]['segment_index'] == 3
+
+
+def test_upload_resumes_from_saved_state(monkeypatch, media_file, client):
+    session = FakeSession(fail_append_at=1)
+    _use(monkeypatch, session)
+    state = {}
+
+    assert client.upload_media(media_file, 'image/png', state, lambda progress: None) is None
+    assert state['segment_index'] == 1 and not state['finalized']
+
+    session = FakeSession()
+    _use(monkeypatch, session)
+    media_id = client.upload_media(media_file, 'image/png', state, lambda progress: None)
+
+    assert media_id == '710511363345354753'
+    # The media id is still valid, so no new INIT and only the missing segments are sent
+    assert [(call['command'], call['segment_index']) for call in session.calls] == [
+        ('APPEND', 1), ('APPEND', 2), ('FINALIZE', None)
+    ]
+    assert b''.join(call['media'] for call in session.calls if call['media']) == b'456789'
+
+
+def test_upload_is_simulated_without_user_auth(monkeypatch, media_file):
+    session = FakeSession()
+    _use(monkeypatch, session)
+    client = TwitterAPI('key', 'secret', 'bearer', 'access', 'access-secret')
+    state = {'media_id': 'old', 'segment_index': 1}
+
+    media_id = client.upload_media(media_file, 'image/png', state, lambda progress: None)
+
+    assert media_id.startswith('simulated-')
+    assert session.calls == [] and state == {}
@@ -1,7 +1,40 @@
-import requests
+import os
+import time
+import random
 import base64
+import hashlib
 import json
-from typing import Dict, Optional
+import mmap
+import logging
+import requests
+from typing import Callable, Dict, List, Optional
+from http_client import http_client
+from rate_limits import rate_limiter, RateLimitExceeded, DEFAULT_LIMIT
+from metrics import outcome, response_size, TWITTER_DURATION, TWITTER_IN_FLIGHT, TWITTER_REQUESTS, TWITTER_RESPONSE_SIZE
+
+# API root; overridable to point at a proxy or a mock server
+TWITTER_API_BASE_URL = os.environ.get('TWITTER_API_BASE_URL', 'https://api.twitter.com/2')
+# Seconds to wait for Twitter to connect or send data, instead of the shared client's default
+TWITTER_TIMEOUT = float(os.environ.get('TWITTER_TIMEOUT', '10'))
+# Retries after a 429 or 503 before the response is returned as is
+TWITTER_MAX_RETRIES = int(os.environ.get('TWITTER_MAX_RETRIES', '3'))
+# Ids accepted by one tweets or users lookup request
+TWEETS_LOOKUP_MAX_IDS = 100
+USERS_LOOKUP_MAX_IDS = 100
+# Profile fields requested for users
+USER_FIELDS = 'id,name,username,description,public_metrics,verified,profile_image_url'
+# Bytes sent per media APPEND request (the API accepts up to 5 MB)
+MEDIA_SEGMENT_SIZE = int(os.environ.get('TWITTER_MEDIA_SEGMENT_SIZE', str(4 * 1024 * 1024)))
+# Longest to wait for an uploaded video to finish processing, in seconds
+MEDIA_PROCESSING_TIMEOUT = float(os.environ.get('TWITTER_MEDIA_PROCESSING_TIMEOUT', '300'))
+# Media upload calls per window assumed before the API reports its own limit
+MEDIA_UPLOAD_RATE_LIMIT = 500
+# Upload category and size limit per media type
+MEDIA_CATEGORIES = {
+    'image/gif': ('tweet_gif', 15 * 1024 * 1024),
+    'image': ('tweet_image', 5 * 1024 * 1024),
+    'video': ('tweet_video', 512 * 1024 * 1024),
+}
 
 
 class TwitterAPI:
@@ -14,10 +47,62 @@ class TwitterAPI:
         self.bearer_token = bearer_token
         self.access_token = access_token
         self.access_token_secret = access_token_secret
-        self.base_url = "https://api.twitter.com/2"
+        self.base_url = TWITTER_API_BASE_URL
+        # Signs user-context requests (posting, media upload). OAuth 1.0a signing is not
+        # implemented yet, so while this is None both are simulated
+        self.user_auth: Optional[requests.auth.AuthBase] = None
+        # Rate limits apply per app/user token, so buckets are keyed by a hash of it
+        self._credential_id = hashlib.sha256((bearer_token or '').encode()).hexdigest()[:16]
+    
+    def _request(self, method: str, endpoint: str, path: str, default_limit: int = DEFAULT_LIMIT,
+                 **kwargs) -> requests.Response:
+        """Send a request within the endpoint's rate limit, retrying 429 and 503 responses.
+
+        endpoint names the rate-limited resource (e.g. 'GET /users/me') and path
+        is the concrete URL path. Raises RateLimitExceeded when the endpoint is
+        blocked for longer than the limiter's maximum wait.
+        """
+        key = f"twitter:{self._credential_id}:{endpoint}"
+        url = f"{self.base_url}{path}"
+        for attempt in range(TWITTER_MAX_RETRIES + 1):
+            rate_limiter.acquire(key, default_limit=default_limit)
+            response = self._send(endpoint, method, url, **kwargs)
+            rate_limiter.observe(key, response.status_code, response.headers, default_limit=default_limit)
+            if response.status_code not in (429, 503):
+                return response
+            if attempt == TWITTER_MAX_RETRIES:
+                break
+            if response.status_code == 503:
+                # Overloaded: back off exponentially with jitter unless told how long to wait
+                delay = rate_limiter.retry_delay(response.headers)
+                time.sleep(delay if delay is not None else (2 ** attempt) * (0.5 + random.random()))
+            # A 429 blocks the bucket until its reset, so the next acquire waits or raises
+            logging.info(f"Twitter {endpoint} answered {response.status_code}, retrying (attempt {attempt + 1})")
+        if response.status_code == 429:
+            raise RateLimitExceeded(key, rate_limiter.block_remaining(key))
+        return response
+    
+    @staticmethod
+    def _send(endpoint: str, method: str, url: str, **kwargs) -> requests.Response:
+        """Send one request, recording its latency, status and response size"""
+        started = time.perf_counter()
+        with TWITTER_IN_FLIGHT.track(endpoint=endpoint):
+            try:
+                response = http_client.request(method, url, timeout=TWITTER_TIMEOUT, **kwargs)
+            except Exception as e:
+                status = outcome(e)
+                TWITTER_REQUESTS.inc(endpoint=endpoint, status=status)
+                TWITTER_DURATION.observe(time.perf_counter() - started, endpoint=endpoint, status=status)
+                raise
+        TWITTER_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+        TWITTER_DURATION.observe(time.perf_counter() - started, endpoint=endpoint, status=response.status_code)
+        size = response_size(response)
+        if size is not None:
+            TWITTER_RESPONSE_SIZE.observe(size, endpoint=endpoint)
+        return response
     
     def get_user_profile(self) -> Optional[Dict]:
-        """Get authenticated user's profile information"""
+        """Get authenticated user's profile information; raises RateLimitExceeded while throttled"""
         try:
             # Use Bearer Token for API v2
             headers = {
@@ -26,31 +111,21 @@ class TwitterAPI:
             }
             
             # Get user's own profile using /users/me endpoint
-            url = f"{self.base_url}/users/me"
             params = {
-                'user.fields': 'id,name,username,description,public_metrics,verified,profile_image_url'
+                'user.fields': USER_FIELDS
             }
             
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = self._request('GET', 'GET /users/me', '/users/me', headers=headers, params=params)
             
             if response.status_code == 200:
                 data = response.json()
-                user_data = data.get('data', {})
-                
-                return {
-                    'username': f"@{user_data.get('username', '')}",
-                    'display_name': user_data.get('name', ''),
-                    'follower_count': user_data.get('public_metrics', {}).get('followers_count', 0),
-                    'verified': user_data.get('verified', False),
-                    'profile_image': user_data.get('profile_image_url', ''),
-                    'description': user_data.get('description', ''),
-                    'user_id': user_data.get('id', ''),
-                    'api_response': True
-                }
+                return _profile(data.get('data', {}))
             else:
                 print(f"Twitter API Error: {response.status_code} - {response.text}")
                 return None
                 
+        except RateLimitExceeded:
+            raise
         except requests.exceptions.RequestException as e:
             print(f"Request error: {str(e)}")
             return None
@@ -58,6 +133,181 @@ class TwitterAPI:
             print(f"Unexpected error: {str(e)}")
             return None
     
+    def get_tweet_metrics(self, tweet_ids: List[str]) -> Optional[Dict]:
+        """Look up public_metrics for up to TWEETS_LOOKUP_MAX_IDS tweets in one request.
+
+        Returns {'metrics': {tweet_id: public_metrics}, 'missing': [tweet_id, ...]}
+        (missing tweets were deleted or made private), or None on error.
+        Raises RateLimitExceeded while throttled.
+        """
+        if len(tweet_ids) > TWEETS_LOOKUP_MAX_IDS:
+            raise ValueError(f"At most {TWEETS_LOOKUP_MAX_IDS} tweet ids per lookup")
+        try:
+            response = self._request('GET', 'GET /tweets', '/tweets', headers={
+                'Authorization': f'Bearer {self.bearer_token}'
+            }, params={
+                'ids': ','.join(tweet_ids),
+                'tweet.fields': 'public_metrics'
+            })
+            if response.status_code != 200:
+                logging.error(f"Twitter metrics lookup failed: {response.status_code} - {response.text}")
+                return None
+            data = response.json()
+            metrics = {tweet['id']: tweet.get('public_metrics', {}) for tweet in data.get('data', [])}
+            missing = [
+                error.get('resource_id') or error.get('value') for error in data.get('errors', [])
+                if (error.get('resource_id') or error.get('value')) not in metrics
+            ]
+            return {'metrics': metrics, 'missing': missing}
+        except RateLimitExceeded:
+            raise
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.error(f"Twitter metrics lookup error: {e}")
+            return None
+    
+    def get_users(self, user_ids: List[str]) -> Optional[Dict]:
+        """Look up the profiles of up to USERS_LOOKUP_MAX_IDS users in one request.
+
+        Returns {'profiles': {user_id: profile}, 'missing': [user_id, ...]}
+        (missing users were deleted or suspended), or None on error.
+        Raises RateLimitExceeded while throttled.
+        """
+        if len(user_ids) > USERS_LOOKUP_MAX_IDS:
+            raise ValueError(f"At most {USERS_LOOKUP_MAX_IDS} user ids per lookup")
+        try:
+            response = self._request('GET', 'GET /users', '/users', headers={
+                'Authorization': f'Bearer {self.bearer_token}'
+            }, params={
+                'ids': ','.join(user_ids),
+                'user.fields': USER_FIELDS
+            })
+            if response.status_code != 200:
+                logging.error(f"Twitter users lookup failed: {response.status_code} - {response.text}")
+                return None
+            data = response.json()
+            profiles = {user['id']: _profile(user) for user in data.get('data', [])}
+            missing = [
+                error.get('resource_id') or error.get('value') for error in data.get('errors', [])
+                if (error.get('resource_id') or error.get('value')) not in profiles
+            ]
+            return {'profiles': profiles, 'missing': missing}
+        except RateLimitExceeded:
+            raise
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.error(f"Twitter users lookup error: {e}")
+            return None
+    
+    def upload_media(self, path: str, content_type: str, state: Dict,
+                     save_progress: Callable[[Dict], None]) -> Optional[str]:
+        """Upload a media file with the chunked INIT/APPEND/FINALIZE protocol; returns its media id.
+
+        The file is memory-mapped and sent MEDIA_SEGMENT_SIZE bytes at a time,
+        so it is never read into memory whole. state carries the progress of an
+        earlier attempt ('media_id', 'segment_index', 'expires_at', 'finalized')
+        and is passed to save_progress after every step, so an interrupted
+        upload resumes from its next segment while its media id is valid.
+        Returns None on error and raises RateLimitExceeded while throttled.
+
+        Without user_auth the upload is simulated like post_tweet: the bearer
+        token is app-only and the API rejects it for media upload.
+        """
+        category, max_size = MEDIA_CATEGORIES.get(content_type) or MEDIA_CATEGORIES[content_type.split('/')[0]]
+        size = os.path.getsize(path)
+        if size > max_size:
+            logging.error(f"Media of {size} bytes exceeds Twitter's {max_size} byte limit for {category}")
+            return None
+
+        if self.user_auth is None:
+            # No expires_at is saved, so a simulated id is never reused once uploads are real
+            state.clear()
+            return f"simulated-{hashlib.sha256(path.encode()).hexdigest()[:16]}"
+
+        def send(command: str, method: str = 'POST', **kwargs) -> Optional[Dict]:
+            response = self._request(
+                method, f'{method} /media/upload {command}', '/media/upload',
+                default_limit=MEDIA_UPLOAD_RATE_LIMIT, auth=self.user_auth, **kwargs
+            )
+            if response.status_code >= 400:
+                logging.error(f"Twitter media {command} failed: {response.status_code} - {response.text}")
+                if response.status_code < 500:
+                    # The media id was rejected or has expired: the next attempt starts over
+                    state.clear()
+                    save_progress(state)
+                return None
+            if not response.content:
+                return {}
+            data = response.json()
+            return data.get('data', data)
+
+        try:
+            if not state.get('media_id') or state.get('expires_at', 0) <= time.time() + 60:
+                state.clear()
+                init = send('INIT', data={
+                    'command': 'INIT',
+                    'total_bytes': size,
+                    'media_type': content_type,
+                    'media_category': category
+                })
+                if init is None:
+                    return None
+                state.update({
+                    'media_id': str(init.get('media_id_string') or init.get('id') or init.get('media_id')),
+                    'segment_index': 0,
+                    'expires_at': time.time() + init.get('expires_after_secs', 86400),
+                    'finalized': False
+                })
+                save_progress(state)
+
+            with open(path, 'rb') as media, mmap.mmap(media.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                while state['segment_index'] * MEDIA_SEGMENT_SIZE < size:
+                    start = state['segment_index'] * MEDIA_SEGMENT_SIZE
+                    appended = send('APPEND', data={
+                        'command': 'APPEND',
+                        'media_id': state['media_id'],
+                        'segment_index': state['segment_index']
+                    }, files={'media': ('media', view[start:start + MEDIA_SEGMENT_SIZE], 'application/octet-stream')})
+                    if appended is None:
+                        return None
+                    state['segment_index'] += 1
+                    save_progress(state)
+
+            processing = None
+            if not state.get('finalized'):
+                finalize = send('FINALIZE', data={'command': 'FINALIZE', 'media_id': state['media_id']})
+                if finalize is None:
+                    return None
+                state['finalized'] = True
+                if finalize.get('expires_after_secs'):
+                    state['expires_at'] = time.time() + finalize['expires_after_secs']
+                save_progress(state)
+                processing = finalize.get('processing_info')
+            else:
+                processing = {'state': 'pending', 'check_after_secs': 0}
+
+            # Videos and GIFs are processed asynchronously before they can be attached
+            deadline = time.time() + MEDIA_PROCESSING_TIMEOUT
+            while processing and processing.get('state') in ('pending', 'in_progress'):
+                if time.time() >= deadline:
+                    logging.error(f"Twitter media {state['media_id']} still processing after {MEDIA_PROCESSING_TIMEOUT:.0f}s")
+                    return None
+                time.sleep(min(processing.get('check_after_secs', 1), max(0.0, deadline - time.time())))
+                status = send('STATUS', method='GET', params={'command': 'STATUS', 'media_id': state['media_id']})
+                if status is None:
+                    return None
+                processing = status.get('processing_info')
+            if processing and processing.get('state') == 'failed':
+                logging.error(f"Twitter could not process media {state['media_id']}: {processing.get('error')}")
+                state.clear()
+                save_progress(state)
+                return None
+            return state['media_id']
+        except RateLimitExceeded:
+            raise
+        except (requests.exceptions.RequestException, ValueError, OSError) as e:
+            # Progress so far is saved; the next attempt resumes from it
+            logging.error(f"Twitter media upload error: {e}")
+            return None
+    
     def test_connection(self) -> Dict:
         """Test if the API credentials are valid"""
         try:
@@ -73,22 +323,31 @@ class TwitterAPI:
                     'status': 'error',
                     'message': 'No se pudo conectar con Twitter API. Verifica tus credenciales.'
                 }
+        except RateLimitExceeded as e:
+            return {
+                'status': 'error',
+                'message': f'Límite de peticiones de Twitter alcanzado. Reintenta en {e.retry_after:.0f} segundos.',
+                'retry_after': e.retry_after
+            }
         except Exception as e:
             return {
                 'status': 'error',
                 'message': f'Error de conexión: {str(e)}'
             }
     
-    def post_tweet(self, text: str) -> Dict:
-        """Post a tweet using Twitter API v2"""
+    def post_tweet(self, text: str, media_ids: Optional[List[str]] = None) -> Dict:
+        """Post a tweet using Twitter API v2, attaching media ids from upload_media"""
         try:
             # This would require OAuth 1.0a for posting
             # For now, return simulation since posting requires more complex auth
-            return {
+            result = {
                 'status': 'simulated',
                 'message': f'Tweet simulado: "{text[:50]}..."',
                 'note': 'Publicación real requiere OAuth 1.0a implementation'
             }
+            if media_ids:
+                result['media_ids'] = media_ids
+            return result
         except Exception as e:
             return {
                 'status': 'error',
@@ -96,6 +355,20 @@ class TwitterAPI:
             }
 
 
+def _profile(user_data: Dict) -> Dict:
+    """Convert a v2 user object to the profile shape used across the app"""
+    return {
+        'username': f"@{user_data.get('username', '')}",
+        'display_name': user_data.get('name', ''),
+        'follower_count': user_data.get('public_metrics', {}).get('followers_count', 0),
+        'verified': user_data.get('verified', False),
+        'profile_image': user_data.get('profile_image_url', ''),
+        'description': user_data.get('description', ''),
+        'user_id': user_data.get('id', ''),
+        'api_response': True
+    }
+
+
 def create_twitter_client(credentials: Dict) -> Optional[TwitterAPI]:
     """Create TwitterAPI client from credentials dictionary"""
     try: